@@ -1,14 +1,40 @@
+import hashlib
+from collections.abc import Callable
 from copy import deepcopy
-from urllib.parse import urlparse
+from datetime import datetime, timedelta
+from typing import Any, Literal
+from urllib.parse import quote, urlencode, urlparse
 
 from django import forms
 from django.contrib import admin
-from django.utils.translation import gettext as _
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.utils import quote as admin_quote, unquote
+from django.contrib.admin.views.main import ALL_VAR, ORDER_VAR, PAGE_VAR, ChangeList
+from django.core.cache import caches
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, StreamingHttpResponse
+from django.template.defaultfilters import filesizeformat
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
+from django.utils.safestring import SafeString, mark_safe
+from django.utils.translation import gettext as _, gettext_lazy
 
 from solo.admin import SingletonModelAdmin
 
 from .conf import settings
-from .models import OutgoingRequestsLog, OutgoingRequestsLogConfig
+from .config_cache import get_config, invalidate_config_cache
+from .export import FORMATS, ExportFormat, export_logs
+from .models import (
+    OutgoingRequestsHourlyStats,
+    OutgoingRequestsLog,
+    OutgoingRequestsLogConfig,
+    OutgoingRequestsLogQueryset,
+    OutgoingRequestsLogRule,
+)
+from .pagination import EstimatedCountPaginator
+from .stats import summarize_hourly_stats
 from .syntax_highlighting import highlight_body
 
 try:
@@ -16,6 +42,170 @@ try:
 except ImportError:
     celery = None
 
+BODY_TOO_LARGE = gettext_lazy(
+    "(not saved - the body exceeds the maximum content length)"
+)
+
+BODY_PREVIEW_LENGTH = 4096
+"""
+Bodies larger than this (in bytes) are truncated in the change form, the full body is
+loaded on demand.
+"""
+
+STREAMING_CHUNK_SIZE = 65_536
+
+
+def _get_decoded_body(log: OutgoingRequestsLog, prefix: Literal["req", "res"]) -> str:
+    return log.request_body_decoded if prefix == "req" else log.response_body_decoded
+
+
+def get_highlighted_body(
+    log: OutgoingRequestsLog, prefix: Literal["req", "res"]
+) -> str:
+    """
+    Get the pretty printed and highlighted body, from the cache if possible.
+
+    Bodies larger than ``LOG_OUTGOING_REQUESTS_HIGHLIGHT_MAX_SIZE`` are returned as-is.
+    """
+
+    size: int = getattr(log, f"{prefix}_body_size")
+    if size > settings.LOG_OUTGOING_REQUESTS_HIGHLIGHT_MAX_SIZE:
+        return _get_decoded_body(log, prefix)
+
+    content_type: str = getattr(log, f"{prefix}_content_type")
+    timeout = settings.LOG_OUTGOING_REQUESTS_HIGHLIGHT_CACHE_TIMEOUT
+    if not timeout:
+        return highlight_body(_get_decoded_body(log, prefix), content_type)
+
+    # log records are immutable, except for the encoding which can be changed in the
+    # admin
+    encoding: str = getattr(log, f"{prefix}_body_encoding")
+    cache_key = (
+        f"log_outgoing_requests:highlighted_body:{log.pk}:{prefix}:"
+        f"{int(get_config().prettify_bodies)}:{quote(encoding, safe='')}"
+    )
+    cache = caches[settings.LOG_OUTGOING_REQUESTS_CACHE]
+    if (cached := cache.get(cache_key)) is not None:
+        return mark_safe(cached)
+
+    highlighted = highlight_body(_get_decoded_body(log, prefix), content_type)
+    # only cache the actual highlighting results - the body is returned as-is (and
+    # must be escaped) if it can't be highlighted
+    if isinstance(highlighted, SafeString):
+        cache.set(cache_key, str(highlighted), timeout=timeout)
+    return highlighted
+
+
+def _get_cached(key: str, get_value: Callable[[], list[Any]]) -> list[Any]:
+    timeout = settings.LOG_OUTGOING_REQUESTS_ADMIN_FILTER_CACHE_TIMEOUT
+    if not timeout:
+        return get_value()
+    cache = caches[settings.LOG_OUTGOING_REQUESTS_CACHE]
+    return cache.get_or_set(key, get_value, timeout=timeout)
+
+
+class CachedAllValuesFieldListFilter(admin.AllValuesFieldListFilter):
+    """
+    Filter on the distinct values of a field, which are cached.
+
+    Selecting the distinct values scans the entire table, on every page load.
+    """
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        super().__init__(field, request, params, model, model_admin, field_path)
+        lookup_choices = self.lookup_choices
+        self.lookup_choices = _get_cached(
+            f"log_outgoing_requests:filter_values:{field_path}",
+            lambda: list(lookup_choices),
+        )
+
+
+class _ChangeListQuerySet(OutgoingRequestsLogQueryset):
+    """
+    Cache the distinct dates queried by the date hierarchy.
+    """
+
+    def datetimes(self, field_name, kind, order="ASC", tzinfo=None):  # type: ignore
+        queryset = super().datetimes(field_name, kind, order=order, tzinfo=tzinfo)
+        query_hash = hashlib.md5(str(queryset.query).encode(), usedforsecurity=False)
+        return _get_cached(
+            f"log_outgoing_requests:filter_dates:{query_hash.hexdigest()}",
+            lambda: list(queryset),
+        )
+
+
+CURSOR_VAR = "cursor"
+
+
+class OutgoingRequestsLogChangeList(ChangeList):
+    """
+    Paginate with a cursor on ``(timestamp, id)`` instead of page numbers.
+
+    Skipping ``OFFSET`` rows gets slower the further one pages, while the cursor seeks
+    directly into the ``(timestamp, id)`` index. Keyset pagination is used with the
+    default (newest first) ordering, other orderings use regular page numbers.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR, "")
+        self.keyset_pagination = not any(
+            var in request.GET for var in (ORDER_VAR, PAGE_VAR, ALL_VAR)
+        )
+        self.first_page_url = self.next_page_url = None
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # links to other filters or orderings start at the first page again
+        return super().get_query_string(new_params, [*(remove or []), CURSOR_VAR])
+
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        return _ChangeListQuerySet(self.model, query=queryset.query, using=queryset.db)
+
+    def get_results(self, request):
+        if not self.keyset_pagination:
+            return super().get_results(request)
+
+        queryset = self.queryset
+        if self.cursor:
+            timestamp, pk = self._parse_cursor(self.cursor)
+            queryset = queryset.filter(timestamp__lte=timestamp).exclude(
+                timestamp=timestamp, pk__gte=pk
+            )
+            self.first_page_url = self.get_query_string()
+        # fetch one more to know if there's a next page, without counting
+        result_list = list(queryset[: self.list_per_page + 1])
+        if len(result_list) > self.list_per_page:
+            del result_list[self.list_per_page :]
+            last = result_list[-1]
+            self.next_page_url = self.get_query_string(
+                {CURSOR_VAR: f"{last.timestamp.isoformat()}_{last.pk}"}
+            )
+
+        self.paginator = self.model_admin.get_paginator(
+            request, self.queryset, self.list_per_page
+        )
+        self.result_count = self.paginator.count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = bool(self.cursor or self.next_page_url)
+
+    @staticmethod
+    def _parse_cursor(cursor: str) -> tuple[datetime, int]:
+        timestamp, _, pk = cursor.rpartition("_")
+        try:
+            return datetime.fromisoformat(timestamp), int(pk)
+        except ValueError as exc:
+            raise IncorrectLookupParameters(f"Invalid cursor {cursor!r}") from exc
+
 
 @admin.register(OutgoingRequestsLog)
 class OutgoingRequestsLogAdmin(admin.ModelAdmin):
@@ -29,10 +219,18 @@ class OutgoingRequestsLogAdmin(admin.ModelAdmin):
         "timestamp",
         "response_content_length",
     )
-    list_filter = ("method", "timestamp", "status_code", "hostname")
+    list_filter = (
+        ("method", CachedAllValuesFieldListFilter),
+        "timestamp",
+        ("status_code", CachedAllValuesFieldListFilter),
+        ("hostname", CachedAllValuesFieldListFilter),
+    )
     search_fields = ("url", "params", "hostname")
     date_hierarchy = "timestamp"
+    ordering = ("-timestamp", "-pk")
+    paginator = EstimatedCountPaginator
     show_full_result_count = False
+    actions = ["export_as_ndjson", "export_as_csv"]
     readonly_fields = (
         "url",
         "timestamp",
@@ -118,13 +316,66 @@ class OutgoingRequestsLogAdmin(admin.ModelAdmin):
                 "log_outgoing_requests/css/highlight.css",
             ),
         }
+        js = ("log_outgoing_requests/js/admin.js",)
 
     def has_add_permission(self, request):
         return False
 
+    def get_urls(self):
+        return [
+            path(
+                "<path:object_id>/body/<str:prefix>/",
+                self.admin_site.admin_view(self.body_view),
+                name=f"{self.opts.app_label}_{self.opts.model_name}_body",
+            ),
+            *super().get_urls(),
+        ]
+
+    def body_view(self, request, object_id: str, prefix: str):
+        """
+        Stream the full request (``prefix="req"``) or response (``prefix="res"``)
+        body, either raw or highlighted (``?format=highlighted``).
+        """
+        if prefix not in ("req", "res"):
+            raise Http404
+        obj = self.get_object(request, unquote(object_id))
+        if obj is None:
+            raise Http404
+        if not self.has_view_or_change_permission(request, obj):
+            raise PermissionDenied
+
+        content: str
+        if getattr(obj, f"{prefix}_body_too_large"):
+            content, content_type = str(BODY_TOO_LARGE), "text/plain"
+        elif request.GET.get("format") == "highlighted":
+            content, content_type = get_highlighted_body(obj, prefix), "text/html"
+            # bodies that are not highlighted must be escaped
+            if not isinstance(content, SafeString):
+                content = format_html("<pre>{}</pre>", content)
+        else:
+            content, content_type = _get_decoded_body(obj, prefix), "text/plain"
+
+        response = StreamingHttpResponse(
+            (
+                content[start : start + STREAMING_CHUNK_SIZE].encode("utf-8")
+                for start in range(0, len(content), STREAMING_CHUNK_SIZE)
+            ),
+            content_type=f"{content_type}; charset=utf-8",
+        )
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        return response
+
+    def get_changelist(self, request, **kwargs):
+        return OutgoingRequestsLogChangeList
+
+    def get_queryset(self, request):
+        # The bodies can be large and are only needed on the detail page, where
+        # they're loaded on access. The changelist shows the persisted sizes instead.
+        return super().get_queryset(request).defer("req_body", "res_body")
+
     def get_fieldsets(self, request, obj=None):
         fieldsets = super().get_fieldsets(request, obj)
-        config = OutgoingRequestsLogConfig.get_solo()
+        config = get_config()
         if not config.prettify_bodies:
             # replace the pretty-printend/highlighted bodies fields with their raw
             # equivalents
@@ -149,25 +400,75 @@ class OutgoingRequestsLogAdmin(admin.ModelAdmin):
             return updated_fieldsets
         return fieldsets
 
+    @admin.action(description=gettext_lazy("Export selected logs as NDJSON"))
+    def export_as_ndjson(self, request, queryset):
+        return self._export(queryset, "ndjson")
+
+    @admin.action(description=gettext_lazy("Export selected logs as CSV"))
+    def export_as_csv(self, request, queryset):
+        return self._export(queryset, "csv")
+
+    def _export(self, queryset, format: ExportFormat) -> StreamingHttpResponse:
+        # the bodies are left out, they can be exported with the management command
+        response = StreamingHttpResponse(
+            export_logs(queryset, format=format), content_type=FORMATS[format]
+        )
+        filename = f"outgoing-request-logs-{timezone.now():%Y%m%d%H%M%S}.{format}"
+        response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
     @admin.display(description=_("Query parameters"))
     def query_params(self, obj):
         return obj.query_params
 
     @admin.display(description=_("Request body"))
     def request_body(self, obj: OutgoingRequestsLog) -> str:
-        return highlight_body(obj.request_body_decoded, obj.req_content_type)
+        return self._display_body(obj, "req", highlighted=True)
 
     @admin.display(description=_("Response body"))
     def response_body(self, obj: OutgoingRequestsLog) -> str:
-        return highlight_body(obj.response_body_decoded, obj.res_content_type)
+        return self._display_body(obj, "res", highlighted=True)
 
     @admin.display(description=_("Request"))
     def raw_request_body(self, obj: OutgoingRequestsLog) -> str:
-        return obj.request_body_decoded or "-"
+        return self._display_body(obj, "req", highlighted=False)
 
     @admin.display(description=_("Response"))
     def raw_response_body(self, obj: OutgoingRequestsLog) -> str:
-        return obj.response_body_decoded or "-"
+        return self._display_body(obj, "res", highlighted=False)
+
+    def _display_body(
+        self,
+        obj: OutgoingRequestsLog,
+        prefix: Literal["req", "res"],
+        *,
+        highlighted: bool,
+    ) -> str:
+        if getattr(obj, f"{prefix}_body_too_large"):
+            return BODY_TOO_LARGE
+
+        size: int = getattr(obj, f"{prefix}_body_size")
+        if size <= BODY_PREVIEW_LENGTH:
+            if highlighted:
+                return get_highlighted_body(obj, prefix)
+            return _get_decoded_body(obj, prefix) or "-"
+
+        # only render a preview, the full body is loaded on demand
+        url = reverse(
+            f"admin:{self.opts.app_label}_{self.opts.model_name}_body",
+            args=(admin_quote(obj.pk), prefix),
+            current_app=self.admin_site.name,
+        )
+        body_format = "highlighted" if highlighted else "raw"
+        return format_html(
+            '<div class="lor-body-preview"><pre>{preview}\u2026</pre>'
+            '<a class="lor-load-body" href="{url}?format={format}" target="_blank" '
+            'data-format="{format}">{label}</a></div>',
+            preview=_get_decoded_body(obj, prefix)[:BODY_PREVIEW_LENGTH],
+            url=url,
+            format=body_format,
+            label=_("Show the full body ({size})").format(size=filesizeformat(size)),
+        )
 
     def truncated_url(self, obj):
         parsed_url = urlparse(obj.url)
@@ -184,6 +485,86 @@ class OutgoingRequestsLogAdmin(admin.ModelAdmin):
         return left_half + " \u2026 " + right_half
 
 
+@admin.register(OutgoingRequestsHourlyStats)
+class OutgoingRequestsHourlyStatsAdmin(admin.ModelAdmin):
+    """
+    Display a dashboard with the statistics per hostname, or per hour for a hostname,
+    instead of the individual statistics records.
+    """
+
+    change_list_template = (
+        "admin/log_outgoing_requests/outgoingrequestshourlystats/dashboard.html"
+    )
+    periods = {
+        24: gettext_lazy("Last 24 hours"),
+        24 * 7: gettext_lazy("Last 7 days"),
+        24 * 30: gettext_lazy("Last 30 days"),
+        24 * 365: gettext_lazy("Last year"),
+    }
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        hours = request.GET.get("hours", "")
+        hours = int(hours) if hours.isdigit() and int(hours) in self.periods else 24
+        hostname = request.GET.get("hostname")
+        now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        since = now - timedelta(hours=hours - 1)
+        host_params = {"hostname": hostname} if hostname is not None else {}
+
+        if hostname is None:
+            summaries = summarize_hourly_stats(since=since)
+            # busiest hosts first
+            groups = sorted(summaries.items(), key=lambda item: -item[1].count)
+            rows = [
+                (label, f"?{urlencode({'hours': hours, 'hostname': label})}", summary)
+                for label, summary in groups
+            ]
+        else:
+            summaries = summarize_hourly_stats(
+                since=since, group_by="hour", hostname=hostname
+            )
+            rows = [
+                (label, None, summary) for label, summary in sorted(summaries.items())
+            ]
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.opts,
+            "title": hostname or self.opts.verbose_name_plural,
+            "hostname": hostname,
+            "hours": hours,
+            "periods": [
+                (period, f"?{urlencode({'hours': period, **host_params})}", label)
+                for period, label in self.periods.items()
+            ],
+            "rows": [
+                {
+                    "label": label,
+                    "url": url,
+                    "summary": summary,
+                    "error_percentage": summary.error_rate * 100,
+                    "p50": summary.percentile(50),
+                    "p95": summary.percentile(95),
+                    "p99": summary.percentile(99),
+                }
+                for label, url, summary in rows
+            ],
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, self.change_list_template, context)
+
+
 class ConfigAdminForm(forms.ModelForm):
     class Meta:
         model = OutgoingRequestsLogConfig
@@ -209,3 +590,23 @@ class OutgoingRequestsLogConfigAdmin(SingletonModelAdmin):
         if celery is None and (obj and not obj.reset_db_save_after):
             fields.remove("reset_db_save_after")
         return fields
+
+
+@admin.register(OutgoingRequestsLogRule)
+class OutgoingRequestsLogRuleAdmin(admin.ModelAdmin):
+    list_display = (
+        "hostname",
+        "path_pattern",
+        "action",
+        "max_content_length",
+        "order",
+    )
+    list_display_links = ("hostname", "path_pattern")
+    list_editable = ("order",)
+    list_filter = ("action",)
+    search_fields = ("hostname", "path_pattern")
+
+    def delete_queryset(self, request, queryset):
+        # bulk deletes don't call the model's delete method
+        super().delete_queryset(request, queryset)
+        invalidate_config_cache()
@@ -0,0 +1,375 @@
+"""
+Storage of the request and response bodies.
+
+Bodies are compressed right before the log records are written to the database, when
+``LOG_OUTGOING_REQUESTS_BODY_COMPRESSION`` is enabled. The codec is recorded next to
+each body (``req_body_codec``/``res_body_codec``), so changing the setting never breaks
+reading older records.
+
+When ``LOG_OUTGOING_REQUESTS_BODY_DEDUPLICATION`` is enabled, bodies are identified by
+their BLAKE2b hash and stored only once in the
+:class:`log_outgoing_requests.models.OutgoingRequestsBody` table, which the log records
+reference. Shared bodies that are no longer referenced are deleted when pruning.
+
+Large bodies can be kept out of the database altogether by configuring
+``LOG_OUTGOING_REQUESTS_BODY_STORAGE``. Bodies of at least
+``LOG_OUTGOING_REQUESTS_BODY_STORAGE_THRESHOLD`` bytes are then written to that
+:class:`~django.core.files.storage.Storage` (e.g. the file system, or an S3 bucket via
+django-storages), and only the name of the file is saved in the log record. The files
+are deleted together with the log records when pruning.
+
+Use :meth:`OutgoingRequestsLog.get_request_body` and
+:meth:`OutgoingRequestsLog.get_response_body` to read the original bodies.
+
+zstd requires the ``zstandard`` package on Python versions before 3.14. If it's not
+installed, zlib (from the standard library) is used instead.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import uuid
+import zlib
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage, storages
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.db.models import Exists, OuterRef, QuerySet
+from django.utils import timezone
+
+from .conf import settings
+from .constants import BodyCodec
+
+if TYPE_CHECKING:
+    from .models import OutgoingRequestsLog
+
+__all__ = [
+    "compress",
+    "decompress",
+    "hash_body",
+    "get_body_storage",
+    "read_stored_body",
+    "prepare_bodies",
+    "delete_unused_bodies",
+    "iter_stored_body_names",
+    "delete_stored_bodies",
+]
+
+logger = logging.getLogger(__name__)
+
+MIN_COMPRESS_SIZE = 256
+"""
+Bodies smaller than this (in bytes) are stored as-is - the compression overhead is not
+worth it.
+"""
+
+MIN_SHARED_SIZE = 256
+"""
+Bodies smaller than this (in bytes) are stored in the log record itself, even with
+deduplication enabled - the reference would take up about as much space.
+"""
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+try:  # Python 3.14+
+    from compression import zstd as _zstd  # pyright: ignore
+
+    def _zstd_compress(data: bytes) -> bytes:
+        return _zstd.compress(data, level=ZSTD_LEVEL)
+
+    _zstd_decompress = _zstd.decompress
+except ImportError:
+    try:
+        import zstandard
+    except ImportError:
+        zstandard = None
+
+    def _zstd_compress(data: bytes) -> bytes:
+        assert zstandard is not None
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+    def _zstd_decompress(data: bytes) -> bytes:
+        assert zstandard is not None
+        # the compressor writes the content size in the frame header
+        return zstandard.ZstdDecompressor().decompress(data)
+
+    ZSTD_AVAILABLE = zstandard is not None
+else:
+    ZSTD_AVAILABLE = True
+
+
+def get_codec() -> BodyCodec:
+    """
+    Determine the codec to compress new bodies with, from the settings.
+    """
+    match settings.LOG_OUTGOING_REQUESTS_BODY_COMPRESSION:
+        case None:
+            return BodyCodec.none
+        case "zstd" if ZSTD_AVAILABLE:
+            return BodyCodec.zstd
+        case "zstd" | "zlib":
+            return BodyCodec.zlib
+        case other:
+            raise ValueError(f"Unsupported body compression {other!r}")
+
+
+def compress(content: bytes, codec: BodyCodec) -> tuple[bytes, BodyCodec]:
+    """
+    Compress a body with the given codec.
+
+    Returns the content to store with the codec that was actually applied - small and
+    incompressible bodies are kept as-is.
+    """
+    if codec == BodyCodec.none or len(content) < MIN_COMPRESS_SIZE:
+        return content, BodyCodec.none
+    match codec:
+        case BodyCodec.zlib:
+            compressed = zlib.compress(content, ZLIB_LEVEL)
+        case BodyCodec.zstd:
+            compressed = _zstd_compress(content)
+        case _:
+            raise ValueError(f"Unknown body codec {codec!r}")
+    if len(compressed) >= len(content):
+        return content, BodyCodec.none
+    return compressed, codec
+
+
+def decompress(content: bytes | memoryview, codec: str) -> bytes:
+    """
+    Restore a body stored with :func:`compress`.
+    """
+    content = bytes(content)
+    match codec:
+        case BodyCodec.none:
+            return content
+        case BodyCodec.zlib:
+            return zlib.decompress(content)
+        case BodyCodec.zstd:
+            if not ZSTD_AVAILABLE:
+                raise RuntimeError(
+                    "The body is compressed with zstd, but no zstd implementation is "
+                    "available. Install the 'zstandard' package."
+                )
+            return _zstd_decompress(content)
+        case _:
+            raise ValueError(f"Unknown body codec {codec!r}")
+
+
+def hash_body(content: bytes) -> str:
+    """
+    Calculate the hash that identifies a shared body.
+    """
+    return hashlib.blake2b(content, digest_size=32).hexdigest()
+
+
+def get_body_storage() -> Storage | None:
+    """
+    Get the storage for large bodies, if configured.
+    """
+    alias = settings.LOG_OUTGOING_REQUESTS_BODY_STORAGE
+    return storages[alias] if alias else None
+
+
+def read_stored_body(name: str, codec: str) -> bytes:
+    """
+    Read a body from the body storage.
+
+    Missing files result in an empty body rather than an error, so the rest of the log
+    record can still be displayed.
+    """
+    storage = get_body_storage()
+    if storage is None:
+        logger.warning(
+            "Body %s is kept in the body storage, but no body storage is configured",
+            name,
+        )
+        return b""
+    try:
+        with storage.open(name) as file:
+            content = file.read()
+    except OSError:
+        logger.warning("Could not read stored body %s", name, exc_info=True)
+        return b""
+    return decompress(content, codec)
+
+
+def prepare_bodies(logs: Iterable[OutgoingRequestsLog]) -> list[str]:
+    """
+    Prepare the bodies of unsaved log records for storage.
+
+    Called by the writers right before the records are saved, outside of the
+    application threads. Bodies moved to the body storage and shared bodies are saved
+    immediately - call this in the transaction saving the records, see
+    :func:`log_outgoing_requests.handlers.save_logs`.
+
+    The files in the body storage are not part of the transaction. If preparing the
+    bodies fails, the files saved so far are deleted again.
+
+    :returns: The names of the files saved in the body storage, to be deleted if saving
+      the log records fails.
+    """
+    codec = get_codec()
+    deduplicate = settings.LOG_OUTGOING_REQUESTS_BODY_DEDUPLICATION
+    storage = get_body_storage()
+    storage_threshold = settings.LOG_OUTGOING_REQUESTS_BODY_STORAGE_THRESHOLD
+    if codec == BodyCodec.none and not deduplicate and storage is None:
+        return []
+
+    stored: list[str] = []
+    try:
+        shared: dict[str, bytes] = {}
+        for log in logs:
+            for prefix in ("req", "res"):
+                content: bytes = getattr(log, f"{prefix}_body")
+                if storage is not None and len(content) >= storage_threshold:
+                    stored_content, applied_codec = compress(content, codec)
+                    if name := _save_in_storage(storage, stored_content, prefix):
+                        stored.append(name)
+                        setattr(log, f"{prefix}_body", b"")
+                        setattr(log, f"{prefix}_body_file", name)
+                        setattr(log, f"{prefix}_body_codec", applied_codec)
+                        continue
+
+                if deduplicate and len(content) >= MIN_SHARED_SIZE:
+                    digest = hash_body(content)
+                    shared[digest] = content
+                    setattr(log, f"{prefix}_body", b"")
+                    setattr(log, f"{prefix}_body_ref_id", digest)
+                else:
+                    content, applied_codec = compress(content, codec)
+                    setattr(log, f"{prefix}_body", content)
+                    setattr(log, f"{prefix}_body_codec", applied_codec)
+
+        if shared:
+            _save_shared_bodies(shared, codec)
+    except Exception:
+        delete_stored_bodies(stored)
+        raise
+    return stored
+
+
+def _save_in_storage(storage: Storage, content: bytes, prefix: str) -> str | None:
+    name = f"outgoing_requests/{timezone.now():%Y/%m/%d}/{uuid.uuid4().hex}.{prefix}"
+    try:
+        return storage.save(name, ContentFile(content))
+    except Exception:
+        # don't lose the log record, keep the body in the database instead
+        logger.warning(
+            "Could not save the body in the body storage, saving it in the database",
+            exc_info=True,
+        )
+        return None
+
+
+def _save_shared_bodies(shared: dict[str, bytes], codec: BodyCodec) -> None:
+    from .models import OutgoingRequestsBody
+
+    # Typically, most bodies have been seen before - only compress the new ones. The
+    # content of the known bodies is only inserted if they're deleted in the meantime.
+    known = set(
+        OutgoingRequestsBody.objects.filter(hash__in=shared).values_list(
+            "hash", flat=True
+        )
+    )
+    now = timezone.now()
+    bodies = []
+    for digest, content in shared.items():
+        applied_codec = BodyCodec.none
+        if digest not in known:
+            content, applied_codec = compress(content, codec)
+        bodies.append(
+            OutgoingRequestsBody(
+                hash=digest, content=content, codec=applied_codec, last_used=now
+            )
+        )
+    # Insert the bodies, or mark the existing ones as used which protects them from
+    # being deleted when pruning, in a single query. This is atomic, unlike checking
+    # for existing bodies first, so it's safe with concurrent writers and pruning.
+    # MySQL and MariaDB don't accept the conflicting fields, they update the rows
+    # conflicting on any unique field - which is just the hash (primary key) here.
+    features = connections[router.db_for_write(OutgoingRequestsBody)].features
+    OutgoingRequestsBody.objects.bulk_create(
+        bodies,
+        update_conflicts=True,
+        unique_fields=(
+            ["hash"] if features.supports_update_conflicts_with_target else None
+        ),
+        update_fields=["last_used"],
+    )
+
+
+def delete_unused_bodies(
+    cutoff: datetime, *, batch_size: int | None = None, using: str = DEFAULT_DB_ALIAS
+) -> int:
+    """
+    Delete the shared bodies that are not referenced by any log record and have not
+    been used since ``cutoff``.
+
+    Bodies used after the cutoff are kept, so bodies that are being saved concurrently
+    (before the log records referencing them) are never deleted.
+
+    :returns: The number of deleted bodies.
+    """
+    from .models import OutgoingRequestsBody, OutgoingRequestsLog
+
+    logs = OutgoingRequestsLog.objects.using(using)
+    unused = OutgoingRequestsBody.objects.using(using).filter(
+        ~Exists(logs.filter(req_body_ref=OuterRef("pk"))),
+        ~Exists(logs.filter(res_body_ref=OuterRef("pk"))),
+        last_used__lt=cutoff,
+    )
+    if batch_size is None:
+        num_deleted, _ = unused.delete()
+        return num_deleted
+
+    num_deleted = 0
+    while batch := list(unused.values_list("pk", flat=True)[:batch_size]):
+        num_batch_deleted, _ = unused.filter(pk__in=batch).delete()
+        num_deleted += num_batch_deleted
+        if len(batch) < batch_size:
+            break
+    return num_deleted
+
+
+def iter_stored_body_names(logs: QuerySet[OutgoingRequestsLog]) -> Iterator[str]:
+    """
+    Iterate over the names of the files in the body storage that belong to the log
+    records, without loading them all into memory.
+    """
+    if get_body_storage() is None:
+        return
+    rows = logs.exclude(req_body_file="", res_body_file="").values_list(
+        "req_body_file", "res_body_file"
+    )
+    for names in rows.iterator():
+        yield from (name for name in names if name)
+
+
+def delete_stored_bodies(names: Iterable[str]) -> int:
+    """
+    Delete files from the body storage.
+
+    The storage API doesn't support deleting multiple files at once, so they're deleted
+    one by one. Errors are logged and otherwise ignored - an orphaned file is better
+    than aborting the pruning.
+
+    :returns: The number of deleted files.
+    """
+    storage = get_body_storage()
+    if storage is None:
+        return 0
+    num_deleted = 0
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.warning("Could not delete stored body %s", name, exc_info=True)
+        else:
+            num_deleted += 1
+    return num_deleted
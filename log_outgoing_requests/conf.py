@@ -1,4 +1,5 @@
 from collections.abc import Callable
+from typing import Literal
 
 from django.conf import settings
 
@@ -54,12 +55,91 @@ class LogOutgoingRequestsConf(AppConf):
     database, but the body will be missing.
     """
 
+    BODY_COMPRESSION: Literal["zstd", "zlib"] | None = None
+    """
+    Opt-in compression of the request/response bodies saved to the database, either
+    ``"zstd"`` or ``"zlib"``.
+
+    Bodies are compressed by the log writer, outside of the application threads. zstd
+    requires the ``zstandard`` package on Python versions before 3.14 - if it's not
+    available, zlib is used instead. Previously saved bodies remain readable when this
+    setting is changed.
+    """
+
+    BODY_DEDUPLICATION = False
+    """
+    Whether to store identical request/response bodies only once.
+
+    Bodies are identified by their hash and saved in a separate table, which the log
+    records reference. This saves a lot of space if the same bodies are exchanged over
+    and over again, e.g. when polling an API, at the cost of a few extra queries per
+    batch of log records. Shared bodies are deleted when pruning, once no log record
+    references them anymore. Requires a database that supports upserts with
+    ``bulk_create(update_conflicts=True)``, which all databases supported by Django
+    except Oracle do.
+    """
+
+    BODY_STORAGE: str | None = None
+    """
+    The alias of a storage in the ``STORAGES`` setting to keep large request/response
+    bodies in, instead of the database.
+
+    Bodies of at least ``BODY_STORAGE_THRESHOLD`` bytes are written to the storage by
+    the log writer and only the file name is saved in the log record. The files are
+    deleted when pruning the log records.
+    """
+    BODY_STORAGE_THRESHOLD = 65_536  # 64 KB
+    """
+    The minimum size of the bodies to keep in the ``BODY_STORAGE``, in bytes.
+    """
+
+    CAPTURE_STREAMED_BODIES = False
+    """
+    Whether the bodies of streamed responses (``requests.get(url, stream=True)``) may
+    be saved to the database.
+
+    When enabled, a copy of the first ``MAX_CONTENT_LENGTH`` bytes is kept while the
+    application reads the response, and the log record is only emitted once the
+    response is read entirely or closed. Make sure to always close streamed responses,
+    e.g. by using them as context manager. Responses that are never closed are saved
+    without body once they're garbage collected, but only when the logs are saved in a
+    background thread (``HANDLER_USE_QUEUE``) - otherwise they are not logged at all.
+    """
+
     MAX_AGE = 1
     """
     The maximum age (in days) of request logs, after which they are deleted (via a
     Celery task, Django management command, or the like).
     """
 
+    LATENCY_HISTOGRAMS: bool = False
+    """
+    Whether to record the response times of all outgoing requests in in-process
+    histograms per hostname, also when they're not saved to the database. See
+    :mod:`log_outgoing_requests.latency`.
+    """
+
+    HOURLY_STATS: bool = False
+    """
+    Whether to roll the saved request logs up into hourly statistics per hostname,
+    which are displayed in the admin. See :mod:`log_outgoing_requests.stats`.
+    """
+
+    HOURLY_STATS_MAX_AGE: int | None = 365
+    """
+    The maximum age (in days) of the hourly statistics, after which they are deleted
+    when pruning the request logs. Set to ``None`` to keep them forever.
+    """
+
+    PARTITION_INTERVAL: Literal["day", "hour"] | None = None
+    """
+    Opt-in time-based partitioning of the log table, either per ``"day"`` or ``"hour"``.
+
+    Only supported on PostgreSQL. Expired partitions are dropped as a whole when
+    pruning, which is much cheaper than deleting the individual records. See
+    :mod:`log_outgoing_requests.partitioning` for the required setup.
+    """
+
     RESET_DB_SAVE_AFTER = 60
     """
     If the config has been updated, reset the database logging after the specified
@@ -74,6 +154,48 @@ class LogOutgoingRequestsConf(AppConf):
     .. note:: this requires Celery to be installed, an optional dependency.
     """
 
+    HIGHLIGHT_MAX_SIZE = 131_072  # 128 KB
+    """
+    The maximum size of request/response bodies that are pretty printed and highlighted
+    in the admin, in bytes.
+
+    Highlighting large bodies can take seconds, so larger bodies are displayed as-is.
+    """
+    HIGHLIGHT_CACHE_TIMEOUT = 3600
+    """
+    Number of seconds the highlighted bodies are kept in the ``CACHE``, so that viewing
+    a log record again in the admin doesn't highlight the bodies again.
+
+    Set to ``0`` to disable caching.
+    """
+    ADMIN_FILTER_CACHE_TIMEOUT = 300
+    """
+    Number of seconds the choices of the admin filters (methods, status codes,
+    hostnames and dates) are kept in the ``CACHE``. Determining them requires scanning
+    the entire table, so new values only show up after this timeout.
+
+    Set to ``0`` to disable caching.
+    """
+
+    CACHE = "default"
+    """
+    The alias of the Django cache to use for data that is shared between processes.
+    """
+
+    CONFIG_CACHE_TIMEOUT = 60
+    """
+    Number of seconds a process keeps the runtime configuration (from the admin) in
+    memory before checking if it's still up to date.
+
+    Changes made via the admin become visible to other processes within this timeout.
+    Once it expires, the configuration is only reloaded from the database if it was
+    changed, which requires ``LOG_OUTGOING_REQUESTS_CACHE`` to point to a cache
+    that is shared between processes (like Redis or Memcached). With a process-local
+    cache, the configuration is reloaded every time the timeout expires.
+
+    Set to ``0`` to look up the configuration from the database for every log record.
+    """
+
     HANDLER_USE_QUEUE: bool = True
     """
     Set to ``False`` to write the log record in the main thread.
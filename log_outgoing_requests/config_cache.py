@@ -0,0 +1,142 @@
+"""
+Process-local cache for the configuration singleton.
+
+The configuration is looked up for every log record that is processed, which would
+otherwise result in one query per outgoing request for the
+:class:`log_outgoing_requests.models.OutgoingRequestsLogConfig` singleton. Instead, the
+loaded instance is kept around in the process for
+``LOG_OUTGOING_REQUESTS_CONFIG_CACHE_TIMEOUT`` seconds.
+
+Saving the configuration invalidates the local copy and, once the transaction is
+committed, bumps a version key in Django's cache framework. Other processes compare this
+version key once their local copy has expired and only reload the configuration from
+the database when it has changed. Consequently, a change made in one process is picked
+up by other processes within the configured timeout.
+
+The version key can only be trusted if the cache is shared between processes - with a
+process-local cache (like the default local memory cache), the configuration is always
+reloaded from the database once the local copy has expired.
+"""
+
+# NOTE: since this is imported in models.py, ensure it doesn't use functionality that
+# requires django to be fully initialized.
+from __future__ import annotations
+
+import time
+import uuid
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from .conf import settings
+
+if TYPE_CHECKING:
+    from .models import OutgoingRequestsLogConfig
+
+__all__ = ["get_cached_config", "get_config", "invalidate_config_cache"]
+
+VERSION_CACHE_KEY = "log_outgoing_requests:config_version"
+
+
+@dataclass(frozen=True)
+class _CacheEntry:
+    config: OutgoingRequestsLogConfig
+    version: str | None
+    expires_at: float
+
+
+_entry: _CacheEntry | None = None
+"""
+The locally cached configuration, ``None`` when it's not loaded (yet).
+
+Replacing the entry is atomic, so concurrent threads at worst load the configuration
+from the database more than once.
+"""
+
+
+def _is_cache_shared() -> bool:
+    """
+    Check if the configured cache is shared with other processes.
+    """
+    cache = caches[settings.LOG_OUTGOING_REQUESTS_CACHE]
+    return not isinstance(cache, LocMemCache | DummyCache)
+
+
+def _get_shared_version() -> str | None:
+    cache = caches[settings.LOG_OUTGOING_REQUESTS_CACHE]
+    # initialize the version if no process has done so yet (or if it was evicted)
+    cache.add(VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+    return cache.get(VERSION_CACHE_KEY)
+
+
+def _bump_shared_version() -> None:
+    cache = caches[settings.LOG_OUTGOING_REQUESTS_CACHE]
+    cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def get_config() -> OutgoingRequestsLogConfig:
+    """
+    Retrieve the (possibly cached) configuration singleton.
+
+    Treat the returned instance as read-only - it's shared between all threads of the
+    process.
+    """
+    from .models import OutgoingRequestsLogConfig
+
+    global _entry
+
+    timeout: float = settings.LOG_OUTGOING_REQUESTS_CONFIG_CACHE_TIMEOUT
+    if not timeout:
+        return OutgoingRequestsLogConfig.get_solo()
+
+    now = time.monotonic()
+    entry = _entry
+    if entry is not None and now < entry.expires_at:
+        return entry.config
+
+    # other processes can't see the version in a process-local cache, so they'd keep
+    # using their stale copy indefinitely
+    version = _get_shared_version() if _is_cache_shared() else None
+    # the local copy expired, but nobody changed the configuration in the meantime -
+    # no need to hit the database
+    if entry is not None and version is not None and version == entry.version:
+        _entry = _CacheEntry(entry.config, version, now + timeout)
+        return entry.config
+
+    config = OutgoingRequestsLogConfig.get_solo()
+    assert isinstance(config, OutgoingRequestsLogConfig)
+    _entry = _CacheEntry(config, version, now + timeout)
+    return config
+
+
+def get_cached_config() -> OutgoingRequestsLogConfig | None:
+    """
+    Get the local copy of the configuration, ``None`` if it must be (re)loaded.
+
+    Unlike :func:`get_config`, this never queries the cache or database, so it can be
+    called from async code without leaving the event loop.
+    """
+    if not settings.LOG_OUTGOING_REQUESTS_CONFIG_CACHE_TIMEOUT:
+        return None
+    entry = _entry
+    if entry is None or time.monotonic() >= entry.expires_at:
+        return None
+    return entry.config
+
+
+def invalidate_config_cache() -> None:
+    """
+    Discard the local copy of the configuration and notify other processes.
+
+    The local copy is discarded immediately so that the current process (and
+    transaction) sees its own changes. Other processes are only notified after the
+    transaction commits, otherwise they could load and cache the old values again.
+    """
+    global _entry
+
+    _entry = None
+    transaction.on_commit(_bump_shared_version)
@@ -6,3 +6,16 @@ class SaveLogsChoice(models.TextChoices):
     use_default = "use_default", _("Use default")
     yes = "yes", _("Yes")
     no = "no", _("No")
+
+
+class BodyCodec(models.TextChoices):
+    none = "", _("None")
+    zlib = "zlib", _("zlib")
+    zstd = "zstd", _("zstd")
+
+
+class RuleAction(models.TextChoices):
+    use_default = "use_default", _("Use the configuration")
+    exclude = "exclude", _("Don't save")
+    metadata_only = "metadata_only", _("Save without bodies")
+    save_body = "save_body", _("Save with bodies")
@@ -21,9 +21,95 @@ class ContentType:
     default_encoding: str
 
 
-@dataclass
+@dataclass(slots=True)
 class ProcessedBody:
     allow_saving_to_db: bool
     content: bytes
     content_type: str
     encoding: str
+    too_large: bool = False
+    """
+    The body was omitted because it exceeds the maximum content length.
+    """
+
+
+@dataclass(slots=True)
+class RequestLogSnapshot:
+    """
+    The details of a request log record that are saved to the database.
+
+    Taking a snapshot of a log record releases the references to the (prepared)
+    request, response and exception objects, which can hold a lot of memory.
+    """
+
+    created: float
+    url: str
+    hostname: str
+    params: str
+    method: str
+    status_code: int | None
+    response_ms: int
+    req_headers: str
+    res_headers: str
+    trace: str
+    sample_rate: float = 1
+    req_body: ProcessedBody | None = None
+    res_body: ProcessedBody | None = None
+
+
+class StreamCapture:
+    """
+    Keep a copy of (at most) the first ``limit`` bytes of a streamed body.
+
+    The chunks are copied into a single buffer, which is allocated up front if the
+    expected size is known. Once the body exceeds the limit, the copy is discarded
+    and only the total size is tracked.
+    """
+
+    __slots__ = ("limit", "size", "complete", "closed", "_buffer")
+
+    def __init__(self, limit: int, size_hint: int | None = None):
+        self.limit = limit
+        self.size = 0
+        self.complete = False
+        """
+        Whether the stream was read until the end.
+        """
+        self.closed = False
+        capacity = min(size_hint, limit) if size_hint is not None else 0
+        self._buffer = bytearray(capacity)
+
+    @property
+    def exceeded(self) -> bool:
+        return self.size > self.limit
+
+    def finish(self) -> None:
+        """
+        Mark the stream as read until the end.
+        """
+        if not self.closed:
+            self.complete = True
+
+    def close(self) -> None:
+        """
+        Stop capturing - later reads of the stream no longer affect the capture.
+        """
+        self.closed = True
+
+    def write(self, chunk: bytes) -> None:
+        if self.complete or self.closed:
+            return
+        start, self.size = self.size, self.size + len(chunk)
+        if self.exceeded:
+            self._buffer = bytearray()
+            return
+        # overwrites the preallocated space, or grows the buffer if there isn't enough
+        self._buffer[start : self.size] = chunk
+
+    def getvalue(self) -> bytes | None:
+        """
+        Return the captured body, or ``None`` if it's incomplete or too large.
+        """
+        if not self.complete or self.exceeded:
+            return None
+        return bytes(self._buffer[: self.size])
@@ -0,0 +1,129 @@
+"""
+Export log records as NDJSON or CSV, e.g. for incident analysis.
+
+The records are streamed: they're fetched from the database in chunks and serialized
+one by one, so memory usage stays flat regardless of the number of exported records.
+Bodies are only fetched when they're included in the export.
+
+Exports are available as admin actions and through the
+``export_outgoing_request_logs`` management command.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+from collections.abc import Callable, Iterator
+from typing import TYPE_CHECKING, Any, Literal
+
+if TYPE_CHECKING:
+    from django.db.models import QuerySet
+
+    from .models import OutgoingRequestsLog
+
+__all__ = ["FORMATS", "FIELDS", "export_logs"]
+
+type ExportFormat = Literal["ndjson", "csv"]
+
+FORMATS: dict[ExportFormat, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+"""
+The supported export formats, with their content type.
+"""
+
+FIELDS = (
+    "id",
+    "timestamp",
+    "method",
+    "url",
+    "hostname",
+    "params",
+    "status_code",
+    "response_ms",
+    "req_content_type",
+    "req_headers",
+    "req_body_size",
+    "req_body_too_large",
+    "res_content_type",
+    "res_headers",
+    "res_body_size",
+    "res_body_too_large",
+    "trace",
+)
+"""
+The exported fields of the log records, the bodies are optional.
+"""
+
+BODY_FIELDS = ("request_body", "response_body")
+
+
+def export_logs(
+    queryset: QuerySet[OutgoingRequestsLog],
+    *,
+    format: ExportFormat,
+    include_bodies: bool = False,
+    chunk_size: int = 2000,
+) -> Iterator[str]:
+    """
+    Serialize the log records, yielding one line at a time.
+
+    :arg format: The export format, ``"ndjson"`` or ``"csv"`` (with a header row).
+    :arg include_bodies: Also export the (decoded) request and response bodies.
+    :arg chunk_size: The number of records to fetch from the database at a time.
+    """
+    serializer = _SERIALIZERS[format]
+    fields = FIELDS + BODY_FIELDS if include_bodies else FIELDS
+    if include_bodies:
+        queryset = queryset.select_related("req_body_ref", "res_body_ref")
+    else:
+        queryset = queryset.only(*FIELDS)
+    rows = (
+        _get_row(log, include_bodies=include_bodies)
+        for log in queryset.iterator(chunk_size=chunk_size)
+    )
+    return serializer(rows, fields)
+
+
+def _get_row(log: OutgoingRequestsLog, *, include_bodies: bool) -> dict[str, Any]:
+    row = {field: getattr(log, field) for field in FIELDS}
+    row["timestamp"] = log.timestamp.isoformat()
+    if include_bodies:
+        row["request_body"] = log.request_body_decoded
+        row["response_body"] = log.response_body_decoded
+    return row
+
+
+def _serialize_ndjson(
+    rows: Iterator[dict[str, Any]], fields: tuple[str, ...]
+) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(row) + "\n"
+
+
+class _Echo:
+    """
+    File-like object that returns what's written to it, for :func:`csv.writer`.
+    """
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def _serialize_csv(
+    rows: Iterator[dict[str, Any]], fields: tuple[str, ...]
+) -> Iterator[str]:
+    writer = csv.DictWriter(_Echo(), fieldnames=fields)
+    yield writer.writeheader()  # pyright: ignore[reportReturnType]
+    for row in rows:
+        yield writer.writerow(row)
+
+
+_SERIALIZERS: dict[
+    ExportFormat,
+    Callable[[Iterator[dict[str, Any]], tuple[str, ...]], Iterator[str]],
+] = {
+    "ndjson": _serialize_ndjson,
+    "csv": _serialize_csv,
+}
@@ -3,6 +3,7 @@ import textwrap
 
 from requests import PreparedRequest, RequestException, Response
 
+from .datastructures import StreamCapture
 from .typing import (
     RequestLogRecord,
     is_any_request_log_record,
@@ -38,7 +39,7 @@ def format_request(req: PreparedRequest) -> str:
     )
 
 
-def format_response(resp: Response):
+def format_response(resp: Response, captured_body: StreamCapture | None = None):
     template = textwrap.dedent(
         """
         ---------------- response ----------------
@@ -50,7 +51,12 @@ def format_response(resp: Response):
     return template.format(
         resp=resp,
         reshdrs=format_headers(resp.headers),
-        response_body=format_body(resp.content, "Response"),
+        response_body=format_body(
+            # the body of a streamed response has been consumed by the application
+            # already, only the captured copy is available
+            captured_body.getvalue() if captured_body is not None else resp.content,
+            "Response",
+        ),
     )
 
 
@@ -96,7 +102,9 @@ class HttpFormatter(logging.Formatter):
     def _formatMessageWithResponse(self, record: RequestLogRecord) -> str:
         assert record.req is not None
         assert record.res is not None
-        return f"{format_request(record.req)}\n{format_response(record.res)}"
+        captured_body = getattr(record, "captured_body", None)
+        formatted_response = format_response(record.res, captured_body=captured_body)
+        return f"{format_request(record.req)}\n{formatted_response}"
 
     def formatMessage(self, record):
         result = super().formatMessage(record)
@@ -23,6 +23,8 @@ Much of this implementation was taken from django-timeline-logger.
 from __future__ import annotations
 
 import atexit
+import copy
+import functools
 import logging
 import os
 import queue
@@ -30,26 +32,36 @@ import threading
 import time
 from collections.abc import Callable, Mapping
 from datetime import timedelta
-from logging.handlers import QueueHandler as _QueueHandler, QueueListener
-from typing import TYPE_CHECKING, Any
+from logging.handlers import (
+    QueueHandler as _QueueHandler,
+    QueueListener as _QueueListener,
+)
+from typing import TYPE_CHECKING, Any, Literal, get_args
 from urllib.parse import urlparse
 
-from django.db import close_old_connections
+from django.db import close_old_connections, connections, router, transaction
 from django.utils import timezone
 from django.utils.module_loading import import_string
 
 from requests import PreparedRequest, RequestException, Response
 
+from . import metrics
 from .conf import settings
+from .datastructures import ProcessedBody, RequestLogSnapshot
+from .metrics import MetricsSink
+from .rules import apply_logging_rules
+from .sampling import get_sample_rate, is_record_sampled
 from .typing import (
     AnyLogRecord,
+    ErrorRequestLogRecord,
+    RequestLogRecord,
     is_any_request_log_record,
     is_error_request_log_record,
     is_request_log_record,
 )
 
 if TYPE_CHECKING:
-    from .models import OutgoingRequestsLog
+    from .models import OutgoingRequestsLog, OutgoingRequestsLogConfig
 
 logger = logging.getLogger(__name__)
 
@@ -65,20 +77,32 @@ except ImportError:
     uwsgi = None
     postfork = lambda cb: None  # noqa: E731
 
+type OverflowPolicy = Literal["drop_newest", "drop_oldest", "block", "metadata_only"]
+
 _queue: queue.Queue = queue.Queue[AnyLogRecord](maxsize=0)
 """
 Global queue singleton for the QueueHandler and QueueListener to communicate.
 
-The queue is unbounded per the recommendations on an
+The queue is unbounded by default per the recommendations on an
 `online article <https://runebook.dev/en/docs/python/library/logging.handlers/logging.handlers.QueueListener>`_.
+A maximum size can be configured through :func:`outgoing_requests_handler_factory`,
+see :class:`QueueHandler` for the available overflow policies.
+
+The queue size and the number of records put on/taken from the queue are reported to
+the configured metrics sink, see :mod:`log_outgoing_requests.metrics`.
+"""
 
-TODO: it would probably be wise to monitor the queue size or when items get put on/taken
-from the queue, e.g. with an OTel gauge instrument.
+_queue_maxsize: int | None = None
 """
+The maximum queue size configured through :func:`outgoing_requests_handler_factory`.
 
-_listener: QueueListener | None = None
+All queue handlers share the queue, so they must agree on its size. ``None`` until a
+handler is created.
 """
-Queue listener singleton, ``None`` when it's not yet initialized.
+
+_listeners: list[QueueListener] = []
+"""
+Queue listeners (one per writer thread), empty when they're not yet initialized.
 
 Usually, the handler factory will result in the listener being initialized, but in
 process-forking environments like uwsgi and celery workers, this is deferred until
@@ -96,19 +120,124 @@ Note that Django's runserver runs in a subprocess, while typical production depl
 run multiple threads in one or more uwsgi/gunicorn processes.
 """
 
+_sqlite_write_lock = threading.Lock()
+"""
+Serialize the database writes of the writer threads on SQLite.
+
+SQLite allows only a single writer at a time - concurrent writes from the writer threads
+fail with "database is locked" errors rather than waiting for each other.
+"""
+
+
+def _serialize_sqlite_writes(func: Callable[..., None]) -> Callable[..., None]:
+    """
+    Let the writer threads take turns writing to the database when it's SQLite.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        from .models import OutgoingRequestsLog
+
+        db_alias = router.db_for_write(OutgoingRequestsLog)
+        if connections[db_alias].vendor != "sqlite":
+            return func(*args, **kwargs)
+        with _sqlite_write_lock:
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+class QueueListener(_QueueListener):
+    """
+    Flush the database handler buffers when they're due, even if no new records arrive.
+
+    The stdlib implementation blocks until a new record is put on the queue. Instead,
+    we wait for a new record until the earliest flush deadline of the handlers, so that
+    buffered records are written on time on quiet processes too.
+    """
+
+    def dequeue(self, block: bool) -> logging.LogRecord:
+        while True:
+            try:
+                record = self.queue.get(block=block, timeout=self._get_timeout())
+            except queue.Empty:
+                if not block:
+                    raise
+                self._flush_due_handlers()
+                continue
+            if record is self._sentinel:
+                self._shutdown_handlers()
+            return record
+
+    def enqueue_sentinel(self) -> None:
+        # the queue may be bounded and full - wait until the listener made room rather
+        # than failing to stop it
+        self.queue.put(self._sentinel)
+
+    def _get_timeout(self) -> float | None:
+        deadlines = [
+            deadline
+            for handler in self.handlers
+            if isinstance(handler, DatabaseOutgoingRequestsHandler)
+            and (deadline := handler.flush_deadline) is not None
+        ]
+        if not deadlines:
+            return None
+        return max(min(deadlines) - time.monotonic(), 0)
+
+    def _flush_due_handlers(self) -> None:
+        for handler in self.handlers:
+            if isinstance(handler, DatabaseOutgoingRequestsHandler):
+                handler.flush_if_due()
+
+    def _shutdown_handlers(self) -> None:
+        # write the remaining buffered records from this writer thread, and release its
+        # database connection(s) before the thread exits
+        for handler in self.handlers:
+            handler.flush()
+        connections.close_all()
+
+    def join(self) -> None:
+        """
+        Wait for the thread to finish, after the sentinel has been enqueued.
+        """
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def _copy_handler(handler: logging.Handler) -> logging.Handler:
+    if isinstance(handler, DatabaseOutgoingRequestsHandler):
+        return handler.copy()
+    # other handlers are shared between the writer threads, the handler lock serializes
+    # the calls
+    return handler
+
 
 def get_listener() -> QueueListener | None:
     # Test helper to inspect the listener state.
-    return _listener
+    return _listeners[0] if _listeners else None
+
+
+def get_listeners() -> list[QueueListener]:
+    # Test helper to inspect the listener state.
+    return list(_listeners)
 
 
-def ensure_listener(*handlers: logging.Handler, _defer: bool) -> queue.Queue:
+def ensure_listener(
+    *handlers: logging.Handler, _defer: bool, num_writers: int = 1
+) -> queue.Queue:
     """
     Ensure a listener thread is running for :class:`QueueHandler`.
 
-    Creates a queue if it doesn't exist yet, and starts the background thread to
+    Creates a queue if it doesn't exist yet, and starts the background thread(s) to
     listen to the queue to actually process the log records.
 
+    With more than one writer, every writer thread consumes the shared queue with its
+    own copy of the database handler(s), so each thread has its own buffer and database
+    connection and the database writes happen in parallel. The order in which records
+    are written is then no longer guaranteed.
+
     We don't bother with preventing a background thread in the main runserver process
     that reloads the code and restarts the server - we don't expect any audit logs to
     be created there, and trying to detect these situations is too fragile compared
@@ -117,11 +246,15 @@ def ensure_listener(*handlers: logging.Handler, _defer: bool) -> queue.Queue:
 
     :arg _defer: Defer starting the background tread or not - by default on uwsgi we
       defer the startup and call te actual startup in te post fork hook.
+    :arg num_writers: Number of writer threads to start.
     """
-    global _listener, _queue
+    global _listeners, _queue
+
+    if num_writers < 1:
+        raise ValueError("At least one writer thread is required.")
 
     def _ensure_listener(*args, **kwargs):
-        return ensure_listener(*handlers, _defer=False)
+        return ensure_listener(*handlers, _defer=False, num_writers=num_writers)
 
     # we can't reliably use os.register_at_fork as it requires uwsgi's
     # py-call-uwsgi-fork-hooks flag, which can cause segfaults on Python 3.12:
@@ -140,39 +273,102 @@ def ensure_listener(*handlers: logging.Handler, _defer: bool) -> queue.Queue:
 
     # if a listener already exists, or if we must defer, short circuit and return the
     # queue already
-    if _defer or _listener is not None:
+    if _defer or _listeners:
         return _queue
 
     with _lock:
-        _listener = QueueListener(_queue, *handlers, respect_handler_level=True)
-        _listener.start()
+        for index in range(num_writers):
+            writer_handlers = (
+                handlers if index == 0 else [_copy_handler(h) for h in handlers]
+            )
+            listener = QueueListener(
+                _queue, *writer_handlers, respect_handler_level=True
+            )
+            listener.start()
+            _listeners.append(listener)
         atexit.register(_stop_listener)
         return _queue
 
 
 def _stop_listener():
     """
-    Shut down (and drain) the listener thread/queue.
+    Shut down (and drain) the listener threads/queue.
+
+    Every writer thread stops after taking a sentinel from the shared queue, so all
+    sentinels are enqueued before waiting for the threads - any thread may pick up any
+    sentinel. The sentinels are queued after the pending records, so the queue is
+    drained before the threads stop.
     """
-    global _listener
+    global _listeners, _queue_maxsize
 
     with _lock:
-        if _listener is None:
+        # the queue handlers are reconfigured when the listeners are started again
+        _queue_maxsize = None
+        _queue.maxsize = 0
+        if not _listeners:
             return
         try:
-            _listener.stop()  # drains the queue before stopping
+            for listener in _listeners:
+                listener.enqueue_sentinel()
+            for listener in _listeners:
+                listener.join()
         finally:
-            _listener = None
+            _listeners = []
 
 
 class QueueHandler(_QueueHandler):
     """
-    Keep the raw log record and drop streaming responses.
+    Queue a snapshot of the request log records for the database handler.
 
     The stdlib implementation by default formats the log record to a string and clears
-    most attributes to make them pickleable.
+    most attributes to make them pickleable. Instead, we reduce the record to the
+    details that will be saved to the database, see :meth:`prepare`.
+
+    When the queue is full (because the database can't keep up), the overflow policy
+    decides what happens with new records:
+
+    ``drop_newest``
+        Discard the new record.
+    ``drop_oldest``
+        Discard the oldest queued record(s) to make room for the new record.
+    ``block``
+        Wait up to ``block_timeout`` seconds for room in the queue, and discard the new
+        record if there still is none. Note that this slows down the application.
+    ``metadata_only``
+        Keep queueing records, but drop their request and response bodies once
+        ``max_size`` records are queued. The queue itself should be unbounded for this
+        policy.
+
+    The number of dropped and degraded records are tracked in :attr:`num_dropped` and
+    :attr:`num_degraded`.
     """
 
+    num_dropped: int
+    num_degraded: int
+
+    def __init__(
+        self,
+        queue: queue.Queue,
+        *,
+        overflow_policy: OverflowPolicy = "drop_newest",
+        max_size: int = 0,
+        block_timeout: float = 1.0,
+        metrics_sink: MetricsSink | None = None,
+    ):
+        if overflow_policy not in get_args(OverflowPolicy.__value__):
+            raise ValueError(f"Unknown overflow policy: {overflow_policy!r}")
+        super().__init__(queue)
+        self.overflow_policy = overflow_policy
+        self.max_size = max_size
+        self.block_timeout = block_timeout
+        self.metrics_sink = metrics.guard(metrics_sink)
+
+        # the counters are only modified in ``emit``, which runs with the handler lock
+        # acquired
+        self.num_dropped = 0
+        self.num_degraded = 0
+        self._overflowing = False
+
     def filter(self, record: AnyLogRecord) -> bool | logging.LogRecord:
         """
         Prevent unconsumed response bodies from being passed to the actual handler.
@@ -182,13 +378,41 @@ class QueueHandler(_QueueHandler):
         chunked transfer encodings where there's no content-length header available
         where we check the size of `response.content` to decide if we can save the body
         to the database or not.
+
+        Records that are sampled out (see :mod:`log_outgoing_requests.sampling`) are
+        discarded before their body is consumed.
+
+        Errors (e.g. when the configuration can't be loaded) are reported through
+        :meth:`handleError` and the record is discarded - logging must not break the
+        requests made by the application.
         """
+        try:
+            return self._filter(record)
+        except Exception:
+            self.handleError(record)
+            return False
+
+    def _filter(self, record: AnyLogRecord) -> bool | logging.LogRecord:
+        from .config_cache import get_config
 
         # if it's not a log record produced by us, don't even bother sending it up the
         # queue
         if not is_any_request_log_record(record):
             return False
 
+        # no point in queueing records that won't be saved
+        config = get_config()
+        if not config.save_logs_enabled:
+            return False
+
+        # decide before the body is consumed, so that discarded records are cheap
+        config = apply_logging_rules(config, get_request_url(record))
+        if config is None:
+            return False
+        if not is_record_sampled(record, config):
+            self.metrics_sink.increment(metrics.RECORDS_SAMPLED_OUT)
+            return False
+
         response: Response | None = None
 
         if is_request_log_record(record):
@@ -214,16 +438,312 @@ class QueueHandler(_QueueHandler):
             # checking the response content.
             _ = response.content
 
+        # pass the configuration the rules resolved to on to prepare, so that they're
+        # only applied once
+        record.outgoing_requests_config = config
         return super().filter(record)
 
-    def prepare(self, record: logging.LogRecord):
-        return record
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Reduce the record to a snapshot of the details to save to the database.
+
+        The snapshot is taken with the configuration :meth:`filter` resolved for the
+        record. The original record is left untouched, as other handlers may still
+        process it. The queued copy no longer references the request, response and
+        exception (traceback) so that they can be garbage collected.
+        """
+        from .config_cache import get_config
+
+        assert is_any_request_log_record(record)
+        config: OutgoingRequestsLogConfig | None = getattr(
+            record, "outgoing_requests_config", None
+        )
+        if config is None:  # not filtered by this handler
+            config = get_config()
+            config = apply_logging_rules(config, get_request_url(record)) or config
+        snapshot = take_snapshot(record, config)
+
+        prepared = copy.copy(record)
+        for attr in (
+            "req",
+            "res",
+            "request_exception",
+            "captured_body",
+            "outgoing_requests_config",
+        ):
+            prepared.__dict__.pop(attr, None)
+        prepared.args = None
+        prepared.exc_info = None
+        prepared.exc_text = None
+        prepared.snapshot = snapshot
+        return prepared
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        match self.overflow_policy:
+            case "drop_newest":
+                try:
+                    self.queue.put_nowait(record)
+                except queue.Full:
+                    self._record_overflow(dropped=1)
+                    return
+            case "drop_oldest":
+                num_dropped = 0
+                while True:
+                    try:
+                        self.queue.put_nowait(record)
+                        break
+                    except queue.Full:
+                        pass
+                    try:
+                        oldest = self.queue.get_nowait()
+                    except queue.Empty:  # pragma: no cover - drained concurrently
+                        continue
+                    self.queue.task_done()
+                    if oldest is QueueListener._sentinel:
+                        # a listener is shutting down and must still receive its
+                        # sentinel - it keeps draining the queue until it does, so
+                        # there will be room. The new record is discarded instead.
+                        self.queue.put(oldest)
+                        self._record_overflow(dropped=num_dropped + 1)
+                        return
+                    num_dropped += 1
+                if num_dropped:
+                    self._record_overflow(dropped=num_dropped)
+                    self._report_enqueued()
+                    return
+            case "block":
+                try:
+                    self.queue.put(record, timeout=self.block_timeout)
+                except queue.Full:
+                    self._record_overflow(dropped=1)
+                    return
+            case "metadata_only":
+                if self.max_size and self.queue.qsize() >= self.max_size:
+                    record.snapshot.req_body = record.snapshot.res_body = None
+                    self.queue.put_nowait(record)
+                    self._record_overflow(degraded=1)
+                    return
+                self.queue.put_nowait(record)
+
+        self._overflowing = False
+        self._report_enqueued()
+
+    def _report_enqueued(self) -> None:
+        self.metrics_sink.increment(metrics.RECORDS_ENQUEUED)
+        self.metrics_sink.set_gauge(metrics.QUEUE_DEPTH, self.queue.qsize())
+
+    def _record_overflow(self, *, dropped: int = 0, degraded: int = 0) -> None:
+        self.num_dropped += dropped
+        self.num_degraded += degraded
+        if dropped:
+            self.metrics_sink.increment(metrics.RECORDS_DROPPED, dropped)
+        if degraded:
+            self.metrics_sink.increment(metrics.RECORDS_DEGRADED, degraded)
+            self._report_enqueued()
+        # only warn once when the queue starts overflowing, rather than for every
+        # record
+        if not self._overflowing:
+            self._overflowing = True
+            logger.warning(
+                "Outgoing request log queue is full (policy: %s), log records are "
+                "being %s",
+                self.overflow_policy,
+                "degraded" if degraded else "dropped",
+            )
+
+
+def enqueue_snapshot(snapshot: RequestLogSnapshot) -> bool:
+    """
+    Queue a snapshot for the database writer threads, bypassing the logging handlers.
+
+    Nothing is read from the database and the queue is never waited for, so this can be
+    called at any point - e.g. from a garbage collection callback, which may run in the
+    middle of a query or transaction of the current thread.
+
+    :returns: Whether the snapshot was queued. This requires the queue to be set up by
+      :func:`outgoing_requests_handler_factory`, and the queue not to be full.
+    """
+    if _queue_maxsize is None:
+        return False
+    record = logging.makeLogRecord(
+        {"levelno": logging.DEBUG, "levelname": "DEBUG", "snapshot": snapshot}
+    )
+    try:
+        _queue.put_nowait(record)
+    except queue.Full:
+        return False
+    return True
 
 
 def format_headers(headers: Mapping[str, str]):
     return "\n".join(f"{k}: {v}" for k, v in headers.items())
 
 
+def get_request_url(record: RequestLogRecord | ErrorRequestLogRecord) -> str:
+    """
+    Get the URL of the request of a log record, empty if it's unknown.
+    """
+    if is_request_log_record(record):
+        request = record.req
+    else:
+        request = record.request_exception.request
+    return (request.url if request else None) or ""
+
+
+def _should_record(body: ProcessedBody) -> bool:
+    return body.allow_saving_to_db or body.too_large
+
+
+def take_snapshot(
+    record: RequestLogRecord | ErrorRequestLogRecord,
+    config: OutgoingRequestsLogConfig,
+) -> RequestLogSnapshot:
+    """
+    Extract the details to save to the database from a request log record.
+
+    The request and response bodies are only included if the configuration allows
+    saving them, and their content type and size are acceptable.
+    """
+    from .utils import format_exception, process_body
+
+    # check if we're dealing with success or error state
+    response: Response | None
+    exception: RequestException | None = None
+    if is_request_log_record(record):
+        # we have a response - this is the 'happy' flow (connectivity is okay)
+        request = record.req
+        response = record.res
+    else:
+        # we have an requests-specific exception
+        exception = record.request_exception
+        request = exception.request
+        assert isinstance(request, PreparedRequest)
+        response = exception.response  # likely None
+
+    scrubbed_req_headers = request.headers.copy() if request else {}
+    if "Authorization" in scrubbed_req_headers:
+        scrubbed_req_headers["Authorization"] = "***hidden***"
+
+    parsed_url = urlparse(request.url) if request else None
+
+    snapshot = RequestLogSnapshot(
+        created=record.created,
+        url=request.url if request else "(unknown)",
+        hostname=parsed_url.netloc if parsed_url else "(unknown)",
+        params=parsed_url.params if parsed_url else "(unknown)",
+        status_code=response.status_code if response is not None else None,
+        method=request.method if request else "(unknown)",
+        response_ms=(
+            int(response.elapsed.total_seconds() * 1000) if response is not None else 0
+        ),
+        req_headers=format_headers(scrubbed_req_headers),
+        res_headers=format_headers(response.headers if response is not None else {}),
+        trace="\n".join(format_exception(exception)) if exception else "",
+    )
+    snapshot.sample_rate = get_sample_rate(
+        config,
+        hostname=snapshot.hostname,
+        status_code=snapshot.status_code,
+        response_ms=snapshot.response_ms,
+    )
+
+    if config.save_body_enabled:
+        # check request - bodies that are too large are recorded without content
+        if request and _should_record(
+            processed_request_body := process_body(request, config)
+        ):
+            snapshot.req_body = processed_request_body
+
+        # check response
+        if response is not None and _should_record(
+            processed_response_body := process_body(
+                response,
+                config,
+                is_stream=record.stream,
+                captured=getattr(record, "captured_body", None),
+            )
+        ):
+            snapshot.res_body = processed_response_body
+
+    return snapshot
+
+
+def build_log(snapshot: RequestLogSnapshot) -> OutgoingRequestsLog:
+    """
+    Create the (unsaved) database record for a snapshot.
+    """
+    from .models import OutgoingRequestsLog
+
+    # ensure we have a timezone aware timestamp. time.time() is platform dependent
+    # about being UTC or a local time. A robust way is checking how many seconds ago
+    # this record was created, and subtracting that from the current tz aware time.
+    time_delta_logged_seconds = time.time() - snapshot.created
+    timestamp = timezone.now() - timedelta(seconds=time_delta_logged_seconds)
+
+    kwargs = {
+        "url": snapshot.url,
+        "hostname": snapshot.hostname,
+        "params": snapshot.params,
+        "status_code": snapshot.status_code,
+        "method": snapshot.method,
+        "timestamp": timestamp,
+        "response_ms": snapshot.response_ms,
+        "req_headers": snapshot.req_headers,
+        "res_headers": snapshot.res_headers,
+        "trace": snapshot.trace,
+        "sample_rate": snapshot.sample_rate,
+    }
+    if (req_body := snapshot.req_body) is not None:
+        kwargs.update(
+            {
+                "req_content_type": req_body.content_type,
+                "req_body": req_body.content,
+                "req_body_size": len(req_body.content),
+                "req_body_encoding": req_body.encoding,
+                "req_body_too_large": req_body.too_large,
+            }
+        )
+    if (res_body := snapshot.res_body) is not None:
+        kwargs.update(
+            {
+                "res_content_type": res_body.content_type,
+                "res_body": res_body.content,
+                "res_body_size": len(res_body.content),
+                "res_body_encoding": res_body.encoding,
+                "res_body_too_large": res_body.too_large,
+            }
+        )
+
+    return OutgoingRequestsLog(**kwargs)
+
+
+def save_logs(logs: list[OutgoingRequestsLog]) -> None:
+    """
+    Save the log records, together with their bodies, and add them to the hourly
+    statistics.
+
+    The shared bodies are marked as used in the same transaction, so that pruning can't
+    delete them before the log records referencing them are saved. The files in the
+    body storage can't be rolled back, so they're deleted when the transaction fails.
+    The statistics are updated in the same database as the log records.
+    """
+    from .bodies import delete_stored_bodies, prepare_bodies
+    from .models import OutgoingRequestsLog
+    from .stats import update_hourly_stats
+
+    using = router.db_for_write(OutgoingRequestsLog)
+    stored_bodies: list[str] = []
+    try:
+        with transaction.atomic(using=using):
+            stored_bodies = prepare_bodies(logs)
+            OutgoingRequestsLog.objects.bulk_create(logs)
+    except Exception:
+        # nothing references the files anymore, so pruning would never find them
+        delete_stored_bodies(stored_bodies)
+        raise
+    update_hourly_stats(logs, using=using)
+
+
 class DatabaseOutgoingRequestsHandler(logging.Handler):
     """
     Save the log record to the database if conditions are met.
@@ -236,6 +756,13 @@ class DatabaseOutgoingRequestsHandler(logging.Handler):
         * the size of the body does not exceed the configured treshold
 
     If any of the conditions don't match, then the body is omitted.
+
+    In queue mode, records are buffered and written in batches. The buffer is flushed
+    when it's full or when the oldest write is more than ``flush_interval`` seconds ago.
+    If ``max_buffer_size`` is larger than ``buffer_size``, the batch size adapts to the
+    load: it doubles every time the buffer fills up (up to ``max_buffer_size``) and
+    halves every time the buffer is flushed because of the flush interval (down to
+    ``buffer_size``).
     """
 
     buffer: list[OutgoingRequestsLog]
@@ -245,145 +772,156 @@ class DatabaseOutgoingRequestsHandler(logging.Handler):
         *,
         use_queue_mode: bool = False,
         buffer_size: int = 5,
+        max_buffer_size: int | None = None,
         flush_interval: float = 3.0,
+        metrics_sink: MetricsSink | None = None,
         **kwargs,
     ):
+        if buffer_size < 1:
+            raise ValueError(f"Buffer size must be at least 1, got {buffer_size!r}")
+        if max_buffer_size is not None and max_buffer_size < buffer_size:
+            raise ValueError(
+                f"Maximum buffer size {max_buffer_size!r} is smaller than the buffer "
+                f"size {buffer_size!r}"
+            )
+        if flush_interval <= 0:
+            raise ValueError(f"Flush interval must be positive, got {flush_interval!r}")
+
         super().__init__(**kwargs)
 
         # store configuration options
         self.use_queue_mode = use_queue_mode
+        # without queue, every record is written immediately
         self.buffer_size = buffer_size if use_queue_mode else 1
+        self.max_buffer_size = (max_buffer_size or buffer_size) if use_queue_mode else 1
         self.flush_interval = flush_interval
+        self.metrics_sink = metrics.guard(metrics_sink)
 
         # track internal buffer state
         self.buffer = []
+        self.batch_size = self.buffer_size
         self._last_flush = time.monotonic()
 
+    def copy(self) -> DatabaseOutgoingRequestsHandler:
+        """
+        Create a handler with the same options, but its own (empty) buffer.
+        """
+        handler = type(self)(
+            use_queue_mode=self.use_queue_mode,
+            buffer_size=self.buffer_size,
+            max_buffer_size=self.max_buffer_size,
+            flush_interval=self.flush_interval,
+            metrics_sink=self.metrics_sink,
+            level=self.level,
+        )
+        handler.filters = list(self.filters)
+        handler.formatter = self.formatter
+        return handler
+
+    @property
+    def flush_deadline(self) -> float | None:
+        """
+        The (monotonic) time at which the buffered records must be written.
+        """
+        if not self.buffer:
+            return None
+        return self._last_flush + self.flush_interval
+
+    def flush_if_due(self) -> None:
+        """
+        Flush the buffer if the flush interval has passed.
+
+        Called from the queue listener when no new records arrived in time.
+        """
+        with self.lock:
+            deadline = self.flush_deadline
+            if deadline is None or time.monotonic() < deadline:
+                return
+            try:
+                self._flush()
+            except Exception as exc:
+                self._handle_flush_error(exc)
+            self._shrink_batch()
+
     def emit(self, record: logging.LogRecord):
+        if self.use_queue_mode:
+            self.metrics_sink.increment(metrics.RECORDS_DEQUEUED)
+            self.metrics_sink.set_gauge(metrics.QUEUE_DEPTH, _queue.qsize())
+
         try:
             self._emit_to_db(record)
         except Exception as exc:
             self.handleError(record)
-
             # XXX: should we add explicit transaction savepoint so we can recover when
             # running in the main thread?
-            logger.error("log_saving_failed", exc_info=exc)
-            if on_error := settings.LOG_OUTGOING_REQUESTS_HANDLER_ON_ERROR:
-                on_error(exc)
+            self._handle_flush_error(exc)
+
+    def _handle_flush_error(self, exc: Exception) -> None:
+        self.metrics_sink.increment(metrics.HANDLER_ERRORS)
+        logger.error("log_saving_failed", exc_info=exc)
+        if on_error := settings.LOG_OUTGOING_REQUESTS_HANDLER_ON_ERROR:
+            on_error(exc)
 
     def _emit_to_db(self, record: AnyLogRecord) -> None:
-        from .models import OutgoingRequestsLog, OutgoingRequestsLogConfig
-        from .utils import format_exception, process_body
+        from .config_cache import get_config
+
+        # records from the queue have already been reduced to a snapshot
+        snapshot: RequestLogSnapshot | None = getattr(record, "snapshot", None)
 
         # skip requests not coming from the library requests
-        if not record or not is_any_request_log_record(record):
+        if snapshot is None and not is_any_request_log_record(record):
             return
 
         self._maybe_close_old_connections()
 
-        config = OutgoingRequestsLogConfig.get_solo()
+        config = get_config()
         if not config.save_logs_enabled:
             return
 
-        # check if we're dealing with success or error state
-        response: Response | None
-        exception: RequestException | None = None
-        if is_request_log_record(record):
-            # we have a response - this is the 'happy' flow (connectivity is okay)
-            request = record.req
-            response = record.res
-        elif is_error_request_log_record(record):
-            # we have an requests-specific exception
-            exception = record.request_exception
-            request = exception.request
-            assert isinstance(request, PreparedRequest)
-            response = exception.response  # likely None
-        else:  # pragma: no cover
-            logger.debug("Received log record that cannot be handled %r", record)
-            return
-
-        scrubbed_req_headers = request.headers.copy() if request else {}
-        if "Authorization" in scrubbed_req_headers:
-            scrubbed_req_headers["Authorization"] = "***hidden***"
-
-        parsed_url = urlparse(request.url) if request else None
-
-        # ensure we have a timezone aware timestamp. time.time() is platform dependent
-        # about being UTC or a local time. A robust way is checking how many seconds ago
-        # this record was created, and subtracting that from the current tz aware time.
-        time_delta_logged_seconds = time.time() - record.created
-        timestamp = timezone.now() - timedelta(seconds=time_delta_logged_seconds)
-
-        kwargs = {
-            "url": request.url if request else "(unknown)",
-            "hostname": parsed_url.netloc if parsed_url else "(unknown)",
-            "params": parsed_url.params if parsed_url else "(unknown)",
-            "status_code": response.status_code if response is not None else None,
-            "method": request.method if request else "(unknown)",
-            "timestamp": timestamp,
-            "response_ms": (
-                int(response.elapsed.total_seconds() * 1000)
-                if response is not None
-                else 0
-            ),
-            "req_headers": format_headers(scrubbed_req_headers),
-            "res_headers": format_headers(
-                response.headers if response is not None else {}
-            ),
-            "trace": "\n".join(format_exception(exception)) if exception else "",
-        }
-
-        if config.save_body_enabled:
-            # check request
-            if (
-                request
-                and (
-                    processed_request_body := process_body(request, config)
-                ).allow_saving_to_db
-            ):
-                kwargs.update(
-                    {
-                        "req_content_type": processed_request_body.content_type,
-                        "req_body": processed_request_body.content,
-                        "req_body_encoding": processed_request_body.encoding,
-                    }
-                )
-
-            # check response
-            if (
-                response is not None
-                and (
-                    processed_response_body := process_body(
-                        response, config, is_stream=record.stream
-                    )
-                ).allow_saving_to_db
-            ):
-                kwargs.update(
-                    {
-                        "res_content_type": processed_response_body.content_type,
-                        "res_body": processed_response_body.content,
-                        "res_body_encoding": processed_response_body.encoding,
-                    }
-                )
-
-        self.buffer.append(OutgoingRequestsLog(**kwargs))
+        if snapshot is None:
+            assert is_any_request_log_record(record)
+            # queued records have been filtered by the queue handler already
+            config = apply_logging_rules(config, get_request_url(record))
+            if config is None:
+                return
+            if not is_record_sampled(record, config):
+                self.metrics_sink.increment(metrics.RECORDS_SAMPLED_OUT)
+                return
+            snapshot = take_snapshot(record, config)
+
+        self.buffer.append(build_log(snapshot))
         # check if we need to flush the buffer
         now = time.monotonic()
-        if (
-            len(self.buffer) >= self.buffer_size
-            or (now - self._last_flush) > self.flush_interval
-        ):
+        if len(self.buffer) >= self.batch_size:
+            self._flush()
+            self._grow_batch()
+        elif (now - self._last_flush) > self.flush_interval:
             self._flush()
+            self._shrink_batch()
+
+    def _grow_batch(self) -> None:
+        self.batch_size = min(self.batch_size * 2, self.max_buffer_size)
+
+    def _shrink_batch(self) -> None:
+        self.batch_size = max(self.batch_size // 2, self.buffer_size)
 
+    @_serialize_sqlite_writes
     def _flush(self):
         """
         Flush the buffer to the database.
         """
-        from .models import OutgoingRequestsLog
-
-        OutgoingRequestsLog.objects.bulk_create(self.buffer)
-        self.buffer = []
+        # take the records out of the buffer first - if they can't be saved, they're
+        # discarded rather than written (and failing) again with every next flush
+        buffer, self.buffer = self.buffer, []
         self._last_flush = time.monotonic()
+        num_records = len(buffer)
+        start = time.perf_counter()
+        save_logs(buffer)
+        if num_records:
+            self.metrics_sink.observe(
+                metrics.FLUSH_DURATION, time.perf_counter() - start
+            )
+            self.metrics_sink.observe(metrics.FLUSH_SIZE, num_records)
         self._maybe_close_old_connections()
 
     def _maybe_close_old_connections(self) -> None:
@@ -394,16 +932,41 @@ class DatabaseOutgoingRequestsHandler(logging.Handler):
         if self.use_queue_mode:
             close_old_connections()
 
+    def flush(self):
+        """
+        Write the buffered records to the database.
+        """
+        with self.lock:
+            if not self.buffer:
+                return
+            try:
+                self._flush()
+            except Exception as exc:
+                self._handle_flush_error(exc)
+
     def close(self):
+        # handlers are closed when logging shuts down or is reconfigured, which must
+        # not fail because the remaining records can't be saved
         try:
-            self._flush()
+            if self.buffer:
+                self._flush()
+        except Exception as exc:
+            self._handle_flush_error(exc)
         finally:
             self._maybe_close_old_connections()
             super().close()
 
 
 def outgoing_requests_handler_factory(
-    *, buffer_size: int = 5, flush_interval: float = 3.0
+    *,
+    buffer_size: int = 5,
+    max_buffer_size: int | None = None,
+    flush_interval: float = 3.0,
+    max_queue_size: int = 0,
+    overflow_policy: OverflowPolicy = "drop_newest",
+    block_timeout: float = 1.0,
+    metrics_sink: MetricsSink | str | None = None,
+    num_writers: int = 1,
 ) -> QueueHandler | DatabaseOutgoingRequestsHandler:
     """
     Create a logging handler instance suitable for production or testing.
@@ -429,14 +992,35 @@ def outgoing_requests_handler_factory(
 
     :arg buffer_size: Maximum size for the internal buffer. Passed along to the
       :class:`DatabaseOutgoingRequestsHandler` initializer.
+    :arg max_buffer_size: Upper limit for the adaptive buffer size. Passed along to
+      the :class:`DatabaseOutgoingRequestsHandler` initializer.
     :arg flush_interval: Maximum age between database writes. Passed along to the
       :class:`DatabaseOutgoingRequestsHandler` initializer.
+    :arg max_queue_size: Maximum number of log records waiting to be written to the
+      database, ``0`` means unbounded. Ignored when not using the queue. The queue is
+      shared by all handlers, so they must use the same maximum size.
+    :arg overflow_policy: What to do with log records when the queue is full, see
+      :class:`QueueHandler`.
+    :arg block_timeout: Maximum number of seconds to wait for room in the queue with
+      the ``block`` overflow policy.
+    :arg metrics_sink: A :class:`log_outgoing_requests.metrics.MetricsSink` instance or
+      the dotted path to a sink class to report the metrics of the handlers to.
+    :arg num_writers: Number of background threads writing the queued records to the
+      database, each with their own buffer and database connection. Ignored when not
+      using the queue.
     """
+    global _queue_maxsize
+
+    if isinstance(metrics_sink, str):
+        metrics_sink = import_string(metrics_sink)()
+
     use_queue: bool = settings.LOG_OUTGOING_REQUESTS_HANDLER_USE_QUEUE
     db_logger_handler = DatabaseOutgoingRequestsHandler(
         use_queue_mode=use_queue,
         buffer_size=buffer_size,
+        max_buffer_size=max_buffer_size,
         flush_interval=flush_interval,
+        metrics_sink=metrics_sink,
     )
 
     # if the project does not opt out of the queue, return the handler as-is which will
@@ -456,5 +1040,22 @@ def outgoing_requests_handler_factory(
         case _:  # pragma: no cover
             _defer = uwsgi is not None
 
-    queue = ensure_listener(db_logger_handler, _defer=_defer)
-    return QueueHandler(queue=queue)
+    queue = ensure_listener(db_logger_handler, _defer=_defer, num_writers=num_writers)
+    # with the metadata_only policy, records are never discarded and the queue must
+    # remain unbounded
+    maxsize = 0 if overflow_policy == "metadata_only" else max_queue_size
+    with _lock:
+        # the queue is shared by all handlers, another handler may rely on its size
+        if _queue_maxsize is not None and _queue_maxsize != maxsize:
+            raise ValueError(
+                f"The log record queue is already configured with a maximum size of "
+                f"{_queue_maxsize}, got {maxsize}"
+            )
+        _queue_maxsize = queue.maxsize = maxsize
+    return QueueHandler(
+        queue,
+        overflow_policy=overflow_policy,
+        max_size=max_queue_size,
+        block_timeout=block_timeout,
+        metrics_sink=metrics_sink,
+    )
@@ -0,0 +1,540 @@
+"""
+Implement support for optional httpx integration.
+
+Outgoing requests made with an :class:`httpx.AsyncClient` can be logged by using the
+logging transport:
+
+.. code-block:: python
+
+    from log_outgoing_requests.httpx import AsyncLoggingTransport
+
+    async with httpx.AsyncClient(transport=AsyncLoggingTransport()) as client:
+        response = await client.get("https://example.com")
+
+The same details as for the requests library are captured, without ever blocking the
+event loop: the log records are put on an :class:`asyncio.Queue` and written to the
+database in batches by an :class:`AsyncDatabaseWriter` task running in the same event
+loop, which runs the queries in a worker thread. The configuration is only loaded in a
+worker thread when the copy cached in the process has expired.
+
+Response bodies are captured while they are being read by the client, up to the
+configured maximum content length - so unlike with the requests library, bodies of
+streamed responses are saved too. The log record is created once the response is
+closed.
+
+Buffered records are written at the end of the flush interval. When the event loop is
+shut down with :func:`asyncio.run`, which cancels the remaining tasks, the writer saves
+the pending records first. Otherwise, close the writer explicitly to avoid losing them:
+
+.. code-block:: python
+
+    await get_async_writer().aclose()
+
+Errors while capturing or saving the records are reported like the errors of the
+logging handler (see ``LOG_OUTGOING_REQUESTS_HANDLER_ON_ERROR``), they never break the
+requests of the application.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import time
+import weakref
+from collections.abc import AsyncIterator, Callable
+from typing import TYPE_CHECKING
+from urllib.parse import urlparse
+
+from django.db import close_old_connections
+
+import httpx
+from asgiref.sync import sync_to_async
+
+from . import metrics
+from .conf import settings
+from .datastructures import ProcessedBody, RequestLogSnapshot
+from .latency import record_latency
+from .metrics import MetricsSink
+from .sampling import get_sample_rate, is_sampled
+
+if TYPE_CHECKING:
+    from .models import OutgoingRequestsLog, OutgoingRequestsLogConfig
+
+__all__ = ["AsyncLoggingTransport", "AsyncDatabaseWriter", "get_async_writer"]
+
+logger = logging.getLogger(__name__)
+
+_writers: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncDatabaseWriter] = (
+    weakref.WeakKeyDictionary()
+)
+"""
+The default writer of each event loop - an :class:`asyncio.Queue` can only be used in
+a single event loop.
+"""
+
+
+def get_async_writer() -> AsyncDatabaseWriter:
+    """
+    Get the default writer for the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        return _writers[loop]
+    except KeyError:
+        writer = _writers[loop] = AsyncDatabaseWriter()
+        return writer
+
+
+class AsyncDatabaseWriter:
+    """
+    Write the captured request logs to the database from an asyncio task.
+
+    Records are buffered and saved with a single query when ``buffer_size`` records are
+    buffered, or when the oldest buffered record is ``flush_interval`` seconds old.
+    When more than ``max_queue_size`` records are waiting, new records are dropped
+    rather than slowing down the application - ``0`` means unbounded.
+    """
+
+    def __init__(
+        self,
+        *,
+        buffer_size: int = 5,
+        flush_interval: float = 3.0,
+        max_queue_size: int = 0,
+        metrics_sink: MetricsSink | None = None,
+    ):
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.metrics_sink = metrics.guard(metrics_sink)
+        self.num_dropped = 0
+
+        self.queue = asyncio.Queue[RequestLogSnapshot | None](maxsize=max_queue_size)
+        self._buffer: list[OutgoingRequestsLog] = []
+        self._task: asyncio.Task | None = None
+        self._overflowing = False
+
+    def enqueue(self, snapshot: RequestLogSnapshot) -> None:
+        """
+        Queue a snapshot to be written to the database, without blocking.
+        """
+        self._ensure_running()
+        try:
+            self.queue.put_nowait(snapshot)
+        except asyncio.QueueFull:
+            self.num_dropped += 1
+            self.metrics_sink.increment(metrics.RECORDS_DROPPED)
+            # only warn once when the queue starts overflowing, rather than for every
+            # record
+            if not self._overflowing:
+                self._overflowing = True
+                logger.warning(
+                    "Outgoing request log queue is full, log records are being dropped"
+                )
+            return
+
+        self._overflowing = False
+        self.metrics_sink.increment(metrics.RECORDS_ENQUEUED)
+        self.metrics_sink.set_gauge(metrics.QUEUE_DEPTH, self.queue.qsize())
+
+    async def aclose(self) -> None:
+        """
+        Write the queued and buffered records and stop the writer task.
+        """
+        if self._task is None or self._task.done():
+            return
+        await self.queue.put(None)
+        await self._task
+        self._task = None
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        from .handlers import build_log
+
+        loop = asyncio.get_running_loop()
+        deadline = 0.0
+
+        try:
+            while True:
+                try:
+                    # unlike asyncio.wait_for, this doesn't swallow the cancellation
+                    # when a record arrives at the same time
+                    async with asyncio.timeout_at(deadline if self._buffer else None):
+                        snapshot = await self.queue.get()
+                except TimeoutError:
+                    await self._flush()
+                    continue
+
+                self.queue.task_done()
+                self.metrics_sink.increment(metrics.RECORDS_DEQUEUED)
+                self.metrics_sink.set_gauge(metrics.QUEUE_DEPTH, self.queue.qsize())
+                # sentinel, stop the writer
+                if snapshot is None:
+                    await self._flush()
+                    return
+
+                if not self._buffer:
+                    deadline = loop.time() + self.flush_interval
+                self._buffer.append(build_log(snapshot))
+                if len(self._buffer) >= self.buffer_size:
+                    await self._flush()
+        except asyncio.CancelledError:
+            # the event loop is shutting down without closing the writer (asyncio.run
+            # cancels the remaining tasks) - save the pending records before stopping
+            while not self.queue.empty():
+                snapshot = self.queue.get_nowait()
+                self.queue.task_done()
+                if snapshot is not None:
+                    self._buffer.append(build_log(snapshot))
+            await self._flush()
+            raise
+
+    async def _flush(self) -> None:
+        # take the records out of the buffer first, so that they're not saved again
+        # when the flush is interrupted by the event loop shutting down
+        buffer, self._buffer = self._buffer, []
+        if not buffer:
+            return
+        start = time.perf_counter()
+        try:
+            # compressing the bodies is CPU-bound, keep it out of the event loop
+            await sync_to_async(_save_logs)(buffer)
+        except Exception as exc:
+            self.handle_error(exc)
+        else:
+            self.metrics_sink.observe(
+                metrics.FLUSH_DURATION, time.perf_counter() - start
+            )
+            self.metrics_sink.observe(metrics.FLUSH_SIZE, len(buffer))
+
+    def handle_error(self, exc: Exception) -> None:
+        """
+        Report an error while capturing or saving the records.
+        """
+        self.metrics_sink.increment(metrics.HANDLER_ERRORS)
+        logger.error("log_saving_failed", exc_info=exc)
+        if on_error := settings.LOG_OUTGOING_REQUESTS_HANDLER_ON_ERROR:
+            on_error(exc)
+
+
+class AsyncLoggingTransport(httpx.AsyncBaseTransport):
+    """
+    Log the requests sent through the wrapped transport.
+
+    :param transport: The transport to wrap, by default a regular
+      :class:`httpx.AsyncHTTPTransport`.
+    :param writer: The writer to queue the log records on, by default the writer of the
+      running event loop (see :func:`get_async_writer`).
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport | None = None,
+        *,
+        writer: AsyncDatabaseWriter | None = None,
+    ):
+        self.transport = transport or httpx.AsyncHTTPTransport()
+        self.writer = writer
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        try:
+            config = await _aget_config(str(request.url))
+        except Exception as exc:
+            # e.g. the database is unavailable - make the request without logging it
+            self._get_writer().handle_error(exc)
+            config = None
+        if config is None:
+            if not settings.LOG_OUTGOING_REQUESTS_LATENCY_HISTOGRAMS:
+                return await self.transport.handle_async_request(request)
+            start = time.perf_counter()
+            response = await self.transport.handle_async_request(request)
+            record_latency(
+                request.url.netloc.decode("ascii"),
+                (time.perf_counter() - start) * 1000,
+            )
+            return response
+
+        hostname = request.url.netloc.decode("ascii")
+        created = time.time()
+        start = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except httpx.TransportError as exc:
+            if is_sampled(config, hostname=hostname, status_code=None, response_ms=0):
+                self._enqueue(
+                    functools.partial(
+                        _take_snapshot,
+                        request,
+                        None,
+                        config,
+                        created=created,
+                        response_ms=0,
+                        exc=exc,
+                    )
+                )
+            raise
+
+        response_ms = int((time.perf_counter() - start) * 1000)
+        if settings.LOG_OUTGOING_REQUESTS_LATENCY_HISTOGRAMS:
+            record_latency(hostname, response_ms)
+        # leave the responses that are sampled out alone, their body is not captured
+        if not is_sampled(
+            config,
+            hostname=hostname,
+            status_code=response.status_code,
+            response_ms=response_ms,
+        ):
+            return response
+        # some transports (like httpx.MockTransport) return responses that have been
+        # read already
+        if response.is_closed:
+            self._enqueue(
+                functools.partial(
+                    _take_snapshot,
+                    request,
+                    response,
+                    config,
+                    created=created,
+                    response_ms=response_ms,
+                    res_content=response.content,
+                )
+            )
+            return response
+
+        capture_limit = config.max_content_length if config.save_body_enabled else 0
+        response.stream = _TeeStream(
+            response.stream,  # pyright: ignore[reportArgumentType]
+            max_size=capture_limit,
+            on_close=lambda stream: self._enqueue(
+                lambda: _take_snapshot(
+                    request,
+                    response,
+                    config,
+                    created=created,
+                    response_ms=response_ms,
+                    res_content=stream.get_content(response.headers),
+                    res_too_large=stream.too_large,
+                    exc=stream.exception,
+                )
+            ),
+        )
+        return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+    def _get_writer(self) -> AsyncDatabaseWriter:
+        return self.writer or get_async_writer()
+
+    def _enqueue(self, take_snapshot: Callable[[], RequestLogSnapshot]) -> None:
+        # the snapshot is taken while the application reads the response, errors must
+        # not end up there
+        writer = self._get_writer()
+        try:
+            writer.enqueue(take_snapshot())
+        except Exception as exc:
+            writer.handle_error(exc)
+
+
+class _TeeStream(httpx.AsyncByteStream):
+    """
+    Pass the response body through, while keeping a copy of (at most) ``max_size``
+    bytes.
+    """
+
+    def __init__(self, stream: httpx.AsyncByteStream, *, max_size: int, on_close):
+        self.stream = stream
+        self.max_size = max_size
+        self.on_close = on_close
+        self.exception: Exception | None = None
+        self._chunks: list[bytes] = []
+        self._size = 0
+        self._complete = False
+        self._closed = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in self.stream:
+                self._size += len(chunk)
+                if self._size <= self.max_size:
+                    self._chunks.append(chunk)
+                else:
+                    # too large, release what we have so far
+                    self._chunks = []
+                yield chunk
+        except Exception as exc:
+            self.exception = exc
+            raise
+        self._complete = True
+
+    async def aclose(self) -> None:
+        try:
+            await self.stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self.on_close(self)
+
+    @property
+    def too_large(self) -> bool:
+        return self._size > self.max_size
+
+    def get_content(self, headers: httpx.Headers) -> bytes | None:
+        """
+        Return the decoded body, or ``None`` if it was not (entirely) captured.
+        """
+        if not self._complete or self.too_large:
+            return None
+        raw = b"".join(self._chunks)
+        if "Content-Encoding" not in headers:
+            return raw
+        # let httpx take care of the decompression
+        try:
+            return httpx.Response(200, headers=headers, content=raw).content
+        except httpx.DecodingError:
+            return None
+
+
+def _get_headers(headers: httpx.Headers) -> dict[str, str]:
+    # httpx normalizes the header names to lowercase, the raw headers preserve the
+    # original casing
+    return {
+        name.decode(headers.encoding): value.decode(headers.encoding)
+        for name, value in headers.raw
+    }
+
+
+def _process_body(
+    message: httpx.Request | httpx.Response,
+    content: bytes | None,
+    config: OutgoingRequestsLogConfig,
+    *,
+    too_large: bool = False,
+) -> ProcessedBody:
+    from .utils import (
+        check_content_type,
+        get_default_encoding,
+        parse_content_type_header,
+    )
+
+    content_type, encoding = parse_content_type_header(message)  # pyright: ignore
+    if not encoding:
+        encoding = get_default_encoding(content_type)
+    is_loggable = check_content_type(content_type)
+    too_large = is_loggable and (
+        too_large or (content is not None and len(content) > config.max_content_length)
+    )
+    allow_persisting = is_loggable and content is not None and not too_large
+    return ProcessedBody(
+        allow_saving_to_db=allow_persisting,
+        content=content if allow_persisting and content else b"",
+        content_type=content_type,
+        encoding=encoding,
+        too_large=too_large,
+    )
+
+
+def _save_logs(logs: list[OutgoingRequestsLog]) -> None:
+    from .handlers import save_logs
+
+    # like for the thread of the logging handler, Django's request_finished signal
+    # doesn't clean up the connection of the worker thread
+    close_old_connections()
+    try:
+        save_logs(logs)
+    finally:
+        close_old_connections()
+
+
+async def _aget_config(url: str) -> OutgoingRequestsLogConfig | None:
+    """
+    Get the configuration for a request, ``None`` if it must not be saved.
+
+    The cached configuration and rules are used as-is, the event loop is only left when
+    they must be loaded from the database.
+    """
+    from .config_cache import get_cached_config
+    from .rules import get_cached_rule_matcher
+
+    if (config := get_cached_config()) is not None:
+        if not config.save_logs_enabled:
+            return None
+        if (matcher := get_cached_rule_matcher(config)) is not None:
+            return matcher.match(url)
+    return await sync_to_async(_get_config)(url)
+
+
+def _get_config(url: str) -> OutgoingRequestsLogConfig | None:
+    """
+    Get the configuration for a request, ``None`` if it must not be saved.
+    """
+    from .config_cache import get_config
+    from .rules import apply_logging_rules
+
+    config = get_config()
+    if not config.save_logs_enabled:
+        return None
+    return apply_logging_rules(config, url)
+
+
+def _take_snapshot(
+    request: httpx.Request,
+    response: httpx.Response | None,
+    config: OutgoingRequestsLogConfig,
+    *,
+    created: float,
+    response_ms: int,
+    res_content: bytes | None = None,
+    res_too_large: bool = False,
+    exc: Exception | None = None,
+) -> RequestLogSnapshot:
+    from .handlers import _should_record, format_headers
+    from .utils import format_exception
+
+    scrubbed_req_headers = _get_headers(request.headers)
+    for name in scrubbed_req_headers:
+        if name.lower() == "authorization":
+            scrubbed_req_headers[name] = "***hidden***"
+
+    url = str(request.url)
+    snapshot = RequestLogSnapshot(
+        created=created,
+        url=url,
+        hostname=request.url.netloc.decode("ascii"),
+        params=urlparse(url).params,
+        status_code=response.status_code if response is not None else None,
+        method=request.method,
+        response_ms=response_ms,
+        req_headers=format_headers(scrubbed_req_headers),
+        res_headers=format_headers(
+            _get_headers(response.headers) if response is not None else {}
+        ),
+        trace="\n".join(format_exception(exc)) if exc else "",
+    )
+    snapshot.sample_rate = get_sample_rate(
+        config,
+        hostname=snapshot.hostname,
+        status_code=snapshot.status_code,
+        response_ms=response_ms,
+    )
+
+    if config.save_body_enabled:
+        try:
+            req_content = request.content
+        except httpx.RequestNotRead:
+            # streaming request body, not captured
+            req_content = None
+        if _should_record(req_body := _process_body(request, req_content, config)):
+            snapshot.req_body = req_body
+
+        if response is not None and _should_record(
+            res_body := _process_body(
+                response, res_content, config, too_large=res_too_large
+            )
+        ):
+            snapshot.res_body = res_body
+
+    return snapshot
@@ -0,0 +1,165 @@
+"""
+In-process latency histograms of the outgoing requests, per hostname.
+
+When ``LOG_OUTGOING_REQUESTS_LATENCY_HISTOGRAMS`` is enabled, the response time of every
+outgoing request (made with requests or through the httpx transport) is recorded in a
+histogram for its hostname, regardless of whether the requests are saved to the
+database. Recording a response time takes constant time, and the histograms take
+constant memory: the buckets grow exponentially, so that every percentile is accurate
+to within 2%.
+
+The histograms are kept per process. Expose them as metrics, e.g. to Prometheus:
+
+.. code-block:: python
+
+    from prometheus_client import REGISTRY
+
+    from log_outgoing_requests.latency import PrometheusLatencyCollector
+
+    REGISTRY.register(PrometheusLatencyCollector())
+
+or read them with :func:`get_latency_histograms`.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from collections.abc import Iterator
+from typing import Any
+
+__all__ = [
+    "LatencyHistogram",
+    "record_latency",
+    "get_latency_histograms",
+    "PrometheusLatencyCollector",
+]
+
+RELATIVE_ACCURACY = 0.02
+MAX_LATENCY_MS = 3_600_000
+"""
+Response times are clamped to between 1 millisecond and an hour.
+"""
+MAX_HOSTNAMES = 200
+"""
+Response times of additional hostnames are recorded under :data:`OTHER_HOSTNAMES`, to
+bound the memory usage.
+"""
+OTHER_HOSTNAMES = "(other)"
+
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+_NUM_BUCKETS = math.ceil(math.log(MAX_LATENCY_MS) / _LOG_GAMMA) + 1
+
+
+class LatencyHistogram:
+    """
+    Histogram of response times with exponentially growing buckets.
+
+    Bucket ``i`` holds the response times between ``γ^(i-1)`` and ``γ^i`` milliseconds,
+    the estimated percentiles are the (harmonic) middle of their bucket. Not
+    thread-safe on its own.
+    """
+
+    __slots__ = ("buckets", "count", "total_ms")
+
+    def __init__(self):
+        self.buckets = [0] * _NUM_BUCKETS
+        self.count = 0
+        self.total_ms = 0.0
+
+    def record(self, ms: float) -> None:
+        ms = min(max(ms, 1), MAX_LATENCY_MS)
+        self.buckets[math.ceil(math.log(ms) / _LOG_GAMMA)] += 1
+        self.count += 1
+        self.total_ms += ms
+
+    def percentile(self, q: float) -> float | None:
+        """
+        Estimate the ``q``-th percentile (0-100) of the response times, in milliseconds.
+        """
+        if not self.count:
+            return None
+        rank = max(self.count * q / 100, 1)
+        cumulative = 0
+        for index, count in enumerate(self.buckets):
+            cumulative += count
+            if cumulative >= rank:
+                return 2 * _GAMMA**index / (_GAMMA + 1)
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    def copy(self) -> LatencyHistogram:
+        histogram = LatencyHistogram()
+        histogram.buckets = self.buckets.copy()
+        histogram.count = self.count
+        histogram.total_ms = self.total_ms
+        return histogram
+
+
+_histograms: dict[str, LatencyHistogram] = {}
+_lock = threading.Lock()
+
+
+def record_latency(hostname: str, ms: float) -> None:
+    """
+    Record the response time of a request.
+
+    Callers check ``LOG_OUTGOING_REQUESTS_LATENCY_HISTOGRAMS`` first.
+    """
+    with _lock:
+        histogram = _histograms.get(hostname)
+        if histogram is None:
+            if len(_histograms) >= MAX_HOSTNAMES:
+                hostname = OTHER_HOSTNAMES
+            histogram = _histograms.setdefault(hostname, LatencyHistogram())
+        histogram.record(ms)
+
+
+def get_latency_histograms(*, reset: bool = False) -> dict[str, LatencyHistogram]:
+    """
+    Get (a copy of) the histograms per hostname, since the process started or the
+    histograms were last reset.
+
+    :arg reset: Start new histograms, e.g. when the returned histograms are exported
+      periodically.
+    """
+    global _histograms
+    with _lock:
+        if reset:
+            histograms, _histograms = _histograms, {}
+            return histograms
+        return {
+            hostname: histogram.copy() for hostname, histogram in _histograms.items()
+        }
+
+
+class PrometheusLatencyCollector:
+    """
+    Prometheus collector reporting the response time percentiles per hostname.
+
+    Requires the ``prometheus-client`` package.
+    """
+
+    quantiles = (0.5, 0.9, 0.95, 0.99)
+
+    def collect(self) -> Iterator[Any]:
+        from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+        durations = GaugeMetricFamily(
+            "log_outgoing_requests_response_time_seconds",
+            "Estimated percentiles of the response times of outgoing requests.",
+            labels=["hostname", "quantile"],
+        )
+        counts = CounterMetricFamily(
+            "log_outgoing_requests_responses",
+            "Number of responses to outgoing requests.",
+            labels=["hostname"],
+        )
+        for hostname, histogram in get_latency_histograms().items():
+            counts.add_metric([hostname], histogram.count)
+            for quantile in self.quantiles:
+                value = histogram.percentile(quantile * 100)
+                assert value is not None
+                durations.add_metric([hostname, str(quantile)], value / 1000)
+        yield durations
+        yield counts
@@ -1,24 +1,183 @@
+from __future__ import annotations
+
+import logging
+import weakref
 from contextlib import contextmanager
+from typing import TYPE_CHECKING
+from urllib.parse import urlparse
 
 from requests import RequestException, Response, Session
+from requests.utils import stream_decode_response_unicode
 
 from . import logger
+from .conf import settings
+from .datastructures import StreamCapture
+from .latency import record_latency
+
+if TYPE_CHECKING:
+    from .models import OutgoingRequestsLogConfig
 
 
 def hook_requests_logging(response: Response, *args, **kwargs):
     """
     A hook for requests library in order to add extra data to the logs.
     """
+    if settings.LOG_OUTGOING_REQUESTS_LATENCY_HISTOGRAMS:
+        record_latency(
+            urlparse(response.request.url).netloc,
+            response.elapsed.total_seconds() * 1000,
+        )
+
+    stream = kwargs.get("stream", False)
+    if stream:
+        try:
+            capture_config = _get_stream_capture(response)
+        except Exception:
+            # logging issues must not break the application
+            logger.warning("Could not set up streamed body capture", exc_info=True)
+            capture_config = None
+        if capture_config is not None:
+            _capture_streamed_body(response, *capture_config)
+            return
+
+    _log_response(response, stream=stream)
+
+
+def _log_response(
+    response: Response, *, stream: bool, captured_body: StreamCapture | None = None
+) -> None:
     logger.debug(
         "outgoing_request_response_received",
         extra={
             "req": response.request,
             "res": response,
-            "stream": kwargs.get("stream", False),
+            "stream": stream,
+            "captured_body": captured_body,
         },
     )
 
 
+def _get_stream_capture(
+    response: Response,
+) -> tuple[StreamCapture, OutgoingRequestsLogConfig] | None:
+    from .config_cache import get_config
+    from .rules import apply_logging_rules
+
+    if not settings.LOG_OUTGOING_REQUESTS_CAPTURE_STREAMED_BODIES:
+        return None
+    config = get_config()
+    if not config.save_logs_enabled:
+        return None
+    config = apply_logging_rules(config, response.request.url or "")
+    if config is None or not config.save_body_enabled:
+        return None
+
+    content_length = response.headers.get("Content-Length", "")
+    capture = StreamCapture(
+        limit=config.max_content_length,
+        size_hint=int(content_length) if content_length.isdigit() else None,
+    )
+    return capture, config
+
+
+def _capture_streamed_body(
+    response: Response, capture: StreamCapture, config: OutgoingRequestsLogConfig
+) -> None:
+    """
+    Tee the response body while the application reads it, and defer logging until
+    the response is read entirely or closed.
+
+    All ways of reading the body (``iter_content``, ``iter_lines``, ``content``...)
+    go through ``iter_content``. The chunks are passed to the application as-is.
+
+    If the response is neither read entirely nor closed (e.g. when the application
+    reads ``response.raw`` instead), it's queued without body once it's garbage
+    collected - see :func:`_log_abandoned_response`.
+    """
+    iter_content = response.iter_content
+    close = response.close
+    # the finalizer must not keep the response alive, so it gets a copy of the details
+    # that are logged
+    finalizer = weakref.finalize(
+        response, _log_abandoned_response, _copy_metadata(response), capture, config
+    )
+    # logging may already be shut down at exit
+    finalizer.atexit = False
+
+    def log_once():
+        # detaching fails if the response was logged already
+        if not finalizer.detach():
+            return
+        capture.close()
+        _log_response(response, stream=True, captured_body=capture)
+
+    def tee(chunks):
+        for chunk in chunks:
+            capture.write(chunk)
+            yield chunk
+        capture.finish()
+        log_once()
+
+    def iter_content_wrapper(chunk_size=1, decode_unicode=False):
+        chunks = tee(iter_content(chunk_size=chunk_size, decode_unicode=False))
+        if decode_unicode:
+            return stream_decode_response_unicode(chunks, response)
+        return chunks
+
+    def close_wrapper():
+        try:
+            close()
+        finally:
+            log_once()
+
+    response.iter_content = iter_content_wrapper  # type: ignore
+    response.close = close_wrapper  # type: ignore
+
+
+def _copy_metadata(response: Response) -> Response:
+    metadata = Response()
+    for attr in ("status_code", "headers", "url", "encoding", "reason", "elapsed"):
+        setattr(metadata, attr, getattr(response, attr))
+    metadata.request = response.request
+    # the body is gone with the original response
+    metadata._content = b""
+    return metadata
+
+
+def _log_abandoned_response(
+    response: Response, capture: StreamCapture, config: OutgoingRequestsLogConfig
+) -> None:
+    """
+    Queue the snapshot of a streamed response that was garbage collected before it was
+    read entirely or closed.
+
+    The garbage collector runs at arbitrary points, possibly in the middle of a query or
+    transaction of the current thread, so the database must not be touched here. The
+    snapshot is taken with the configuration that applied when the response was
+    received, and handed over to the writer threads. Without the queue, the response
+    isn't logged.
+    """
+    from .handlers import enqueue_snapshot, take_snapshot
+    from .sampling import is_record_sampled
+
+    capture.close()
+    record = logging.makeLogRecord(
+        {
+            "name": logger.name,
+            "req": response.request,
+            "res": response,
+            "stream": True,
+            "captured_body": capture,
+        }
+    )
+    try:
+        if is_record_sampled(record, config):
+            enqueue_snapshot(take_snapshot(record, config))
+    except Exception:
+        # exceptions in finalizers are only printed to stderr
+        logger.warning("Could not log abandoned streamed response", exc_info=True)
+
+
 @contextmanager
 def log_errors(*, stream: bool):
     try:
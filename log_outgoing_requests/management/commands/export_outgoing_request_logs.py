@@ -0,0 +1,90 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ...export import FORMATS, export_logs
+from ...models import OutgoingRequestsLog
+
+
+def _datetime(value: str) -> datetime:
+    if (parsed := parse_datetime(value)) is None:
+        raise ValueError(f"Invalid date/time: {value}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = "Export outgoing request logs as NDJSON or CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            choices=list(FORMATS),
+            default="ndjson",
+            help="The export format (default: ndjson).",
+        )
+        parser.add_argument(
+            "--output",
+            help="The file to write the export to (default: stdout).",
+        )
+        parser.add_argument(
+            "--since",
+            type=_datetime,
+            help="Only export logs from this (ISO 8601) date/time on.",
+        )
+        parser.add_argument(
+            "--until",
+            type=_datetime,
+            help="Only export logs before this (ISO 8601) date/time.",
+        )
+        parser.add_argument(
+            "--hostname",
+            help="Only export logs of requests to this hostname.",
+        )
+        parser.add_argument(
+            "--status-code",
+            type=int,
+            help="Only export logs of responses with this status code.",
+        )
+        parser.add_argument(
+            "--bodies",
+            action="store_true",
+            help="Include the request and response bodies.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Number of records to fetch from the database at a time.",
+        )
+
+    def handle(self, *args, **options):
+        logs = OutgoingRequestsLog.objects.order_by("timestamp", "pk")
+        if since := options["since"]:
+            logs = logs.filter(timestamp__gte=since)
+        if until := options["until"]:
+            logs = logs.filter(timestamp__lt=until)
+        if hostname := options["hostname"]:
+            logs = logs.filter(hostname=hostname)
+        if (status_code := options["status_code"]) is not None:
+            logs = logs.filter(status_code=status_code)
+
+        lines = export_logs(
+            logs,
+            format=options["format"],
+            include_bodies=options["bodies"],
+            chunk_size=options["chunk_size"],
+        )
+        if not (output := options["output"]):
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+
+        try:
+            with open(output, "w", encoding="utf-8", newline="") as file:
+                file.writelines(lines)
+        except OSError as exc:
+            raise CommandError(f"Could not write the export: {exc}") from exc
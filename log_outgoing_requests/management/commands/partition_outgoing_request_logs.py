@@ -0,0 +1,53 @@
+from datetime import UTC, datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...partitioning import (
+    convert_to_partitioned_table,
+    create_partitions,
+    is_partitioned,
+    is_partitioning_enabled,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the partitions of the outgoing request logs table ahead of time. "
+        "Requires LOG_OUTGOING_REQUESTS_PARTITION_INTERVAL to be set and PostgreSQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--convert",
+            action="store_true",
+            help="Convert the existing table into a partitioned table first.",
+        )
+        parser.add_argument(
+            "--days-ahead",
+            type=int,
+            default=3,
+            help="Create partitions for this many days ahead (default: 3).",
+        )
+
+    def handle(self, *args, **options):
+        if not is_partitioning_enabled():
+            raise CommandError(
+                "Partitioning requires PostgreSQL and the "
+                "LOG_OUTGOING_REQUESTS_PARTITION_INTERVAL setting."
+            )
+
+        days_ahead: int = options["days_ahead"]
+        if options["convert"]:
+            if is_partitioned():
+                raise CommandError("The table is already partitioned.")
+            convert_to_partitioned_table(days_ahead=days_ahead)
+            self.stdout.write("Converted the outgoing request logs table")
+        elif not is_partitioned():
+            raise CommandError(
+                "The table is not partitioned yet, run the command with --convert."
+            )
+
+        created = create_partitions(
+            until=datetime.now(UTC) + timedelta(days=days_ahead)
+        )
+        self.stdout.write(f"Created {len(created)} partition(s)")
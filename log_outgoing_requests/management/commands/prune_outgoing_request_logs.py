@@ -4,6 +4,33 @@ from ...models import OutgoingRequestsLog
 
 
 class Command(BaseCommand):
-    def handle(self, *args, **kwargs):
-        num_deleted = OutgoingRequestsLog.objects.prune()
+    help = "Delete outgoing request logs older than LOG_OUTGOING_REQUESTS_MAX_AGE."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help=(
+                "Delete the records in batches of this size rather than in a single "
+                "query."
+            ),
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Number of seconds to sleep between batches.",
+        )
+        parser.add_argument(
+            "--time-budget",
+            type=float,
+            help="Stop deleting batches after this many seconds.",
+        )
+
+    def handle(self, *args, **options):
+        num_deleted = OutgoingRequestsLog.objects.prune(
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+            time_budget=options["time_budget"],
+        )
         self.stdout.write(f"Deleted {num_deleted} outgoing request log(s)")
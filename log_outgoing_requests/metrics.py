@@ -0,0 +1,256 @@
+"""
+Metrics about the logging pipeline.
+
+The handlers report the queue depth, the number of enqueued/dequeued/dropped records,
+the number of records discarded by sampling, the size and duration of database
+flushes and handler errors to a metrics sink. This
+allows you to alert before the background thread falls behind.
+
+By default, metrics are discarded. Pass a sink (instance or dotted path to the class) to
+the handler factory to collect them:
+
+.. code-block:: python
+
+    "save_outgoing_requests": {
+        "()": "log_outgoing_requests.handlers.outgoing_requests_handler_factory",
+        "metrics_sink": "log_outgoing_requests.metrics.PrometheusMetricsSink",
+    },
+
+Adapters for OpenTelemetry and the Prometheus client are provided - the respective
+packages are optional dependencies that you must install yourself. Implement your own
+sink by subclassing :class:`MetricsSink`. Errors raised by a sink are logged and
+otherwise ignored, so a broken sink doesn't stop the logs from being saved.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import weakref
+from typing import Any
+
+__all__ = [
+    "MetricsSink",
+    "OpenTelemetryMetricsSink",
+    "PrometheusMetricsSink",
+]
+
+logger = logging.getLogger(__name__)
+
+# metric names
+QUEUE_DEPTH = "queue.depth"
+"""Number of records waiting in the queue (gauge)."""
+RECORDS_ENQUEUED = "records.enqueued"
+"""Number of records put on the queue (counter)."""
+RECORDS_DEQUEUED = "records.dequeued"
+"""Number of records taken from the queue by the background thread (counter)."""
+RECORDS_DROPPED = "records.dropped"
+"""Number of records discarded because the queue was full (counter)."""
+RECORDS_DEGRADED = "records.degraded"
+"""Number of records queued without bodies because the queue was full (counter)."""
+RECORDS_SAMPLED_OUT = "records.sampled_out"
+"""Number of records discarded by the sampling configuration (counter)."""
+FLUSH_SIZE = "flush.size"
+"""Number of records written to the database per flush (histogram)."""
+FLUSH_DURATION = "flush.duration"
+"""Duration of the database writes, in seconds (histogram)."""
+HANDLER_ERRORS = "handler.errors"
+"""Number of errors while processing records (counter)."""
+
+_DESCRIPTIONS = {
+    QUEUE_DEPTH: "Number of outgoing request log records waiting in the queue.",
+    RECORDS_ENQUEUED: "Number of outgoing request log records put on the queue.",
+    RECORDS_DEQUEUED: "Number of outgoing request log records taken from the queue.",
+    RECORDS_DROPPED: "Number of outgoing request log records dropped on overflow.",
+    RECORDS_DEGRADED: "Number of outgoing request log records stripped on overflow.",
+    RECORDS_SAMPLED_OUT: "Number of outgoing request log records not sampled.",
+    FLUSH_SIZE: "Number of outgoing request log records written per flush.",
+    FLUSH_DURATION: "Duration of writing outgoing request logs to the database.",
+    HANDLER_ERRORS: "Number of errors while saving outgoing request logs.",
+}
+
+
+class MetricsSink:
+    """
+    Receive metrics from the logging pipeline - the base implementation discards them.
+
+    Sinks are called from the application threads and the background thread, so
+    implementations must be thread-safe and cheap.
+    """
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """
+        Increment the counter ``name``.
+        """
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """
+        Set the current value of gauge ``name``.
+        """
+
+    def observe(self, name: str, value: float) -> None:
+        """
+        Record a measurement in histogram ``name``.
+        """
+
+
+class GuardedMetricsSink(MetricsSink):
+    """
+    Pass the metrics on to ``sink``, logging its errors instead of raising them.
+
+    An error escaping from the sink would end the background thread, after which the
+    queue is no longer drained. Only the first error for each metric is logged.
+    """
+
+    def __init__(self, sink: MetricsSink):
+        self.sink = sink
+        self._failed: set[str] = set()
+
+    def _report(self, method: str, name: str, value: float) -> None:
+        try:
+            getattr(self.sink, method)(name, value)
+        except Exception:
+            if name not in self._failed:
+                self._failed.add(name)
+                logger.exception("Metrics sink %r failed to report %s", self.sink, name)
+
+    def increment(self, name: str, value: int = 1) -> None:
+        self._report("increment", name, value)
+
+    def set_gauge(self, name: str, value: float) -> None:
+        self._report("set_gauge", name, value)
+
+    def observe(self, name: str, value: float) -> None:
+        self._report("observe", name, value)
+
+
+def guard(sink: MetricsSink | None) -> GuardedMetricsSink:
+    """
+    Wrap ``sink`` (if it isn't already) so that its errors don't propagate.
+
+    Without a sink, the metrics are discarded.
+    """
+    if isinstance(sink, GuardedMetricsSink):
+        return sink
+    return GuardedMetricsSink(sink or MetricsSink())
+
+
+class _LazyInstrumentsMixin:
+    """
+    Create the instruments on first use, once.
+    """
+
+    def __init__(self):
+        self._instruments: dict[str, Any] = {}
+        self._instruments_lock = threading.Lock()
+
+    def _get_instrument(self, name: str) -> Any:
+        try:
+            return self._instruments[name]
+        except KeyError:
+            pass
+        with self._instruments_lock:
+            if name not in self._instruments:
+                self._instruments[name] = self._create_instrument(name)
+            return self._instruments[name]
+
+    def _create_instrument(self, name: str) -> Any:  # pragma: no cover
+        raise NotImplementedError
+
+
+class OpenTelemetryMetricsSink(_LazyInstrumentsMixin, MetricsSink):
+    """
+    Report the metrics through the OpenTelemetry metrics API.
+
+    Requires the ``opentelemetry-api`` package. The instruments are created with the
+    globally configured meter provider, unless a provider is passed explicitly.
+    """
+
+    def __init__(self, meter_provider=None):
+        from opentelemetry import metrics
+
+        super().__init__()
+        self.meter = metrics.get_meter(
+            "log_outgoing_requests", meter_provider=meter_provider
+        )
+
+    def _create_instrument(self, name: str) -> Any:
+        full_name = f"log_outgoing_requests.{name}"
+        description = _DESCRIPTIONS.get(name, "")
+        if name == QUEUE_DEPTH:
+            return self.meter.create_gauge(full_name, description=description)
+        if name in (FLUSH_SIZE, FLUSH_DURATION):
+            unit = "s" if name == FLUSH_DURATION else "{record}"
+            return self.meter.create_histogram(
+                full_name, unit=unit, description=description
+            )
+        return self.meter.create_counter(full_name, description=description)
+
+    def increment(self, name: str, value: int = 1) -> None:
+        self._get_instrument(name).add(value)
+
+    def set_gauge(self, name: str, value: float) -> None:
+        self._get_instrument(name).set(value)
+
+    def observe(self, name: str, value: float) -> None:
+        self._get_instrument(name).record(value)
+
+
+_prometheus_collectors: weakref.WeakKeyDictionary[Any, dict[str, Any]] = (
+    weakref.WeakKeyDictionary()
+)
+"""
+The collectors created per Prometheus registry, by metric name.
+"""
+_prometheus_lock = threading.Lock()
+
+
+class PrometheusMetricsSink(_LazyInstrumentsMixin, MetricsSink):
+    """
+    Report the metrics through the Prometheus client.
+
+    Requires the ``prometheus-client`` package. The metrics are registered in the
+    default registry, unless a registry is passed explicitly. A collector can only be
+    registered once per registry, so the sinks reporting to the same registry (e.g.
+    after the logging configuration is reloaded) share their collectors.
+    """
+
+    def __init__(self, registry=None):
+        import prometheus_client
+
+        super().__init__()
+        self._client = prometheus_client
+        self.registry = registry or prometheus_client.REGISTRY
+
+    def _create_instrument(self, name: str) -> Any:
+        with _prometheus_lock:
+            collectors = _prometheus_collectors.setdefault(self.registry, {})
+            if name not in collectors:
+                collectors[name] = self._create_collector(name)
+            return collectors[name]
+
+    def _create_collector(self, name: str) -> Any:
+        full_name = f"log_outgoing_requests_{name.replace('.', '_')}"
+        description = _DESCRIPTIONS.get(name, name)
+        kwargs = {"registry": self.registry}
+        if name == QUEUE_DEPTH:
+            return self._client.Gauge(full_name, description, **kwargs)
+        if name == FLUSH_DURATION:
+            return self._client.Histogram(f"{full_name}_seconds", description, **kwargs)
+        if name == FLUSH_SIZE:
+            return self._client.Histogram(
+                full_name,
+                description,
+                buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+                **kwargs,
+            )
+        return self._client.Counter(full_name, description, **kwargs)
+
+    def increment(self, name: str, value: int = 1) -> None:
+        self._get_instrument(name).inc(value)
+
+    def set_gauge(self, name: str, value: float) -> None:
+        self._get_instrument(name).set(value)
+
+    def observe(self, name: str, value: float) -> None:
+        self._get_instrument(name).observe(value)
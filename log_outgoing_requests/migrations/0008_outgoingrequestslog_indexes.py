@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("log_outgoing_requests", "0007_outgoingrequestslogconfig_prettify_bodies"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="outgoingrequestslog",
+            index=models.Index(fields=["timestamp"], name="lor_log_timestamp_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="outgoingrequestslog",
+            index=models.Index(
+                fields=["hostname", "timestamp"], name="lor_log_hostname_ts_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="outgoingrequestslog",
+            index=models.Index(
+                fields=["status_code", "timestamp"], name="lor_log_status_ts_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("log_outgoing_requests", "0008_outgoingrequestslog_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="outgoingrequestslog",
+            name="req_body_too_large",
+            field=models.BooleanField(
+                default=False,
+                help_text=(
+                    "The request body was not saved because it exceeds the maximum "
+                    "content length."
+                ),
+                verbose_name="Request body too large",
+            ),
+        ),
+        migrations.AddField(
+            model_name="outgoingrequestslog",
+            name="res_body_too_large",
+            field=models.BooleanField(
+                default=False,
+                help_text=(
+                    "The response body was not saved because it exceeds the maximum "
+                    "content length."
+                ),
+                verbose_name="Response body too large",
+            ),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("log_outgoing_requests", "0009_outgoingrequestslog_body_too_large"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="outgoingrequestslog",
+            name="req_body_codec",
+            field=models.CharField(
+                blank=True,
+                choices=[("", "None"), ("zlib", "zlib"), ("zstd", "zstd")],
+                default="",
+                help_text="Compression codec of the stored request body, if any.",
+                max_length=8,
+                verbose_name="Request body compression",
+            ),
+        ),
+        migrations.AddField(
+            model_name="outgoingrequestslog",
+            name="res_body_codec",
+            field=models.CharField(
+                blank=True,
+                choices=[("", "None"), ("zlib", "zlib"), ("zstd", "zstd")],
+                default="",
+                help_text="Compression codec of the stored response body, if any.",
+                max_length=8,
+                verbose_name="Response body compression",
+            ),
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("log_outgoing_requests", "0010_outgoingrequestslog_body_codec"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutgoingRequestsBody",
+            fields=[
+                (
+                    "hash",
+                    models.CharField(
+                        help_text="The BLAKE2b hash of the (uncompressed) body.",
+                        max_length=64,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="Hash",
+                    ),
+                ),
+                ("content", models.BinaryField(verbose_name="Content")),
+                (
+                    "codec",
+                    models.CharField(
+                        blank=True,
+                        choices=[("", "None"), ("zlib", "zlib"), ("zstd", "zstd")],
+                        default="",
+                        max_length=8,
+                        verbose_name="Compression",
+                    ),
+                ),
+                (
+                    "last_used",
+                    models.DateTimeField(
+                        help_text="When a log record using this body was last saved.",
+                        verbose_name="Last used",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Outgoing request body",
+                "verbose_name_plural": "Outgoing request bodies",
+            },
+        ),
+        migrations.AddField(
+            model_name="outgoingrequestslog",
+            name="req_body_ref",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="log_outgoing_requests.outgoingrequestsbody",
+                verbose_name="Shared request body",
+            ),
+        ),
+        migrations.AddField(
+            model_name="outgoingrequestslog",
+            name="res_body_ref",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="log_outgoing_requests.outgoingrequestsbody",
+                verbose_name="Shared response body",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="outgoingrequestslog",
+            index=models.Index(
+                condition=models.Q(("req_body_ref__isnull", False)),
+                fields=["req_body_ref"],
+                name="lor_log_req_body_ref_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="outgoingrequestslog",
+            index=models.Index(
+                condition=models.Q(("res_body_ref__isnull", False)),
+                fields=["res_body_ref"],
+                name="lor_log_res_body_ref_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("log_outgoing_requests", "0011_outgoingrequestsbody"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="outgoingrequestslog",
+            name="req_body_file",
+            field=models.CharField(
+                blank=True,
+                help_text=(
+                    "The name of the request body file, if it's kept in the body "
+                    "storage."
+                ),
+                max_length=255,
+                verbose_name="Request body file",
+            ),
+        ),
+        migrations.AddField(
+            model_name="outgoingrequestslog",
+            name="res_body_file",
+            field=models.CharField(
+                blank=True,
+                help_text=(
+                    "The name of the response body file, if it's kept in the body "
+                    "storage."
+                ),
+                max_length=255,
+                verbose_name="Response body file",
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:24
+
+from django.db import migrations, models
+from django.db.models.functions import Length
+
+
+def set_body_sizes(apps, _):
+    OutgoingRequestsLog = apps.get_model("log_outgoing_requests", "OutgoingRequestsLog")
+    # only bodies that are saved uncompressed in the record itself can be measured
+    # without loading them
+    for prefix in ("req", "res"):
+        OutgoingRequestsLog.objects.filter(
+            **{
+                f"{prefix}_body_codec": "",
+                f"{prefix}_body_file": "",
+                f"{prefix}_body_ref__isnull": True,
+            }
+        ).update(**{f"{prefix}_body_size": Length(f"{prefix}_body")})
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("log_outgoing_requests", "0012_outgoingrequestslog_body_file"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="outgoingrequestslog",
+            name="req_body_size",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="The size of the saved request body, in bytes.",
+                verbose_name="Request body size",
+            ),
+        ),
+        migrations.AddField(
+            model_name="outgoingrequestslog",
+            name="res_body_size",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="The size of the saved response body, in bytes.",
+                verbose_name="Response body size",
+            ),
+        ),
+        migrations.RunPython(set_body_sizes, migrations.RunPython.noop, elidable=True),
+    ]
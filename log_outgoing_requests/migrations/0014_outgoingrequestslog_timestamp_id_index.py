@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("log_outgoing_requests", "0013_outgoingrequestslog_body_size"),
+    ]
+
+    operations = [
+        # create the new index first, so timestamp range queries are never unindexed
+        migrations.AddIndex(
+            model_name="outgoingrequestslog",
+            index=models.Index(
+                fields=["timestamp", "id"], name="lor_log_timestamp_id_idx"
+            ),
+        ),
+        migrations.RemoveIndex(
+            model_name="outgoingrequestslog",
+            name="lor_log_timestamp_idx",
+        ),
+    ]
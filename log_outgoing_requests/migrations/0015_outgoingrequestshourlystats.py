@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("log_outgoing_requests", "0014_outgoingrequestslog_timestamp_id_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutgoingRequestsHourlyStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "hour",
+                    models.DateTimeField(
+                        help_text="The start of the hour the requests were made in.",
+                        verbose_name="Hour",
+                    ),
+                ),
+                ("hostname", models.CharField(max_length=255, verbose_name="Hostname")),
+                (
+                    "method",
+                    models.CharField(blank=True, max_length=10, verbose_name="Method"),
+                ),
+                (
+                    "status_class",
+                    models.PositiveSmallIntegerField(
+                        help_text="E.g. 200 for 2xx status codes, 0 without response.",
+                        verbose_name="Status class",
+                    ),
+                ),
+                (
+                    "latency_bucket",
+                    models.PositiveIntegerField(
+                        help_text="The lower bound of the response time bucket, in ms.",
+                        verbose_name="Response time bucket",
+                    ),
+                ),
+                (
+                    "count",
+                    models.PositiveBigIntegerField(verbose_name="Number of requests"),
+                ),
+                (
+                    "total_ms",
+                    models.PositiveBigIntegerField(
+                        help_text="The sum of the response times, in ms.",
+                        verbose_name="Total response time",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Hourly outgoing request statistics",
+                "verbose_name_plural": "Hourly outgoing request statistics",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=(
+                            "hour",
+                            "hostname",
+                            "method",
+                            "status_class",
+                            "latency_bucket",
+                        ),
+                        name="lor_stats_unique_key",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:25
+
+import django.core.validators
+from django.db import migrations, models
+
+import log_outgoing_requests.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("log_outgoing_requests", "0015_outgoingrequestshourlystats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="outgoingrequestslogconfig",
+            name="always_save_errors",
+            field=models.BooleanField(
+                default=True,
+                help_text=(
+                    "Save requests without response or with a non-2xx response "
+                    "status regardless of the sample rate."
+                ),
+                verbose_name="Always save errors",
+            ),
+        ),
+        migrations.AddField(
+            model_name="outgoingrequestslogconfig",
+            name="host_sample_rates",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                help_text=(
+                    "Sample rates overriding the default for specific hosts, e.g. "
+                    '{"api.example.com": 0.01}. Include the port if it\'s part of the '
+                    "URL."
+                ),
+                validators=[log_outgoing_requests.models.validate_sample_rates],
+                verbose_name="Sample rates per host",
+            ),
+        ),
+        migrations.AddField(
+            model_name="outgoingrequestslogconfig",
+            name="sample_rate",
+            field=models.FloatField(
+                default=1.0,
+                help_text=(
+                    "The fraction of the requests that is saved to the database, "
+                    "between 0 and 1. Failed and slow requests can be saved "
+                    "regardless, see below."
+                ),
+                validators=[
+                    django.core.validators.MinValueValidator(0),
+                    django.core.validators.MaxValueValidator(1),
+                ],
+                verbose_name="Sample rate",
+            ),
+        ),
+        migrations.AddField(
+            model_name="outgoingrequestslogconfig",
+            name="slow_request_threshold",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text=(
+                    "If configured, save requests taking at least this number of "
+                    "milliseconds regardless of the sample rate."
+                ),
+                null=True,
+                verbose_name="Slow request threshold",
+            ),
+        ),
+    ]
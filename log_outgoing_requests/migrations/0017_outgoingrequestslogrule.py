@@ -0,0 +1,94 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:40
+
+from django.db import migrations, models
+
+import log_outgoing_requests.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("log_outgoing_requests", "0016_outgoingrequestslogconfig_sampling"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutgoingRequestsLogRule",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "order",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text=(
+                            "The first matching rule (with the lowest order) applies."
+                        ),
+                        verbose_name="Order",
+                    ),
+                ),
+                (
+                    "hostname",
+                    models.CharField(
+                        blank=True,
+                        help_text=(
+                            "The hostname the requests are sent to, without the port. "
+                            "Leave empty to match all hosts."
+                        ),
+                        max_length=255,
+                        verbose_name="Hostname",
+                    ),
+                ),
+                (
+                    "path_pattern",
+                    models.CharField(
+                        blank=True,
+                        help_text=(
+                            "Regular expression matched against the start of the URL "
+                            "path, e.g. '/health$'. Leave empty to match all paths."
+                        ),
+                        max_length=255,
+                        validators=[log_outgoing_requests.models.validate_path_pattern],
+                        verbose_name="Path pattern",
+                    ),
+                ),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("use_default", "Use the configuration"),
+                            ("exclude", "Don't save"),
+                            ("metadata_only", "Save without bodies"),
+                            ("save_body", "Save with bodies"),
+                        ],
+                        default="use_default",
+                        max_length=13,
+                        verbose_name="Action",
+                    ),
+                ),
+                (
+                    "max_content_length",
+                    models.PositiveIntegerField(
+                        blank=True,
+                        help_text=(
+                            "If configured, overrides the maximal size of the saved "
+                            "request/response content (in bytes)."
+                        ),
+                        null=True,
+                        verbose_name="Maximal content size",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Outgoing request log rule",
+                "verbose_name_plural": "Outgoing request log rules",
+                "ordering": ("order", "pk"),
+            },
+        ),
+    ]
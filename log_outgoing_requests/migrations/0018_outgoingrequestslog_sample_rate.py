@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("log_outgoing_requests", "0017_outgoingrequestslogrule"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="outgoingrequestslog",
+            name="sample_rate",
+            field=models.FloatField(
+                default=1,
+                help_text=(
+                    "The probability that this request was saved. The hourly "
+                    "statistics count it as 1 / sample rate requests."
+                ),
+                verbose_name="Sample rate",
+            ),
+        ),
+    ]
@@ -1,8 +1,12 @@
+import copy
 import logging
+import re
+import time
 from datetime import timedelta
 from urllib.parse import urlparse
 
-from django.core.validators import MinValueValidator
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.utils import timezone
 from django.utils.functional import cached_property
@@ -10,22 +14,180 @@ from django.utils.translation import gettext_lazy as _
 
 from solo.models import SingletonModel
 
+from . import partitioning
+from .bodies import (
+    decompress,
+    delete_stored_bodies,
+    delete_unused_bodies,
+    iter_stored_body_names,
+    read_stored_body,
+)
 from .conf import settings
+from .config_cache import invalidate_config_cache
 from .config_reset import schedule_config_reset
-from .constants import SaveLogsChoice
+from .constants import BodyCodec, RuleAction, SaveLogsChoice
 
 logger = logging.getLogger(__name__)
 
 
 class OutgoingRequestsLogQueryset(models.QuerySet):
-    def prune(self) -> int:
+    def prune(
+        self,
+        *,
+        batch_size: int | None = None,
+        pause: float = 0,
+        time_budget: float | None = None,
+    ) -> int:
+        """
+        Delete the log records older than ``LOG_OUTGOING_REQUESTS_MAX_AGE``.
+
+        If partitioning is enabled and the queryset isn't filtered, the partitions
+        containing only expired records are dropped first. By default, the (remaining)
+        expired records are deleted in a single query. For large tables, specify a
+        ``batch_size`` to delete the records in chunks (ordered by primary key) instead,
+        which keeps the transactions and locks short.
+
+        The files of the deleted records in the body storage (see
+        ``LOG_OUTGOING_REQUESTS_BODY_STORAGE``) are deleted together with each batch
+        (or partition). Afterwards, the shared bodies that are no longer used (see
+        ``LOG_OUTGOING_REQUESTS_BODY_DEDUPLICATION``) are deleted, as well as the
+        hourly statistics older than ``LOG_OUTGOING_REQUESTS_HOURLY_STATS_MAX_AGE``.
+
+        :arg batch_size: Maximum number of records to delete per query.
+        :arg pause: Number of seconds to sleep between batches, giving other queries
+          room to breathe. Ignored without ``batch_size``.
+        :arg time_budget: Stop deleting batches after this many seconds - the remaining
+          expired records are deleted in the next run. Ignored without ``batch_size``.
+        :returns: The number of deleted records, estimated for the dropped partitions.
+        """
+        if batch_size is not None and batch_size < 1:
+            raise ValueError(f"Batch size must be at least 1, got {batch_size!r}")
+
         max_age = settings.LOG_OUTGOING_REQUESTS_MAX_AGE
         if max_age is None:
             return 0
 
-        now = timezone.now()
-        num_deleted, _ = self.filter(timestamp__lt=now - timedelta(max_age)).delete()
-        return num_deleted
+        cutoff = timezone.now() - timedelta(max_age)
+        expired = self.filter(timestamp__lt=cutoff)
+
+        num_dropped = 0
+        num_files = 0
+        # a partition also holds the records excluded by the filters
+        if not self.query.has_filters() and partitioning.is_partitioning_enabled(
+            using=self.db
+        ):
+            for name, start, end in partitioning.get_expired_partitions(
+                cutoff, using=self.db
+            ):
+                # the files can't be looked up anymore once the partition is gone
+                partition = self.filter(timestamp__gte=start, timestamp__lt=end)
+                num_files += delete_stored_bodies(iter_stored_body_names(partition))
+                num_dropped += partitioning.drop_partition(name, using=self.db)
+
+        if batch_size is None:
+            # collect the files before their records are gone
+            stored_bodies = set(iter_stored_body_names(expired))
+            num_deleted, _ = expired.delete()
+            num_files += delete_stored_bodies(stored_bodies)
+        else:
+            num_deleted, num_batch_files = expired._delete_in_batches(
+                batch_size=batch_size, pause=pause, time_budget=time_budget
+            )
+            num_files += num_batch_files
+
+        if num_files:
+            logger.info("Deleted %d stored body file(s)", num_files)
+
+        num_bodies = delete_unused_bodies(cutoff, batch_size=batch_size, using=self.db)
+        if num_bodies:
+            logger.info("Deleted %d unused shared bodies", num_bodies)
+
+        # the statistics outlive the log records
+        stats_max_age = settings.LOG_OUTGOING_REQUESTS_HOURLY_STATS_MAX_AGE
+        if stats_max_age is not None:
+            stats_cutoff = timezone.now() - timedelta(stats_max_age)
+            num_stats, _ = (
+                OutgoingRequestsHourlyStats.objects.using(self.db)
+                .filter(hour__lt=stats_cutoff)
+                .delete()
+            )
+            if num_stats:
+                logger.info("Deleted %d expired hourly statistics", num_stats)
+        return num_dropped + num_deleted
+
+    def _delete_in_batches(
+        self, *, batch_size: int, pause: float, time_budget: float | None
+    ) -> tuple[int, int]:
+        """
+        Delete the records and their files in the body storage, a batch at a time.
+
+        :returns: The number of deleted records and files.
+        """
+        deadline = time.monotonic() + time_budget if time_budget is not None else None
+        num_deleted = 0
+        num_files = 0
+        while True:
+            batch_pks = list(
+                self.order_by("pk").values_list("pk", flat=True)[:batch_size]
+            )
+            if not batch_pks:
+                break
+
+            # Nothing references the log records and no signals are involved, so we can
+            # skip the deletion collector and issue the DELETE query directly. Deleting
+            # by primary key range avoids sending a huge ``IN (...)`` clause.
+            batch = self.filter(pk__lte=batch_pks[-1])
+            stored_bodies = set(iter_stored_body_names(batch))
+            num_deleted += batch._raw_delete(self.db)
+            num_files += delete_stored_bodies(stored_bodies)
+
+            if len(batch_pks) < batch_size:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                logger.info(
+                    "Time budget exceeded, stopping pruning after %d record(s)",
+                    num_deleted,
+                )
+                break
+            if pause:
+                time.sleep(pause)
+
+        return num_deleted, num_files
+
+
+class OutgoingRequestsBody(models.Model):
+    """
+    A request or response body shared by the log records with the same body.
+    """
+
+    hash = models.CharField(
+        verbose_name=_("Hash"),
+        max_length=64,
+        primary_key=True,
+        help_text=_("The BLAKE2b hash of the (uncompressed) body."),
+    )
+    content = models.BinaryField(verbose_name=_("Content"))
+    codec = models.CharField(
+        verbose_name=_("Compression"),
+        max_length=8,
+        choices=BodyCodec.choices,
+        default=BodyCodec.none,
+        blank=True,
+    )
+    last_used = models.DateTimeField(
+        verbose_name=_("Last used"),
+        help_text=_("When a log record using this body was last saved."),
+    )
+
+    class Meta:
+        verbose_name = _("Outgoing request body")
+        verbose_name_plural = _("Outgoing request bodies")
+
+    def __str__(self):
+        return self.hash
+
+    def get_content(self) -> bytes:
+        return decompress(self.content, self.codec)
 
 
 class OutgoingRequestsLog(models.Model):
@@ -81,6 +243,47 @@ class OutgoingRequestsLog(models.Model):
     req_body = models.BinaryField(
         verbose_name=_("Request body"), default=b"", help_text=_("The request body.")
     )
+    req_body_size = models.PositiveIntegerField(
+        verbose_name=_("Request body size"),
+        default=0,
+        help_text=_("The size of the saved request body, in bytes."),
+    )
+    req_body_codec = models.CharField(
+        verbose_name=_("Request body compression"),
+        max_length=8,
+        choices=BodyCodec.choices,
+        default=BodyCodec.none,
+        blank=True,
+        help_text=_("Compression codec of the stored request body, if any."),
+    )
+    # Referential integrity is maintained by pruning rather than a database
+    # constraint, which wouldn't survive converting the table to a partitioned table.
+    req_body_file = models.CharField(
+        verbose_name=_("Request body file"),
+        max_length=255,
+        blank=True,
+        help_text=_(
+            "The name of the request body file, if it's kept in the body storage."
+        ),
+    )
+    req_body_ref = models.ForeignKey(
+        OutgoingRequestsBody,
+        verbose_name=_("Shared request body"),
+        on_delete=models.DO_NOTHING,
+        null=True,
+        blank=True,
+        related_name="+",
+        db_constraint=False,
+        db_index=False,
+    )
+    req_body_too_large = models.BooleanField(
+        verbose_name=_("Request body too large"),
+        default=False,
+        help_text=_(
+            "The request body was not saved because it exceeds the maximum content "
+            "length."
+        ),
+    )
 
     # Response content
     res_content_type = models.CharField(
@@ -94,6 +297,45 @@ class OutgoingRequestsLog(models.Model):
     res_body = models.BinaryField(
         verbose_name=_("Response body"), default=b"", help_text=_("The response body.")
     )
+    res_body_size = models.PositiveIntegerField(
+        verbose_name=_("Response body size"),
+        default=0,
+        help_text=_("The size of the saved response body, in bytes."),
+    )
+    res_body_codec = models.CharField(
+        verbose_name=_("Response body compression"),
+        max_length=8,
+        choices=BodyCodec.choices,
+        default=BodyCodec.none,
+        blank=True,
+        help_text=_("Compression codec of the stored response body, if any."),
+    )
+    res_body_file = models.CharField(
+        verbose_name=_("Response body file"),
+        max_length=255,
+        blank=True,
+        help_text=_(
+            "The name of the response body file, if it's kept in the body storage."
+        ),
+    )
+    res_body_ref = models.ForeignKey(
+        OutgoingRequestsBody,
+        verbose_name=_("Shared response body"),
+        on_delete=models.DO_NOTHING,
+        null=True,
+        blank=True,
+        related_name="+",
+        db_constraint=False,
+        db_index=False,
+    )
+    res_body_too_large = models.BooleanField(
+        verbose_name=_("Response body too large"),
+        default=False,
+        help_text=_(
+            "The response body was not saved because it exceeds the maximum content "
+            "length."
+        ),
+    )
     res_body_encoding = models.CharField(
         _("Response encoding"),
         max_length=24,
@@ -114,6 +356,14 @@ class OutgoingRequestsLog(models.Model):
         verbose_name=_("Timestamp"),
         help_text=_("This is the date and time the API call was made."),
     )
+    sample_rate = models.FloatField(
+        verbose_name=_("Sample rate"),
+        default=1,
+        help_text=_(
+            "The probability that this request was saved. The hourly statistics count "
+            "it as 1 / sample rate requests."
+        ),
+    )
     trace = models.TextField(
         verbose_name=_("Trace"),
         help_text=_("Text providing information in case of request failure."),
@@ -124,6 +374,29 @@ class OutgoingRequestsLog(models.Model):
     class Meta:
         verbose_name = _("Outgoing request log")
         verbose_name_plural = _("Outgoing request logs")
+        indexes = [
+            # pruning and the admin date hierarchy filter on timestamp ranges, the
+            # admin paginates on (timestamp, id)
+            models.Index(fields=["timestamp", "id"], name="lor_log_timestamp_id_idx"),
+            # admin list filters, typically combined with a date (hierarchy) range
+            models.Index(
+                fields=["hostname", "timestamp"], name="lor_log_hostname_ts_idx"
+            ),
+            models.Index(
+                fields=["status_code", "timestamp"], name="lor_log_status_ts_idx"
+            ),
+            # finding unused shared bodies when pruning
+            models.Index(
+                fields=["req_body_ref"],
+                name="lor_log_req_body_ref_idx",
+                condition=models.Q(req_body_ref__isnull=False),
+            ),
+            models.Index(
+                fields=["res_body_ref"],
+                name="lor_log_res_body_ref_idx",
+                condition=models.Q(res_body_ref__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.hostname} at {self.timestamp}"
@@ -153,12 +426,32 @@ class OutgoingRequestsLog(models.Model):
             # indicate a misspelling or similar mistake.
             return str(content, errors="replace")
 
+    def get_request_body(self) -> bytes:
+        """
+        Get the original request body, decompressing it if needed.
+        """
+        if self.req_body_file:
+            return read_stored_body(self.req_body_file, self.req_body_codec)
+        if self.req_body_ref_id:
+            return _get_shared_body(self, "req_body_ref")
+        return decompress(self.req_body, self.req_body_codec)
+
+    def get_response_body(self) -> bytes:
+        """
+        Get the original response body, decompressing it if needed.
+        """
+        if self.res_body_file:
+            return read_stored_body(self.res_body_file, self.res_body_codec)
+        if self.res_body_ref_id:
+            return _get_shared_body(self, "res_body_ref")
+        return decompress(self.res_body, self.res_body_codec)
+
     @cached_property
     def request_body_decoded(self) -> str:
         """
         Decoded request body for use in template.
         """
-        return self._decode_body(self.req_body, self.req_body_encoding)
+        return self._decode_body(self.get_request_body(), self.req_body_encoding)
 
     request_body_decoded.short_description = _("Request body")  # type: ignore
 
@@ -167,20 +460,78 @@ class OutgoingRequestsLog(models.Model):
         """
         Decoded response body for use in template.
         """
-        return self._decode_body(self.res_body, self.res_body_encoding)
+        return self._decode_body(self.get_response_body(), self.res_body_encoding)
 
     response_body_decoded.short_description = _("Response body")  # type: ignore
 
     @cached_property
     def response_content_length(self) -> int:
         """
-        Get Response content length by reading `len(response_body_decoded)`.
+        Get the size of the saved response body, without loading it.
         """
-        return len(self.response_body_decoded)
+        return self.res_body_size
 
     response_content_length.short_description = _("Response content length")  # type: ignore
 
 
+def _get_shared_body(log: OutgoingRequestsLog, field: str) -> bytes:
+    try:
+        body: OutgoingRequestsBody = getattr(log, field)
+    except OutgoingRequestsBody.DoesNotExist:
+        # should not happen, but without a database constraint we can't rule it out
+        logger.warning("Shared body of log record %s is missing", log.pk)
+        return b""
+    return body.get_content()
+
+
+class OutgoingRequestsHourlyStats(models.Model):
+    """
+    The number of requests and their total response time in an hour, for a hostname,
+    method, status class and response time bucket.
+
+    See :mod:`log_outgoing_requests.stats`.
+    """
+
+    hour = models.DateTimeField(
+        verbose_name=_("Hour"),
+        help_text=_("The start of the hour the requests were made in."),
+    )
+    hostname = models.CharField(verbose_name=_("Hostname"), max_length=255)
+    method = models.CharField(verbose_name=_("Method"), max_length=10, blank=True)
+    status_class = models.PositiveSmallIntegerField(
+        verbose_name=_("Status class"),
+        help_text=_("E.g. 200 for 2xx status codes, 0 without response."),
+    )
+    latency_bucket = models.PositiveIntegerField(
+        verbose_name=_("Response time bucket"),
+        help_text=_("The lower bound of the response time bucket, in ms."),
+    )
+    count = models.PositiveBigIntegerField(verbose_name=_("Number of requests"))
+    total_ms = models.PositiveBigIntegerField(
+        verbose_name=_("Total response time"),
+        help_text=_("The sum of the response times, in ms."),
+    )
+
+    class Meta:
+        verbose_name = _("Hourly outgoing request statistics")
+        verbose_name_plural = _("Hourly outgoing request statistics")
+        constraints = [
+            models.UniqueConstraint(
+                fields=[
+                    "hour",
+                    "hostname",
+                    "method",
+                    "status_class",
+                    "latency_bucket",
+                ],
+                name="lor_stats_unique_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.hostname} at {self.hour}"
+
+
 def get_default_max_content_length():
     """
     Get default value for max content length from settings.
@@ -188,6 +539,24 @@ def get_default_max_content_length():
     return settings.LOG_OUTGOING_REQUESTS_MAX_CONTENT_LENGTH
 
 
+def validate_sample_rates(value) -> None:
+    """
+    Check that the sample rates per host map hosts to a rate between 0 and 1.
+    """
+    if not isinstance(value, dict):
+        raise ValidationError(_("Enter a mapping of hosts to sample rates."))
+    for host, rate in value.items():
+        if (
+            isinstance(rate, bool)
+            or not isinstance(rate, int | float)
+            or not 0 <= rate <= 1
+        ):
+            raise ValidationError(
+                _("The sample rate of %(host)s must be a number between 0 and 1."),
+                params={"host": host},
+            )
+
+
 class OutgoingRequestsLogConfig(SingletonModel):
     """Configuration options for request logging."""
 
@@ -234,12 +603,49 @@ class OutgoingRequestsLogConfig(SingletonModel):
             "are pretty printed and have syntax highlighting applied to them."
         ),
     )
+    sample_rate = models.FloatField(
+        _("Sample rate"),
+        default=1.0,
+        validators=[MinValueValidator(0), MaxValueValidator(1)],
+        help_text=_(
+            "The fraction of the requests that is saved to the database, between 0 "
+            "and 1. Failed and slow requests can be saved regardless, see below."
+        ),
+    )
+    host_sample_rates = models.JSONField(
+        _("Sample rates per host"),
+        default=dict,
+        blank=True,
+        validators=[validate_sample_rates],
+        help_text=_(
+            "Sample rates overriding the default for specific hosts, e.g. "
+            '{"api.example.com": 0.01}. Include the port if it\'s part of the URL.'
+        ),
+    )
+    always_save_errors = models.BooleanField(
+        _("Always save errors"),
+        default=True,
+        help_text=_(
+            "Save requests without response or with a non-2xx response status "
+            "regardless of the sample rate."
+        ),
+    )
+    slow_request_threshold = models.PositiveIntegerField(
+        _("Slow request threshold"),
+        null=True,
+        blank=True,
+        help_text=_(
+            "If configured, save requests taking at least this number of "
+            "milliseconds regardless of the sample rate."
+        ),
+    )
 
     class Meta:
         verbose_name = _("Outgoing request log configuration")
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
+        invalidate_config_cache()
         schedule_config_reset(self.reset_db_save_after)
 
     @property
@@ -259,3 +665,116 @@ class OutgoingRequestsLogConfig(SingletonModel):
         if self.save_body == SaveLogsChoice.use_default:
             return settings.LOG_OUTGOING_REQUESTS_DB_SAVE_BODY
         return self.save_body == SaveLogsChoice.yes
+
+    def get_sample_rate(self, hostname: str) -> float:
+        """
+        Get the fraction of the requests to ``hostname`` that must be saved.
+        """
+        return self.host_sample_rates.get(hostname, self.sample_rate)
+
+
+def validate_path_pattern(value: str) -> None:
+    """
+    Check that the path pattern is a regular expression that can be combined with the
+    patterns of the other rules.
+    """
+    try:
+        pattern = re.compile(f"(?P<rule>{value})")
+    except re.error as exc:
+        raise ValidationError(
+            _("Enter a valid regular expression: %(error)s"), params={"error": exc}
+        ) from exc
+    if len(pattern.groupindex) > 1:
+        raise ValidationError(_("Named groups are not supported."))
+
+
+class OutgoingRequestsLogRule(models.Model):
+    """
+    Override the configuration for the requests to a host and/or URL path.
+
+    See :mod:`log_outgoing_requests.rules`.
+    """
+
+    order = models.PositiveIntegerField(
+        verbose_name=_("Order"),
+        default=0,
+        help_text=_("The first matching rule (with the lowest order) applies."),
+    )
+    hostname = models.CharField(
+        verbose_name=_("Hostname"),
+        max_length=255,
+        blank=True,
+        help_text=_(
+            "The hostname the requests are sent to, without the port. Leave empty to "
+            "match all hosts."
+        ),
+    )
+    path_pattern = models.CharField(
+        verbose_name=_("Path pattern"),
+        max_length=255,
+        blank=True,
+        validators=[validate_path_pattern],
+        help_text=_(
+            "Regular expression matched against the start of the URL path, e.g. "
+            "'/health$'. Leave empty to match all paths."
+        ),
+    )
+    action = models.CharField(
+        verbose_name=_("Action"),
+        max_length=13,
+        choices=RuleAction.choices,
+        default=RuleAction.use_default,
+    )
+    max_content_length = models.PositiveIntegerField(
+        verbose_name=_("Maximal content size"),
+        null=True,
+        blank=True,
+        help_text=_(
+            "If configured, overrides the maximal size of the saved request/response "
+            "content (in bytes)."
+        ),
+    )
+
+    class Meta:
+        verbose_name = _("Outgoing request log rule")
+        verbose_name_plural = _("Outgoing request log rules")
+        ordering = ("order", "pk")
+
+    def __str__(self):
+        return (
+            f"{self.hostname or '*'}{self.path_pattern} ({self.get_action_display()})"
+        )
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalidate_config_cache()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        invalidate_config_cache()
+        return result
+
+    def apply_to(
+        self, config: OutgoingRequestsLogConfig
+    ) -> OutgoingRequestsLogConfig | None:
+        """
+        Get the configuration for the matching requests, ``None`` if they must not be
+        saved.
+
+        The returned configuration is a (read-only) copy when the rule overrides any
+        of its options.
+        """
+        if self.action == RuleAction.exclude:
+            return None
+        if self.action == RuleAction.use_default and self.max_content_length is None:
+            return config
+
+        config = copy.copy(config)
+        match self.action:
+            case RuleAction.metadata_only:
+                config.save_body = SaveLogsChoice.no
+            case RuleAction.save_body:
+                config.save_body = SaveLogsChoice.yes
+        if self.max_content_length is not None:
+            config.max_content_length = self.max_content_length
+        return config
@@ -0,0 +1,69 @@
+"""
+Pagination of (very) large log tables in the admin.
+
+Counting the log records requires a full scan of the table (or an index), which takes
+seconds with tens of millions of records. On PostgreSQL, the number of records is
+estimated by the query planner instead.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+if TYPE_CHECKING:
+    from django.db.models import QuerySet
+
+__all__ = ["estimate_count", "EstimatedCountPaginator"]
+
+
+def estimate_count(queryset: QuerySet) -> int | None:
+    """
+    Get the query planner's estimate of the number of rows in the queryset.
+
+    :returns: The estimate, or ``None`` if the database doesn't provide one.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    try:
+        sql, params = queryset.order_by().values("pk").query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        (plan,) = cursor.fetchone()
+    # psycopg decodes json columns, other drivers may not
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses the estimated number of objects for large querysets.
+
+    Small querysets, and all querysets on databases without estimates, are counted
+    exactly. :attr:`count_is_estimate` tells which one it was.
+    """
+
+    exact_count_limit = 10_000
+    """
+    Querysets estimated to contain fewer objects are counted exactly - that's cheap,
+    and estimates are least accurate for small (filtered) result sets.
+    """
+
+    count_is_estimate = False
+
+    @cached_property
+    def count(self) -> int:
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < self.exact_count_limit:
+            return self.object_list.count()
+        self.count_is_estimate = True
+        return estimate
@@ -0,0 +1,319 @@
+"""
+Optional time-based partitioning of the log table on PostgreSQL.
+
+Deleting expired rows is expensive on large tables, while dropping a table partition is
+practically free. When ``LOG_OUTGOING_REQUESTS_PARTITION_INTERVAL`` is configured, the
+log table can be converted into a table partitioned by ``timestamp`` with one partition
+per day or hour:
+
+.. code-block:: bash
+
+    python manage.py partition_outgoing_request_logs --convert
+
+Afterwards, partitions must be created ahead of time by periodically running the
+management command (without ``--convert``) or the
+:func:`log_outgoing_requests.tasks.create_log_partitions` task. Records that don't fit
+in any partition end up in a default partition, so no logs are lost if this was
+forgotten.
+
+:meth:`log_outgoing_requests.models.OutgoingRequestsLogQueryset.prune` detaches and
+drops partitions that only contain expired records before deleting the remaining
+expired rows, unless the records to prune are filtered.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Iterator
+from datetime import UTC, datetime, timedelta
+from typing import Literal
+
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+
+from .conf import settings
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "is_partitioning_enabled",
+    "convert_to_partitioned_table",
+    "create_partitions",
+    "get_expired_partitions",
+    "drop_partition",
+    "drop_expired_partitions",
+]
+
+type PartitionInterval = Literal["day", "hour"]
+
+INTERVALS: dict[PartitionInterval, timedelta] = {
+    "day": timedelta(days=1),
+    "hour": timedelta(hours=1),
+}
+
+# the partition name suffix encodes the start of the range, the length of the suffix
+# tells us the interval
+_NAME_FORMATS: dict[PartitionInterval, str] = {
+    "day": "%Y%m%d",
+    "hour": "%Y%m%d%H",
+}
+
+
+def _get_table_name() -> str:
+    from .models import OutgoingRequestsLog
+
+    return OutgoingRequestsLog._meta.db_table
+
+
+def _get_interval() -> PartitionInterval:
+    interval = settings.LOG_OUTGOING_REQUESTS_PARTITION_INTERVAL
+    if interval not in INTERVALS:
+        raise ValueError(f"Unsupported partition interval: {interval!r}")
+    return interval
+
+
+def is_partitioning_enabled(using: str = DEFAULT_DB_ALIAS) -> bool:
+    """
+    Check if partitioning is configured and supported by the database.
+    """
+    return bool(settings.LOG_OUTGOING_REQUESTS_PARTITION_INTERVAL) and (
+        connections[using].vendor == "postgresql"
+    )
+
+
+def is_partitioned(using: str = DEFAULT_DB_ALIAS) -> bool:
+    """
+    Check if the log table has been converted into a partitioned table.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+            "WHERE partrelid = %s::regclass)",
+            [_get_table_name()],
+        )
+        (result,) = cursor.fetchone()
+    return result
+
+
+def _truncate(value: datetime, interval: PartitionInterval) -> datetime:
+    value = value.astimezone(UTC).replace(minute=0, second=0, microsecond=0)
+    if interval == "day":
+        value = value.replace(hour=0)
+    return value
+
+
+def _iter_ranges(
+    start: datetime, end: datetime, interval: PartitionInterval
+) -> Iterator[datetime]:
+    current = _truncate(start, interval)
+    while current < end:
+        yield current
+        current += INTERVALS[interval]
+
+
+def get_partition_name(start: datetime, interval: PartitionInterval) -> str:
+    suffix = _truncate(start, interval).strftime(_NAME_FORMATS[interval])
+    return f"{_get_table_name()}_p{suffix}"
+
+
+def parse_partition_name(name: str) -> tuple[datetime, datetime] | None:
+    """
+    Determine the range covered by a partition from its name.
+
+    :returns: A ``(start, end)`` tuple, or ``None`` for partitions not managed by us
+      (like the default partition).
+    """
+    prefix = f"{_get_table_name()}_p"
+    if not name.startswith(prefix):
+        return None
+    suffix = name.removeprefix(prefix)
+    for interval, name_format in _NAME_FORMATS.items():
+        try:
+            start = datetime.strptime(suffix, name_format).replace(tzinfo=UTC)
+        except ValueError:
+            continue
+        # strptime is lenient about zero-padding, so double check the length
+        if start.strftime(name_format) != suffix:
+            continue
+        return start, start + INTERVALS[interval]
+    return None
+
+
+def get_partitions(using: str = DEFAULT_DB_ALIAS) -> list[str]:
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = %s::regclass "
+            "ORDER BY child.relname",
+            [_get_table_name()],
+        )
+        return [name for (name,) in cursor.fetchall()]
+
+
+def create_partitions(
+    *,
+    until: datetime,
+    start: datetime | None = None,
+    using: str = DEFAULT_DB_ALIAS,
+) -> list[str]:
+    """
+    Create the missing partitions between ``start`` (default: now) and ``until``.
+
+    Creating a partition fails if the default partition already contains records for
+    its range. This is logged and the remaining partitions are still created - those
+    records end up being pruned from the default partition.
+
+    :returns: The names of the created partitions.
+    """
+    interval = _get_interval()
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    table = _get_table_name()
+    existing = set(get_partitions(using=using))
+
+    created: list[str] = []
+    for range_start in _iter_ranges(start or datetime.now(UTC), until, interval):
+        name = get_partition_name(range_start, interval)
+        if name in existing:
+            continue
+        range_end = range_start + INTERVALS[interval]
+        try:
+            with transaction.atomic(using=using), connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE TABLE {qn(name)} PARTITION OF {qn(table)} "
+                    f"FOR VALUES FROM ('{range_start.isoformat()}') "
+                    f"TO ('{range_end.isoformat()}')"
+                )
+        except DatabaseError:
+            logger.warning("Could not create partition %s", name, exc_info=True)
+            continue
+        created.append(name)
+    return created
+
+
+def convert_to_partitioned_table(
+    *, days_ahead: int = 3, using: str = DEFAULT_DB_ALIAS
+) -> None:
+    """
+    Convert the regular log table into a partitioned table, preserving the records.
+
+    PostgreSQL requires the partition key to be part of the primary key, so the primary
+    key becomes ``(id, timestamp)``. This takes an exclusive lock on the table while the
+    records are copied - consider pruning the table before converting it. Both identity
+    and (older) serial primary key columns are supported.
+    """
+    from .models import OutgoingRequestsLog
+
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    table = _get_table_name()
+    legacy_table = f"{table}_legacy"
+
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(legacy_table)}")
+            cursor.execute(
+                f"CREATE TABLE {qn(table)} (LIKE {qn(legacy_table)} "
+                "INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING IDENTITY) "
+                f"PARTITION BY RANGE ({qn('timestamp')})"
+            )
+            # tables created before Django 4.1 have a serial primary key instead of an
+            # identity column. The copied default still uses the sequence of the old
+            # table, which would be dropped along with it
+            cursor.execute(
+                "SELECT pg_get_serial_sequence(%s, 'id'), attidentity "
+                "FROM pg_attribute WHERE attrelid = %s::regclass AND attname = 'id'",
+                [legacy_table, legacy_table],
+            )
+            sequence, identity = cursor.fetchone()
+            if sequence and not identity:
+                cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {qn(table)}.id")
+            cursor.execute(
+                f"CREATE TABLE {qn(f'{table}_default')} "
+                f"PARTITION OF {qn(table)} DEFAULT"
+            )
+            cursor.execute(f"SELECT MIN({qn('timestamp')}) FROM {qn(legacy_table)}")
+            (oldest,) = cursor.fetchone()
+
+        now = datetime.now(UTC)
+        create_partitions(
+            start=min(oldest, now) if oldest else now,
+            until=now + timedelta(days=days_ahead),
+            using=using,
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {qn(table)} OVERRIDING SYSTEM VALUE "
+                f"SELECT * FROM {qn(legacy_table)}"
+            )
+            # dropping the old table also frees up the names of the constraints and
+            # indexes
+            cursor.execute(f"DROP TABLE {qn(legacy_table)}")
+            cursor.execute(
+                f"ALTER TABLE {qn(table)} ADD PRIMARY KEY (id, {qn('timestamp')})"
+            )
+            cursor.execute(
+                "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                f"COALESCE(MAX(id), 0) + 1, false) FROM {qn(table)}",
+                [table],
+            )
+
+        with connection.schema_editor(atomic=False) as schema_editor:
+            for index in OutgoingRequestsLog._meta.indexes:
+                schema_editor.add_index(OutgoingRequestsLog, index)
+
+
+def get_expired_partitions(
+    cutoff: datetime, using: str = DEFAULT_DB_ALIAS
+) -> list[tuple[str, datetime, datetime]]:
+    """
+    Get the partitions that only hold records older than ``cutoff``.
+
+    :returns: The name, start and end of each expired partition.
+    """
+    expired = []
+    for name in get_partitions(using=using):
+        bounds = parse_partition_name(name)
+        if bounds is None or bounds[1] > cutoff:
+            continue
+        expired.append((name, *bounds))
+    return expired
+
+
+def drop_partition(name: str, using: str = DEFAULT_DB_ALIAS) -> int:
+    """
+    Detach and drop a partition.
+
+    :returns: The number of records that were in the partition, as estimated by the
+      table statistics - counting them would mean reading the whole partition.
+    """
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    table = _get_table_name()
+
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        # reltuples is -1 for tables that haven't been analyzed (yet)
+        cursor.execute(
+            "SELECT GREATEST(reltuples, 0)::bigint FROM pg_class "
+            "WHERE oid = %s::regclass",
+            [name],
+        )
+        (count,) = cursor.fetchone()
+        cursor.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}")
+        cursor.execute(f"DROP TABLE {qn(name)}")
+
+    logger.info("Dropped partition %s with ~%d record(s)", name, count)
+    return count
+
+
+def drop_expired_partitions(cutoff: datetime, using: str = DEFAULT_DB_ALIAS) -> int:
+    """
+    Detach and drop the partitions that only hold records older than ``cutoff``.
+
+    :returns: The (estimated) number of records that were in the dropped partitions.
+    """
+    return sum(
+        drop_partition(name, using=using)
+        for name, _, _ in get_expired_partitions(cutoff, using=using)
+    )
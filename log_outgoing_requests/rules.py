@@ -0,0 +1,140 @@
+"""
+Save the requests to specific hosts and URL paths differently.
+
+Rules (:class:`log_outgoing_requests.models.OutgoingRequestsLogRule`, managed in the
+admin) override the configuration for the requests they match, e.g. to never save the
+requests to a health check endpoint, to only save the metadata of the requests to a
+storage service, or to limit the size of the bodies saved for a partner. The first
+matching rule applies. Rules don't enable saving the logs when that's disabled in the
+configuration.
+
+The rules are compiled into a :class:`RuleMatcher`: a map from the hostname to the
+rules applicable to that host, with their path patterns combined into a single regular
+expression. Matching a request takes a dictionary lookup and one regular expression
+match, regardless of the number of rules. The matcher is kept in memory along with the
+configuration (see :mod:`log_outgoing_requests.config_cache`), and is rebuilt when a
+rule or the configuration changes.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Sequence
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    from .models import OutgoingRequestsLogConfig, OutgoingRequestsLogRule
+
+__all__ = [
+    "RuleMatcher",
+    "apply_logging_rules",
+    "get_cached_rule_matcher",
+    "get_rule_matcher",
+]
+
+
+class RuleMatcher:
+    """
+    Find the configuration for a request according to the first matching rule.
+
+    :arg rules: The rules, in order of precedence.
+    :arg config: The configuration the rules override.
+    """
+
+    def __init__(
+        self,
+        rules: Sequence[OutgoingRequestsLogRule],
+        config: OutgoingRequestsLogConfig,
+    ):
+        self.config = config
+        # the overridden configuration of each rule is the same for every request
+        self._configs = [rule.apply_to(config) for rule in rules]
+
+        any_host: list[int] = []
+        by_host: dict[str, list[int]] = {}
+        for index, rule in enumerate(rules):
+            if rule.hostname:
+                by_host.setdefault(rule.hostname.lower(), []).append(index)
+            else:
+                any_host.append(index)
+
+        self._default_pattern = self._compile(rules, any_host)
+        self._patterns = {
+            hostname: self._compile(rules, sorted(indexes + any_host))
+            for hostname, indexes in by_host.items()
+        }
+
+    @staticmethod
+    def _compile(
+        rules: Sequence[OutgoingRequestsLogRule], indexes: list[int]
+    ) -> re.Pattern[str] | None:
+        if not indexes:
+            return None
+        # the alternatives are tried in order, so the first matching rule wins. The
+        # group of the rule encloses any groups in its pattern, so it's the last
+        # matched group
+        return re.compile(
+            "|".join(
+                f"(?P<rule{index}>{rules[index].path_pattern})" for index in indexes
+            )
+        )
+
+    def match(self, url: str) -> OutgoingRequestsLogConfig | None:
+        """
+        Get the configuration for a request, ``None`` if it must not be saved.
+        """
+        parts = urlsplit(url)
+        # the hostname leaves out the credentials and port, and is lowercased already
+        pattern = self._patterns.get(parts.hostname or "", self._default_pattern)
+        if pattern is None or (match := pattern.match(parts.path)) is None:
+            return self.config
+        assert match.lastgroup is not None
+        return self._configs[int(match.lastgroup.removeprefix("rule"))]
+
+
+_matcher: RuleMatcher | None = None
+"""
+The matcher for the (cached) configuration, ``None`` when it's not built (yet).
+"""
+
+
+def get_cached_rule_matcher(config: OutgoingRequestsLogConfig) -> RuleMatcher | None:
+    """
+    Get the matcher of the rules overriding ``config``, ``None`` if it's not built yet.
+
+    Unlike :func:`get_rule_matcher`, this never queries the database.
+    """
+    matcher = _matcher
+    if matcher is not None and matcher.config is config:
+        return matcher
+    return None
+
+
+def get_rule_matcher(config: OutgoingRequestsLogConfig) -> RuleMatcher:
+    """
+    Get the matcher of the rules overriding ``config``.
+
+    The rules are loaded from the database again when the configuration is reloaded,
+    which happens when a rule is changed too (see
+    :func:`log_outgoing_requests.config_cache.get_config`).
+    """
+    from .models import OutgoingRequestsLogRule
+
+    global _matcher
+
+    if (matcher := get_cached_rule_matcher(config)) is not None:
+        return matcher
+
+    matcher = RuleMatcher(list(OutgoingRequestsLogRule.objects.all()), config)
+    _matcher = matcher
+    return matcher
+
+
+def apply_logging_rules(
+    config: OutgoingRequestsLogConfig, url: str
+) -> OutgoingRequestsLogConfig | None:
+    """
+    Get the configuration for a request to ``url``, ``None`` if it must not be saved.
+    """
+    return get_rule_matcher(config).match(url)
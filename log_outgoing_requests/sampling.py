@@ -0,0 +1,113 @@
+"""
+Sample the request logs that are saved to the database.
+
+Saving every outgoing request can be too expensive at high volumes. The configuration
+in the admin (:class:`log_outgoing_requests.models.OutgoingRequestsLogConfig`) allows
+saving only a fraction of the requests, optionally with a different rate per host.
+
+The sampling decision is only taken once the outcome of the request is known (tail-based
+sampling), so that the interesting requests can be kept regardless of the sample rate:
+
+* failed requests - requests without response or with a non-2xx status code (see
+  :func:`is_error`)
+* slow requests - requests that took longer than the configured threshold
+
+Requests that are sampled out are discarded before their body is read and before they
+are queued for the background thread, so they cost next to nothing.
+
+The saved log records store the rate they were sampled with, so that the hourly
+statistics (see :mod:`log_outgoing_requests.stats`) can count every record as the
+``1 / sample_rate`` requests it represents.
+"""
+
+from __future__ import annotations
+
+import random
+from typing import TYPE_CHECKING
+from urllib.parse import urlparse
+
+from .typing import is_request_log_record
+
+if TYPE_CHECKING:
+    from .models import OutgoingRequestsLogConfig
+    from .typing import ErrorRequestLogRecord, RequestLogRecord
+
+__all__ = ["get_sample_rate", "is_error", "is_sampled", "is_record_sampled"]
+
+
+def is_error(status_code: int | None) -> bool:
+    """
+    Check if a request failed - without response or with a non-2xx status code.
+
+    Both sampling and the hourly statistics (see :mod:`log_outgoing_requests.stats`)
+    treat these requests as errors.
+    """
+    return status_code is None or not 200 <= status_code < 300
+
+
+def get_sample_rate(
+    config: OutgoingRequestsLogConfig,
+    *,
+    hostname: str,
+    status_code: int | None,
+    response_ms: int,
+) -> float:
+    """
+    Get the probability that a request is saved to the database.
+
+    :arg hostname: The host (and port, if it's part of the URL) the request was sent to.
+    :arg status_code: The status code of the response, ``None`` if the request failed.
+    :arg response_ms: The response time of the request, in milliseconds.
+    """
+    if config.always_save_errors and is_error(status_code):
+        return 1
+    threshold = config.slow_request_threshold
+    if threshold is not None and response_ms >= threshold:
+        return 1
+    return min(config.get_sample_rate(hostname), 1)
+
+
+def is_sampled(
+    config: OutgoingRequestsLogConfig,
+    *,
+    hostname: str,
+    status_code: int | None,
+    response_ms: int,
+) -> bool:
+    """
+    Decide if a request must be saved to the database.
+
+    See :func:`get_sample_rate` for the arguments.
+    """
+    rate = get_sample_rate(
+        config, hostname=hostname, status_code=status_code, response_ms=response_ms
+    )
+    if rate >= 1:
+        return True
+    return random.random() < rate
+
+
+def is_record_sampled(
+    record: RequestLogRecord | ErrorRequestLogRecord,
+    config: OutgoingRequestsLogConfig,
+) -> bool:
+    """
+    Decide if the request of a log record must be saved to the database.
+
+    Only the request metadata is inspected - the response body is left untouched.
+    """
+    if is_request_log_record(record):
+        request = record.req
+        response = record.res
+    else:
+        request = record.request_exception.request
+        response = None  # failed requests don't have a (successful) response
+
+    return is_sampled(
+        config,
+        hostname=urlparse(request.url).netloc if request and request.url else "",
+        status_code=response.status_code if response is not None else None,
+        response_ms=(
+            int(response.elapsed.total_seconds() * 1000) if response is not None else 0
+        ),
+    )
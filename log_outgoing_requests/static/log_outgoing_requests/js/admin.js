@@ -0,0 +1,32 @@
+"use strict";
+
+// Replace the preview of a large request/response body with the full body when the
+// link below it is clicked. Without javascript, the link opens the body in a new tab.
+document.addEventListener("click", async (event) => {
+  const link = event.target.closest(".lor-load-body");
+  if (!link) return;
+  event.preventDefault();
+
+  const container = link.closest(".lor-body-preview");
+  link.setAttribute("aria-busy", "true");
+  let response;
+  try {
+    response = await fetch(link.href, { credentials: "same-origin" });
+  } finally {
+    link.removeAttribute("aria-busy");
+  }
+  if (!response.ok) {
+    window.open(link.href, "_blank");
+    return;
+  }
+
+  const content = await response.text();
+  if (link.dataset.format === "highlighted") {
+    // the highlighted body is HTML rendered (and escaped) by the server
+    container.innerHTML = content;
+  } else {
+    const pre = document.createElement("pre");
+    pre.textContent = content;
+    container.replaceChildren(pre);
+  }
+});
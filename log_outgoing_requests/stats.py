@@ -0,0 +1,225 @@
+"""
+Hourly statistics of the outgoing requests.
+
+Computing the number of calls, error rates and response time percentiles from the log
+records gets slow for large tables, and is impossible once the records are pruned. When
+``LOG_OUTGOING_REQUESTS_HOURLY_STATS`` is enabled, the writers roll the records up into
+the :class:`log_outgoing_requests.models.OutgoingRequestsHourlyStats` table when they
+are saved, counting the calls per hour, hostname, method, status class (``200`` for
+2xx responses, ``0`` without response) and response time bucket.
+
+Records saved with a sample rate below 1 (see :mod:`log_outgoing_requests.sampling`)
+are counted as the ``1 / sample_rate`` requests they represent, so that sampling doesn't
+skew the statistics towards the requests that are always saved, like errors.
+
+The statistics are kept for ``LOG_OUTGOING_REQUESTS_HOURLY_STATS_MAX_AGE`` days, and
+are displayed in the admin.
+"""
+
+from __future__ import annotations
+
+import bisect
+import logging
+import math
+import random
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import F, Sum
+
+from .conf import settings
+from .sampling import is_error
+
+if TYPE_CHECKING:
+    from .models import OutgoingRequestsLog
+
+__all__ = [
+    "LATENCY_BUCKETS",
+    "get_status_class",
+    "get_latency_bucket",
+    "update_hourly_stats",
+    "summarize_hourly_stats",
+    "StatsSummary",
+]
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10_000)
+"""
+The lower bounds of the response time buckets, in milliseconds. The last bucket has no
+upper bound.
+"""
+
+type StatsKey = tuple[datetime, str, str, int, int]
+
+
+def get_status_class(status_code: int | None) -> int:
+    """
+    Get the class of a status code, e.g. ``400`` for ``404``, or ``0`` without status.
+    """
+    return status_code // 100 * 100 if status_code else 0
+
+
+def get_latency_bucket(response_ms: int) -> int:
+    """
+    Get the (lower bound of the) response time bucket.
+    """
+    return LATENCY_BUCKETS[bisect.bisect_right(LATENCY_BUCKETS, response_ms) - 1]
+
+
+def update_hourly_stats(
+    logs: Iterable[OutgoingRequestsLog], *, using: str = DEFAULT_DB_ALIAS
+) -> None:
+    """
+    Add the (saved) log records to the hourly statistics, if enabled.
+
+    Called by the writers after saving the records. Errors are logged and otherwise
+    ignored - the records are saved already.
+    """
+    if not settings.LOG_OUTGOING_REQUESTS_HOURLY_STATS:
+        return
+
+    counts: Counter[StatsKey] = Counter()
+    total_ms: Counter[StatsKey] = Counter()
+    for log in logs:
+        key = (
+            log.timestamp.replace(minute=0, second=0, microsecond=0),
+            log.hostname,
+            log.method,
+            get_status_class(log.status_code),
+            get_latency_bucket(log.response_ms),
+        )
+        # the record represents the requests that were sampled out too
+        weight = 1 / log.sample_rate if log.sample_rate > 0 else 1
+        counts[key] += weight
+        total_ms[key] += log.response_ms * weight
+
+    try:
+        for key, count in counts.items():
+            _increment(
+                key, _round_randomly(count), _round_randomly(total_ms[key]), using=using
+            )
+    except Exception:
+        logger.warning("Could not update the hourly statistics", exc_info=True)
+
+
+def _round_randomly(value: float) -> int:
+    # rounding up with the probability of the fraction keeps the sum of many (small)
+    # increments unbiased, unlike round()
+    whole = math.floor(value)
+    return whole + (random.random() < value - whole)
+
+
+def _increment(key: StatsKey, count: int, total_ms: int, *, using: str) -> None:
+    from .models import OutgoingRequestsHourlyStats
+
+    hour, hostname, method, status_class, latency_bucket = key
+    lookup = {
+        "hour": hour,
+        "hostname": hostname,
+        "method": method,
+        "status_class": status_class,
+        "latency_bucket": latency_bucket,
+    }
+    stats = OutgoingRequestsHourlyStats.objects.using(using).filter(**lookup)
+    # increment in the database, other writers may update the same row concurrently
+    increments = {"count": F("count") + count, "total_ms": F("total_ms") + total_ms}
+    if stats.update(**increments):
+        return
+    try:
+        with transaction.atomic(using=using):
+            OutgoingRequestsHourlyStats.objects.using(using).create(
+                **lookup, count=count, total_ms=total_ms
+            )
+    except IntegrityError:
+        # created by another writer in the meantime
+        stats.update(**increments)
+
+
+@dataclass
+class StatsSummary:
+    """
+    The statistics of a group of requests, e.g. of a hostname.
+    """
+
+    count: int = 0
+    error_count: int = 0
+    total_ms: int = 0
+    histogram: dict[int, int] = field(default_factory=dict)
+    """
+    The number of responses per response time bucket.
+    """
+
+    @property
+    def error_rate(self) -> float:
+        """
+        The fraction of failed requests (see
+        :func:`log_outgoing_requests.sampling.is_error`).
+        """
+        return self.error_count / self.count if self.count else 0
+
+    @property
+    def mean_ms(self) -> float | None:
+        num_responses = sum(self.histogram.values())
+        return self.total_ms / num_responses if num_responses else None
+
+    def percentile(self, q: float) -> float | None:
+        """
+        Estimate the ``q``-th percentile (0-100) of the response times, in milliseconds.
+
+        The value is interpolated linearly within its bucket. For the last bucket, which
+        has no upper bound, its lower bound is returned.
+        """
+        num_responses = sum(self.histogram.values())
+        if not num_responses:
+            return None
+        rank = num_responses * q / 100
+        cumulative = 0
+        for index, lower in enumerate(LATENCY_BUCKETS):
+            count = self.histogram.get(lower, 0)
+            if count and cumulative + count >= rank:
+                if index + 1 == len(LATENCY_BUCKETS):
+                    return lower
+                upper = LATENCY_BUCKETS[index + 1]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return LATENCY_BUCKETS[-1]
+
+
+def summarize_hourly_stats(
+    *, since: datetime, group_by: str = "hostname", hostname: str | None = None
+) -> dict[str | datetime, StatsSummary]:
+    """
+    Summarize the hourly statistics since a point in time.
+
+    :arg group_by: The field to group by, e.g. ``"hostname"`` or ``"hour"``.
+    :arg hostname: Only include the requests to this hostname.
+    """
+    from .models import OutgoingRequestsHourlyStats
+
+    stats = OutgoingRequestsHourlyStats.objects.filter(hour__gte=since)
+    if hostname is not None:
+        stats = stats.filter(hostname=hostname)
+    rows = (
+        stats.values(group_by, "status_class", "latency_bucket")
+        .annotate(num=Sum("count"), sum_ms=Sum("total_ms"))
+        .order_by()
+    )
+
+    summaries: defaultdict[str | datetime, StatsSummary] = defaultdict(StatsSummary)
+    for row in rows:
+        summary = summaries[row[group_by]]
+        summary.count += row["num"]
+        # without response, the status class is 0
+        if is_error(row["status_class"] or None):
+            summary.error_count += row["num"]
+        # the response time is meaningless without response
+        if row["status_class"]:
+            summary.total_ms += row["sum_ms"]
+            bucket = row["latency_bucket"]
+            summary.histogram[bucket] = summary.histogram.get(bucket, 0) + row["num"]
+    return dict(summaries)
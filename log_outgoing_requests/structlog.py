@@ -10,6 +10,7 @@ from django.views.debug import SafeExceptionReporterFilter
 
 from requests.models import CaseInsensitiveDict, PreparedRequest, Response
 
+from .datastructures import StreamCapture
 from .typing import (
     EventDict,
     is_any_request_log_record,
@@ -38,7 +39,8 @@ class ExtractRequestAndResponseDetails:
       this, as it can quickly explode your log storage.
 
       Note that bodies from streaming responses (e.g.
-      ``requests.get(url, stream=True)``) are never extracted.
+      ``requests.get(url, stream=True)``) are only extracted when the
+      ``LOG_OUTGOING_REQUESTS_CAPTURE_STREAMED_BODIES`` setting is enabled.
     :param body_max_content_length: If body extraction is enabled, this parameter
       controls the maximum size of bodies to be logged. Bodies that are larger will not
       be added to the event dict.
@@ -94,7 +96,12 @@ class ExtractRequestAndResponseDetails:
                     **self._process_headers(response.headers, "resp"),
                 }
             )
-            self._add_body_details(event_dict, response, is_stream=record.stream)
+            self._add_body_details(
+                event_dict,
+                response,
+                is_stream=record.stream,
+                captured=getattr(record, "captured_body", None),
+            )
 
         return event_dict
 
@@ -125,6 +132,7 @@ class ExtractRequestAndResponseDetails:
         event_dict: EventDict,
         http_obj: PreparedRequest | Response,
         is_stream: bool = False,
+        captured: StreamCapture | None = None,
     ) -> None:
         from .models import OutgoingRequestsLogConfig
         from .utils import process_body
@@ -139,7 +147,9 @@ class ExtractRequestAndResponseDetails:
         config = OutgoingRequestsLogConfig(
             max_content_length=self.body_max_content_length
         )
-        body_details = process_body(http_obj, config, is_stream=is_stream)
+        body_details = process_body(
+            http_obj, config, is_stream=is_stream, captured=captured
+        )
         event_dict.update(
             {
                 f"{direction}_content_type": body_details.content_type,
@@ -1,4 +1,5 @@
 import logging
+from datetime import UTC, datetime, timedelta
 
 from .compat import shared_task
 from .constants import SaveLogsChoice
@@ -7,14 +8,41 @@ logger = logging.getLogger(__name__)
 
 
 @shared_task
-def prune_logs():
+def prune_logs(
+    batch_size: int | None = None,
+    pause: float = 0,
+    time_budget: float | None = None,
+):
+    """
+    Delete expired log records.
+
+    See :meth:`log_outgoing_requests.models.OutgoingRequestsLogQueryset.prune` for the
+    meaning of the (optional) arguments.
+    """
     from .models import OutgoingRequestsLog
 
-    num_deleted = OutgoingRequestsLog.objects.prune()
+    num_deleted = OutgoingRequestsLog.objects.prune(
+        batch_size=batch_size, pause=pause, time_budget=time_budget
+    )
     logger.info("Deleted %d outgoing request log(s)", num_deleted)
     return num_deleted
 
 
+@shared_task
+def create_log_partitions(days_ahead: int = 3):
+    """
+    Create the log table partitions for the upcoming days, if partitioning is enabled.
+    """
+    from .partitioning import create_partitions, is_partitioned, is_partitioning_enabled
+
+    if not is_partitioning_enabled() or not is_partitioned():
+        return []
+
+    created = create_partitions(until=datetime.now(UTC) + timedelta(days=days_ahead))
+    logger.info("Created %d outgoing request log partition(s)", len(created))
+    return created
+
+
 @shared_task
 def reset_config():
     from .models import OutgoingRequestsLogConfig
@@ -2,12 +2,15 @@ from __future__ import annotations
 
 import logging
 from collections.abc import MutableMapping
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 from requests import RequestException
 from requests.models import PreparedRequest, Response
 from typing_extensions import TypeIs
 
+if TYPE_CHECKING:
+    from .datastructures import StreamCapture
+
 
 class RequestLogRecord(logging.LogRecord):
     """
@@ -20,6 +23,11 @@ class RequestLogRecord(logging.LogRecord):
     """
     Captured value of the ``request(url, stream=...)`` kwarg.
     """
+    captured_body: StreamCapture | None
+    """
+    Copy of the body of a streamed response, see the
+    ``LOG_OUTGOING_REQUESTS_CAPTURE_STREAMED_BODIES`` setting.
+    """
 
 
 class ErrorRequestLogRecord(logging.LogRecord):
@@ -3,13 +3,16 @@
 import logging
 import traceback
 from collections.abc import Iterable
+from functools import lru_cache
 
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from django.utils.http import parse_header_parameters
 
 from requests import PreparedRequest, Response
 
 from .conf import settings
-from .datastructures import ContentType, ProcessedBody
+from .datastructures import ContentType, ProcessedBody, StreamCapture
 from .models import OutgoingRequestsLogConfig
 
 logger = logging.getLogger(__name__)
@@ -21,29 +24,58 @@ def process_body(
     http_obj: HttpObj,
     config: OutgoingRequestsLogConfig,
     is_stream: bool = False,
+    captured: StreamCapture | None = None,
 ) -> ProcessedBody:
     """
     Process a request or response body by parsing the meta information.
+
+    For streamed responses, only the ``captured`` copy of the body is used, if any.
     """
     content_type, encoding = parse_content_type_header(http_obj)
     if not encoding:
         encoding = get_default_encoding(content_type)
-    # never allow persisting/consumption of the request.content for streamed responses
-    allow_persisting = (
-        not is_stream
-        and check_content_type(content_type)
-        and check_content_length(http_obj, config=config)
-    )
+
+    if is_stream:
+        # never consume the response.content of streamed responses
+        return _process_captured_body(captured, config, content_type, encoding)
+
+    is_loggable = check_content_type(content_type)
+    too_large = is_loggable and not check_content_length(http_obj, config=config)
+    allow_persisting = is_loggable and not too_large
     content = _get_body(http_obj) if allow_persisting else b""
 
     if isinstance(content, str):
         content = bytes(content, encoding)
+    elif not isinstance(content, bytes | None):
+        # streamed request body (generator or file-like object)
+        allow_persisting, content = False, b""
 
     return ProcessedBody(
         allow_saving_to_db=allow_persisting,
         content=content or b"",
         content_type=content_type,
         encoding=encoding,
+        too_large=too_large,
+    )
+
+
+def _process_captured_body(
+    captured: StreamCapture | None,
+    config: OutgoingRequestsLogConfig,
+    content_type: str,
+    encoding: str,
+) -> ProcessedBody:
+    is_loggable = captured is not None and check_content_type(content_type)
+    too_large = is_loggable and (
+        captured.exceeded or captured.size > config.max_content_length
+    )
+    content = captured.getvalue() if is_loggable and not too_large else None
+    return ProcessedBody(
+        allow_saving_to_db=content is not None,
+        content=content or b"",
+        content_type=content_type,
+        encoding=encoding,
+        too_large=too_large,
     )
 
 
@@ -72,7 +104,9 @@ def _get_content_length(http_obj: HttpObj) -> str:
 
     if not content_length:
         body = _get_body(http_obj)
-        if body is not None:
+        # request bodies can also be generators or file-like objects, which we must not
+        # consume
+        if isinstance(body, bytes | str):
             content_length = str(len(body))
 
     return content_length
@@ -122,6 +156,56 @@ def parse_content_type_header(http_obj: HttpObj) -> tuple[str, str]:
     return content_type, encoding
 
 
+class ContentTypeMatcher:
+    """
+    Match content types against the allowed :class:`ContentType` patterns.
+
+    Regular patterns ("text/xml") are looked up in a dict, while patterns containing a
+    wildcard ("text/*") are checked in order of definition. Since the number of
+    distinct content types seen in practice is small, the results are memoized.
+    """
+
+    def __init__(self, content_types: Iterable[ContentType], cache_size: int = 256):
+        self.exact: dict[str, ContentType] = {}
+        self.wildcards: list[tuple[str, ContentType]] = []
+        for content_type in content_types:
+            if content_type.pattern.endswith("*"):
+                self.wildcards.append((content_type.pattern[:-1], content_type))
+            else:
+                self.exact.setdefault(content_type.pattern, content_type)
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+
+    def _match(self, content_type: str) -> ContentType | None:
+        if (match := self.exact.get(content_type)) is not None:
+            return match
+        for prefix, wildcard_type in self.wildcards:
+            if content_type.startswith(prefix):
+                return wildcard_type
+        return None
+
+
+_content_type_matcher: ContentTypeMatcher | None = None
+
+
+def get_content_type_matcher() -> ContentTypeMatcher:
+    """
+    Get the matcher for the ``LOG_OUTGOING_REQUESTS_CONTENT_TYPES`` setting.
+    """
+    global _content_type_matcher
+    if _content_type_matcher is None:
+        _content_type_matcher = ContentTypeMatcher(
+            settings.LOG_OUTGOING_REQUESTS_CONTENT_TYPES
+        )
+    return _content_type_matcher
+
+
+@receiver(setting_changed)
+def _reset_content_type_matcher(*, setting: str, **kwargs) -> None:
+    global _content_type_matcher
+    if setting == "LOG_OUTGOING_REQUESTS_CONTENT_TYPES":
+        _content_type_matcher = None
+
+
 def check_content_type(content_type: str) -> bool:
     """
     Check `content_type` against settings.
@@ -132,48 +216,12 @@ def check_content_type(content_type: str) -> bool:
     For patterns containing a wildcard ("text/*"), check if `content_type.pattern`
     is a substring of any pattern contained in the list.
     """
-    allowed_content_types: Iterable[ContentType] = (
-        settings.LOG_OUTGOING_REQUESTS_CONTENT_TYPES
-    )
-    regular_patterns = [
-        item.pattern for item in allowed_content_types if not item.pattern.endswith("*")
-    ]
-    wildcard_patterns = [
-        item.pattern for item in allowed_content_types if item.pattern.endswith("*")
-    ]
-
-    if content_type in regular_patterns:
-        return True
-
-    return any(content_type.startswith(pattern[:-1]) for pattern in wildcard_patterns)
+    return get_content_type_matcher().match(content_type) is not None
 
 
 def get_default_encoding(content_type_pattern: str) -> str:
     """
     Get the default encoding for the `ContentType` with the associated pattern.
     """
-    allowed_content_types: Iterable[ContentType] = (
-        settings.LOG_OUTGOING_REQUESTS_CONTENT_TYPES
-    )
-
-    regular_types = [
-        item for item in allowed_content_types if not item.pattern.endswith("*")
-    ]
-    wildcard_types = [
-        item for item in allowed_content_types if item.pattern.endswith("*")
-    ]
-
-    content_type = next(
-        (item for item in regular_types if item.pattern == content_type_pattern), None
-    )
-    if content_type is None:
-        content_type = next(
-            (
-                item
-                for item in wildcard_types
-                if content_type_pattern.startswith(item.pattern[:-1])
-            ),
-            None,
-        )
-
+    content_type = get_content_type_matcher().match(content_type_pattern)
     return content_type.default_encoding if content_type else ""
@@ -14,6 +14,18 @@ DATABASES = {
     }
 }
 
+# PostgreSQL-specific functionality is tested against the database from
+# docker-compose.yml (requires psycopg to be installed)
+if os.getenv("DB_ENGINE") == "postgresql":
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.getenv("DB_NAME", "log_outgoing_requests"),
+        "USER": os.getenv("DB_USER", "log_outgoing_requests"),
+        "PASSWORD": os.getenv("DB_PASSWORD", "log_outgoing_requests"),
+        "HOST": os.getenv("DB_HOST", "localhost"),
+        "PORT": os.getenv("DB_PORT", "5432"),
+    }
+
 INSTALLED_APPS = [
     "django.contrib.contenttypes",
     "django.contrib.auth",
@@ -1,13 +1,19 @@
 """Global pytest fixtures"""
 
 import logging
+import logging.config
 from collections.abc import Mapping
 
+from django.core.cache import caches
+
 import pytest
 from requests import Request, Response, Session
 from requests.models import CaseInsensitiveDict
 
+from log_outgoing_requests import config_cache
 from log_outgoing_requests.datastructures import ContentType
+from log_outgoing_requests.handlers import _stop_listener, get_listener
+from log_outgoing_requests.metrics import MetricsSink
 from log_outgoing_requests.typing import (
     ErrorRequestLogRecord,
     RequestLogRecord,
@@ -23,6 +29,22 @@ def disable_config_reset(settings):
     settings.LOG_OUTGOING_REQUESTS_RESET_DB_SAVE_AFTER = None
 
 
+@pytest.fixture(autouse=True)
+def clear_config_cache():
+    # the config is cached in-process, while the database is rolled back after each
+    # test
+    config_cache._entry = None
+    yield
+    config_cache._entry = None
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # cached data refers to database records, which are rolled back after each test
+    yield
+    caches["default"].clear()
+
+
 @pytest.fixture
 def default_settings(settings):
     settings.LOG_OUTGOING_REQUESTS_CONTENT_TYPES = [
@@ -96,6 +118,17 @@ class LogRecordEmitter:
         return record
 
 
+class FailingMetricsSink(MetricsSink):
+    def increment(self, name, value=1):
+        raise ValueError("Duplicated timeseries in CollectorRegistry")
+
+    def set_gauge(self, name, value):
+        raise ValueError("Duplicated timeseries in CollectorRegistry")
+
+    def observe(self, name, value):
+        raise ValueError("Duplicated timeseries in CollectorRegistry")
+
+
 @pytest.fixture
 def log_record_emitter():
     return LogRecordEmitter()
@@ -157,3 +190,46 @@ def request_mock_kwargs_binary():
             "Content-Type": "binary",
         },
     }
+
+
+@pytest.fixture
+def enable_background_thread_logging(
+    request: pytest.FixtureRequest, settings, monkeypatch: pytest.MonkeyPatch
+):
+    # extra handler factory options can be passed with indirect parametrization
+    handler_options = getattr(request, "param", {})
+    settings.LOG_OUTGOING_REQUESTS_HANDLER_USE_QUEUE = True
+    monkeypatch.setenv("_LOG_OUTGOING_REQUESTS_LOGGER_DEFER_LISTENER", "false")
+    logging.config.dictConfig(
+        {
+            "version": 1,
+            "disable_existing_loggers": False,
+            "handlers": {
+                "log_outgoing_requests": {
+                    "level": "DEBUG",
+                    "()": (
+                        "log_outgoing_requests.handlers"
+                        ".outgoing_requests_handler_factory"
+                    ),
+                    "buffer_size": 1,  # force immediate flush
+                    "flush_interval": 1,
+                    **handler_options,
+                },
+            },
+            "loggers": {
+                "log_outgoing_requests": {
+                    "handlers": ["log_outgoing_requests"],
+                    "level": "DEBUG",
+                    "propagate": False,
+                }
+            },
+        }
+    )
+    assert get_listener() is not None
+
+    try:
+        yield
+    finally:
+        _stop_listener()
+        # restore original config
+        logging.config.dictConfig(settings.LOGGING)
@@ -1,6 +1,10 @@
 """Tests for the admin interface"""
 
+from datetime import timedelta
+
+from django.db import connection
 from django.test import Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
@@ -8,7 +12,12 @@ import pytest
 import requests
 from pyquery import PyQuery
 
-from log_outgoing_requests.models import OutgoingRequestsLog, OutgoingRequestsLogConfig
+from log_outgoing_requests import admin, config_cache, stats
+from log_outgoing_requests.models import (
+    OutgoingRequestsLog,
+    OutgoingRequestsLogConfig,
+    OutgoingRequestsLogRule,
+)
 
 
 @pytest.fixture(autouse=True)
@@ -48,6 +57,143 @@ def test_decoded_content_display(admin_client):
     assert response_body == "I sleep all night and work all day."
 
 
+@pytest.mark.django_db
+def test_highlighted_bodies_are_cached(admin_client, mocker):
+    highlight_body = mocker.patch(
+        "log_outgoing_requests.admin.highlight_body", wraps=admin.highlight_body
+    )
+    log = OutgoingRequestsLog.objects.create(
+        req_content_type="application/json",
+        req_body=b'{"test": "request data"}',
+        res_content_type="application/json",
+        res_body=b'{"test": "response data"}',
+        timestamp=timezone.now(),
+    )
+    url = reverse(
+        "admin:log_outgoing_requests_outgoingrequestslog_change", args=(log.pk,)
+    )
+
+    responses = [admin_client.get(url), admin_client.get(url)]
+
+    assert highlight_body.call_count == 2
+    for response in responses:
+        doc = PyQuery(response.content.decode("utf-8"))
+        assert doc.find(".field-response_body .lor-http-body")
+        assert '"response data"' in doc.find(".field-response_body .readonly").text()
+
+
+@pytest.mark.django_db
+def test_large_bodies_are_not_highlighted(admin_client, settings):
+    settings.LOG_OUTGOING_REQUESTS_HIGHLIGHT_MAX_SIZE = 10
+    log = OutgoingRequestsLog.objects.create(
+        res_content_type="application/json",
+        res_body=b'{"test": "response data"}',
+        res_body_size=25,
+        timestamp=timezone.now(),
+    )
+    url = reverse(
+        "admin:log_outgoing_requests_outgoingrequestslog_change", args=(log.pk,)
+    )
+
+    response = admin_client.get(url)
+
+    doc = PyQuery(response.content.decode("utf-8"))
+    assert not doc.find(".field-response_body .lor-http-body")
+    assert doc.find(".field-response_body .readonly").text() == (
+        '{"test": "response data"}'
+    )
+
+
+@pytest.fixture
+def log_with_large_body():
+    body = b'{"data": "' + b"x" * 10_000 + b'"}'
+    return OutgoingRequestsLog.objects.create(
+        res_content_type="application/json",
+        res_body=body,
+        res_body_size=len(body),
+        timestamp=timezone.now(),
+    )
+
+
+@pytest.mark.django_db
+def test_large_bodies_are_previewed(admin_client, log_with_large_body):
+    url = reverse(
+        "admin:log_outgoing_requests_outgoingrequestslog_change",
+        args=(log_with_large_body.pk,),
+    )
+
+    response = admin_client.get(url)
+
+    assert response.status_code == 200
+    doc = PyQuery(response.content.decode("utf-8"))
+    response_body = doc.find(".field-response_body .lor-body-preview")
+    assert len(response_body.find("pre").text()) == admin.BODY_PREVIEW_LENGTH + 1
+    body_url = reverse(
+        "admin:log_outgoing_requests_outgoingrequestslog_body",
+        args=(log_with_large_body.pk, "res"),
+    )
+    assert response_body.find("a").attr("href") == f"{body_url}?format=highlighted"
+    raw_response_body = doc.find(".field-raw_response_body .lor-body-preview")
+    assert raw_response_body.find("a").attr("href") == f"{body_url}?format=raw"
+
+
+@pytest.mark.django_db
+def test_body_view_streams_the_full_body(admin_client, log_with_large_body):
+    url = reverse(
+        "admin:log_outgoing_requests_outgoingrequestslog_body",
+        args=(log_with_large_body.pk, "res"),
+    )
+
+    response = admin_client.get(url, {"format": "raw"})
+
+    assert response.status_code == 200
+    assert response.streaming
+    assert response["Content-Type"] == "text/plain; charset=utf-8"
+    assert b"".join(response.streaming_content) == log_with_large_body.res_body
+
+    response = admin_client.get(url, {"format": "highlighted"})
+
+    assert response["Content-Type"] == "text/html; charset=utf-8"
+    doc = PyQuery(b"".join(response.streaming_content).decode("utf-8"))
+    assert doc.has_class("lor-http-body")
+    assert "x" * 10_000 in doc.text()
+
+
+@pytest.mark.django_db
+def test_body_view_requires_staff_user(client, log_with_large_body):
+    url = reverse(
+        "admin:log_outgoing_requests_outgoingrequestslog_body",
+        args=(log_with_large_body.pk, "res"),
+    )
+
+    response = client.get(url)
+
+    assert response.status_code == 302
+
+
+@pytest.mark.django_db
+def test_too_large_body_display(admin_client):
+    log = OutgoingRequestsLog.objects.create(
+        req_body=b"I'm a lumberjack and I'm okay.",
+        res_body_too_large=True,
+        timestamp=timezone.now(),
+    )
+    url = reverse(
+        "admin:log_outgoing_requests_outgoingrequestslog_change", args=(log.pk,)
+    )
+
+    response = admin_client.get(url)
+
+    assert response.status_code == 200
+    doc = PyQuery(response.content.decode("utf-8"))
+    request_body = doc.find(".field-request_body .readonly").text()
+    response_body = doc.find(".field-response_body .readonly").text()
+    assert request_body == "I'm a lumberjack and I'm okay."
+    assert response_body == (
+        "(not saved - the body exceeds the maximum content length)"
+    )
+
+
 @pytest.mark.django_db
 def test_highlighted_bodies_shown_when_enabled_in_config(admin_client: Client):
     config = OutgoingRequestsLogConfig.get_solo()
@@ -236,6 +382,7 @@ def test_response_content_length_displayed_changelist_view(admin_client):
         id=1,
         req_body=b"Test request list view",
         res_body=b"Test Response list view",
+        res_body_size=23,
         timestamp=timezone.now(),
     )
 
@@ -252,6 +399,131 @@ def test_response_content_length_displayed_changelist_view(admin_client):
     assert log.response_content_length == 23
 
 
+@pytest.mark.django_db
+def test_changelist_view_does_not_load_bodies(admin_client):
+    OutgoingRequestsLog.objects.create(
+        req_body=b"Test request list view",
+        res_body=b"Test Response list view",
+        res_body_size=23,
+        timestamp=timezone.now(),
+    )
+    url = reverse("admin:log_outgoing_requests_outgoingrequestslog_changelist")
+
+    with CaptureQueriesContext(connection) as context:
+        response = admin_client.get(url)
+
+    assert response.status_code == 200
+    for query in context.captured_queries:
+        assert '"req_body"' not in query["sql"]
+        assert '"res_body"' not in query["sql"]
+
+
+@pytest.fixture
+def paginated_logs(monkeypatch):
+    model_admin = admin.admin.site.get_model_admin(OutgoingRequestsLog)
+    monkeypatch.setattr(model_admin, "list_per_page", 2)
+    timestamp = timezone.now()
+    # records with the same timestamp must not be skipped or repeated
+    return OutgoingRequestsLog.objects.bulk_create(
+        OutgoingRequestsLog(
+            url=f"https://example.com/{i}",
+            hostname="example.com",
+            timestamp=timestamp - timedelta(seconds=i // 2),
+        )
+        for i in range(5)
+    )
+
+
+@pytest.mark.django_db
+def test_changelist_keyset_pagination(admin_client, paginated_logs):
+    url = reverse("admin:log_outgoing_requests_outgoingrequestslog_changelist")
+
+    pages = []
+    while url:
+        with CaptureQueriesContext(connection) as context:
+            response = admin_client.get(url)
+        assert response.status_code == 200
+        for query in context.captured_queries:
+            assert "OFFSET" not in query["sql"]
+        changelist = response.context["cl"]
+        pages.append([log.pk for log in changelist.result_list])
+        next_page_url = changelist.next_page_url
+        url = next_page_url and (
+            reverse("admin:log_outgoing_requests_outgoingrequestslog_changelist")
+            + next_page_url
+        )
+
+    expected = sorted(
+        paginated_logs, key=lambda log: (log.timestamp, log.pk), reverse=True
+    )
+    assert pages == [
+        [log.pk for log in expected[0:2]],
+        [log.pk for log in expected[2:4]],
+        [log.pk for log in expected[4:]],
+    ]
+    doc = PyQuery(response.content.decode("utf-8"))
+    assert doc.find(".paginator .start").attr("href") == "?"
+    assert not doc.find(".paginator .next")
+
+
+@pytest.mark.django_db
+def test_changelist_invalid_cursor(admin_client, paginated_logs):
+    url = reverse("admin:log_outgoing_requests_outgoingrequestslog_changelist")
+
+    response = admin_client.get(url, {"cursor": "not-a-cursor"})
+
+    assert response.status_code == 302
+    assert response["Location"].endswith("?e=1")
+
+
+@pytest.mark.django_db
+def test_changelist_other_orderings_use_page_numbers(admin_client, paginated_logs):
+    url = reverse("admin:log_outgoing_requests_outgoingrequestslog_changelist")
+
+    # oldest first
+    response = admin_client.get(url, {"o": "7", "p": "2"})
+
+    assert response.status_code == 200
+    changelist = response.context["cl"]
+    assert not changelist.keyset_pagination
+    assert [log.url for log in changelist.result_list] == [
+        "https://example.com/2",
+        "https://example.com/1",
+    ]
+
+
+@pytest.mark.django_db
+def test_changelist_uses_estimated_count(admin_client, paginated_logs, mocker):
+    mocker.patch(
+        "log_outgoing_requests.pagination.estimate_count", return_value=1_000_000
+    )
+    url = reverse("admin:log_outgoing_requests_outgoingrequestslog_changelist")
+
+    response = admin_client.get(url)
+
+    assert response.context["cl"].result_count == 1_000_000
+    doc = PyQuery(response.content.decode("utf-8"))
+    assert "~1000000 Outgoing request logs" in doc.find(".paginator").text()
+
+
+@pytest.mark.django_db
+def test_changelist_filter_choices_are_cached(admin_client, paginated_logs):
+    url = reverse("admin:log_outgoing_requests_outgoingrequestslog_changelist")
+    admin_client.get(url)
+    OutgoingRequestsLog.objects.create(
+        hostname="example.org", status_code=500, timestamp=timezone.now()
+    )
+
+    with CaptureQueriesContext(connection) as context:
+        response = admin_client.get(url)
+
+    for query in context.captured_queries:
+        assert "DISTINCT" not in query["sql"]
+    doc = PyQuery(response.content.decode("utf-8"))
+    assert "example.com" in doc.find("#changelist-filter").text()
+    assert "example.org" not in doc.find("#changelist-filter").text()
+
+
 @pytest.mark.django_db
 def test_response_content_length_displayed_change_view(admin_client):
     """Assert the length of the content of the response is displayed in change_view"""
@@ -260,6 +532,7 @@ def test_response_content_length_displayed_change_view(admin_client):
         id=1,
         req_body=b"Test request list view",
         res_body=b"Test Response list view",
+        res_body_size=23,
         timestamp=timezone.now(),
     )
     url = reverse(
@@ -279,3 +552,86 @@ def test_response_content_length_displayed_change_view(admin_client):
     assert response_body == "Test Response list view"
     assert content_length == "23"
     assert log.response_content_length == 23
+
+
+#
+# test the statistics dashboard
+#
+@pytest.fixture
+def hourly_stats(settings):
+    settings.LOG_OUTGOING_REQUESTS_HOURLY_STATS = True
+    now = timezone.now()
+    stats.update_hourly_stats(
+        [
+            OutgoingRequestsLog(
+                hostname=hostname,
+                method="GET",
+                status_code=status_code,
+                response_ms=120,
+                timestamp=now,
+            )
+            for hostname, status_code in [
+                ("example.com", 200),
+                ("example.com", 500),
+                ("example.org", 200),
+            ]
+        ]
+    )
+
+
+@pytest.mark.django_db
+def test_stats_dashboard_per_hostname(admin_client, hourly_stats):
+    url = reverse("admin:log_outgoing_requests_outgoingrequestshourlystats_changelist")
+
+    response = admin_client.get(url)
+
+    assert response.status_code == 200
+    doc = PyQuery(response.content.decode("utf-8"))
+    rows = [
+        [cell.text() for cell in row.items("th, td")]
+        for row in doc.find("#result_list tbody tr").items()
+    ]
+    assert rows == [
+        ["example.com", "2", "1", "50.0%", "120", "175", "243", "249"],
+        ["example.org", "1", "0", "0.0%", "120", "175", "243", "249"],
+    ]
+    assert doc.find("#result_list tbody a").attr("href") == (
+        "?hours=24&hostname=example.com"
+    )
+
+
+@pytest.mark.django_db
+def test_stats_dashboard_per_hour(admin_client, hourly_stats):
+    url = reverse("admin:log_outgoing_requests_outgoingrequestshourlystats_changelist")
+
+    response = admin_client.get(url, {"hostname": "example.org", "hours": "168"})
+
+    assert response.status_code == 200
+    assert len(response.context["rows"]) == 1
+    assert response.context["rows"][0]["summary"].count == 1
+    assert response.context["hours"] == 168
+
+
+@pytest.mark.django_db
+def test_stats_dashboard_requires_staff_user(client):
+    url = reverse("admin:log_outgoing_requests_outgoingrequestshourlystats_changelist")
+
+    response = client.get(url)
+
+    assert response.status_code == 302
+
+
+@pytest.mark.django_db
+def test_deleting_rules_invalidates_the_config_cache(admin_client):
+    rule = OutgoingRequestsLogRule.objects.create(hostname="example.com")
+    config_cache.get_config()
+    url = reverse("admin:log_outgoing_requests_outgoingrequestslogrule_changelist")
+
+    response = admin_client.post(
+        url,
+        {"action": "delete_selected", "_selected_action": [rule.pk], "post": "yes"},
+    )
+
+    assert response.status_code == 302
+    assert not OutgoingRequestsLogRule.objects.exists()
+    assert config_cache._entry is None
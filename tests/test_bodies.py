@@ -0,0 +1,336 @@
+"""Tests for the storage of request and response bodies"""
+
+import json
+import os
+
+from django.core.files.storage import storages
+from django.db import DatabaseError, connection
+from django.utils import timezone
+
+import pytest
+import requests
+from freezegun import freeze_time
+
+from log_outgoing_requests import bodies
+from log_outgoing_requests.constants import BodyCodec
+from log_outgoing_requests.handlers import save_logs
+from log_outgoing_requests.models import OutgoingRequestsBody, OutgoingRequestsLog
+
+BODY = json.dumps(
+    [{"id": i, "name": f"item {i}", "tags": ["a", "b"]} for i in range(100)]
+).encode()
+
+
+@pytest.mark.parametrize("codec", [BodyCodec.zlib, BodyCodec.zstd])
+def test_compress_roundtrip(codec):
+    if codec == BodyCodec.zstd and not bodies.ZSTD_AVAILABLE:
+        pytest.skip("zstd is not available")
+
+    compressed, applied_codec = bodies.compress(BODY, codec)
+
+    assert applied_codec == codec
+    assert len(compressed) < len(BODY)
+    assert bodies.decompress(memoryview(compressed), applied_codec) == BODY
+
+
+def test_small_and_incompressible_bodies_are_stored_as_is():
+    assert bodies.compress(b"{}", BodyCodec.zlib) == (b"{}", BodyCodec.none)
+
+    random_body = os.urandom(512)
+    assert bodies.compress(random_body, BodyCodec.zlib) == (
+        random_body,
+        BodyCodec.none,
+    )
+
+
+def test_zstd_falls_back_to_zlib(settings, monkeypatch):
+    settings.LOG_OUTGOING_REQUESTS_BODY_COMPRESSION = "zstd"
+    monkeypatch.setattr(bodies, "ZSTD_AVAILABLE", False)
+
+    assert bodies.get_codec() == BodyCodec.zlib
+
+
+@pytest.mark.django_db
+def test_bodies_are_compressed_before_saving(
+    settings, requests_mock, request_mock_kwargs
+):
+    settings.LOG_OUTGOING_REQUESTS_BODY_COMPRESSION = "zlib"
+    requests_mock.post(
+        request_mock_kwargs["url"],
+        content=BODY,
+        headers={"Content-Type": "application/json"},
+    )
+
+    requests.post(request_mock_kwargs["url"], data=BODY)
+
+    log = OutgoingRequestsLog.objects.get()
+    assert log.res_body_codec == BodyCodec.zlib
+    assert len(log.res_body) < len(BODY)
+    assert log.res_body_size == len(BODY)
+    assert log.get_response_body() == BODY
+    assert json.loads(log.response_body_decoded) == json.loads(BODY)
+
+
+@pytest.mark.django_db
+def test_bodies_are_not_compressed_by_default(requests_mock, request_mock_kwargs):
+    requests_mock.post(
+        request_mock_kwargs["url"],
+        content=BODY,
+        headers={"Content-Type": "application/json"},
+    )
+
+    requests.post(request_mock_kwargs["url"], data=BODY)
+
+    log = OutgoingRequestsLog.objects.get()
+    assert log.res_body_codec == BodyCodec.none
+    assert log.res_body == BODY
+    assert log.res_body_size == len(BODY)
+
+
+@pytest.mark.django_db
+def test_identical_bodies_are_stored_once(settings, requests_mock, request_mock_kwargs):
+    settings.LOG_OUTGOING_REQUESTS_BODY_DEDUPLICATION = True
+    settings.LOG_OUTGOING_REQUESTS_BODY_COMPRESSION = "zlib"
+    requests_mock.post(
+        request_mock_kwargs["url"],
+        content=BODY,
+        headers={"Content-Type": "application/json"},
+    )
+
+    for _ in range(3):
+        requests.post(request_mock_kwargs["url"], json={"small": "body"})
+
+    shared_body = OutgoingRequestsBody.objects.get()
+    assert shared_body.hash == bodies.hash_body(BODY)
+    assert shared_body.codec == BodyCodec.zlib
+    for log in OutgoingRequestsLog.objects.all():
+        # the request body is too small to be shared
+        assert log.req_body_ref is None
+        assert json.loads(log.get_request_body()) == {"small": "body"}
+        assert log.res_body == b""
+        assert log.res_body_ref == shared_body
+        assert log.get_response_body() == BODY
+
+
+@pytest.mark.django_db
+def test_saving_known_bodies_marks_them_as_used(settings, mocker):
+    settings.LOG_OUTGOING_REQUESTS_BODY_DEDUPLICATION = True
+    settings.LOG_OUTGOING_REQUESTS_BODY_COMPRESSION = "zlib"
+    with freeze_time("2023-10-02T12:00:00Z"):
+        bodies.prepare_bodies([OutgoingRequestsLog(req_body=BODY)])
+    spy_compress = mocker.spy(bodies, "compress")
+
+    with freeze_time("2023-10-04T12:00:00Z"):
+        bodies.prepare_bodies([OutgoingRequestsLog(req_body=BODY)])
+
+    shared_body = OutgoingRequestsBody.objects.get()
+    assert shared_body.last_used.isoformat() == "2023-10-04T12:00:00+00:00"
+    assert shared_body.codec == BodyCodec.zlib
+    # the known body is not compressed again
+    assert all(call.args[0] != BODY for call in spy_compress.call_args_list)
+
+
+@pytest.mark.django_db
+def test_shared_bodies_are_upserted_without_conflict_target_on_mysql(settings, mocker):
+    settings.LOG_OUTGOING_REQUESTS_BODY_DEDUPLICATION = True
+    # like MySQL and MariaDB
+    mocker.patch.object(
+        connection.features, "supports_update_conflicts_with_target", False
+    )
+    bulk_create = mocker.patch.object(OutgoingRequestsBody.objects, "bulk_create")
+
+    bodies.prepare_bodies([OutgoingRequestsLog(req_body=BODY)])
+
+    assert bulk_create.call_args.kwargs["update_conflicts"]
+    assert bulk_create.call_args.kwargs["unique_fields"] is None
+
+
+@pytest.mark.django_db
+def test_known_body_deleted_while_saving_is_saved_again(settings, mocker):
+    settings.LOG_OUTGOING_REQUESTS_BODY_DEDUPLICATION = True
+    bodies.prepare_bodies([OutgoingRequestsLog(req_body=BODY)])
+    now = timezone.now()
+
+    def prune_concurrently():
+        # pruning deletes the body right after the writer found it
+        OutgoingRequestsBody.objects.all().delete()
+        return now
+
+    mocker.patch.object(bodies.timezone, "now", side_effect=prune_concurrently)
+    log = OutgoingRequestsLog(req_body=BODY)
+    bodies.prepare_bodies([log])
+
+    assert OutgoingRequestsBody.objects.get().get_content() == BODY
+    assert log.req_body_ref_id == bodies.hash_body(BODY)
+
+
+@pytest.mark.django_db
+def test_prune_deletes_unused_bodies(settings):
+    settings.LOG_OUTGOING_REQUESTS_MAX_AGE = 1
+    settings.LOG_OUTGOING_REQUESTS_BODY_DEDUPLICATION = True
+
+    with freeze_time("2023-10-02T12:00:00Z") as frozen_time:
+        expired_log = OutgoingRequestsLog(timestamp=timezone.now(), req_body=BODY)
+        bodies.prepare_bodies([expired_log])
+        expired_log.save()
+        assert expired_log.req_body_ref_id
+        frozen_time.move_to("2023-10-04T12:00:00Z")
+        # body saved, but the referencing log record is not written yet
+        OutgoingRequestsBody.objects.create(
+            hash="pending", content=b"", last_used=timezone.now()
+        )
+
+        OutgoingRequestsLog.objects.prune()
+
+    assert not OutgoingRequestsLog.objects.exists()
+    assert OutgoingRequestsBody.objects.get().hash == "pending"
+
+
+@pytest.mark.django_db
+def test_prune_keeps_bodies_that_are_still_referenced(settings):
+    settings.LOG_OUTGOING_REQUESTS_MAX_AGE = 1
+    settings.LOG_OUTGOING_REQUESTS_BODY_DEDUPLICATION = True
+
+    with freeze_time("2023-10-02T12:00:00Z") as frozen_time:
+        logs = [
+            OutgoingRequestsLog(timestamp=timezone.now(), res_body=BODY)
+            for _ in range(3)
+        ]
+        bodies.prepare_bodies(logs)
+        OutgoingRequestsLog.objects.bulk_create(logs)
+        frozen_time.move_to("2023-10-04T12:00:00Z")
+        # not expired yet, but its body was last used before the cutoff
+        OutgoingRequestsLog.objects.filter(pk=logs[0].pk).update(
+            timestamp=timezone.now()
+        )
+
+        OutgoingRequestsLog.objects.prune(batch_size=1)
+
+    assert OutgoingRequestsLog.objects.get().get_response_body() == BODY
+
+
+@pytest.fixture
+def body_storage(settings):
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "outgoing_requests": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+    }
+    settings.LOG_OUTGOING_REQUESTS_BODY_STORAGE = "outgoing_requests"
+    settings.LOG_OUTGOING_REQUESTS_BODY_STORAGE_THRESHOLD = 1024
+    return storages["outgoing_requests"]
+
+
+@pytest.mark.django_db
+def test_large_bodies_are_kept_in_the_body_storage(
+    settings, body_storage, requests_mock, request_mock_kwargs
+):
+    settings.LOG_OUTGOING_REQUESTS_BODY_COMPRESSION = "zlib"
+    requests_mock.post(
+        request_mock_kwargs["url"],
+        content=BODY,
+        headers={"Content-Type": "application/json"},
+    )
+
+    requests.post(request_mock_kwargs["url"], json={"small": "body"})
+
+    log = OutgoingRequestsLog.objects.get()
+    assert log.req_body_file == ""
+    assert json.loads(log.get_request_body()) == {"small": "body"}
+    assert log.res_body == b""
+    assert log.res_body_codec == BodyCodec.zlib
+    assert body_storage.exists(log.res_body_file)
+    assert log.get_response_body() == BODY
+    assert json.loads(log.response_body_decoded) == json.loads(BODY)
+
+
+@pytest.mark.django_db
+def test_bodies_are_kept_in_the_database_if_the_body_storage_fails(
+    body_storage, mocker
+):
+    mocker.patch.object(body_storage, "save", side_effect=OSError("Disk full"))
+    log = OutgoingRequestsLog(timestamp=timezone.now(), res_body=BODY)
+
+    bodies.prepare_bodies([log])
+
+    assert log.res_body_file == ""
+    assert log.res_body == BODY
+
+
+@pytest.mark.django_db
+def test_stored_bodies_are_deleted_if_saving_the_logs_fails(body_storage, mocker):
+    save = mocker.spy(body_storage, "save")
+    mocker.patch.object(
+        OutgoingRequestsLog.objects, "bulk_create", side_effect=DatabaseError
+    )
+    log = OutgoingRequestsLog(timestamp=timezone.now(), res_body=BODY)
+
+    with pytest.raises(DatabaseError):
+        save_logs([log])
+
+    assert log.res_body_file == save.spy_return
+    assert not body_storage.exists(log.res_body_file)
+
+
+def test_deleting_stored_bodies_continues_after_errors(body_storage, mocker):
+    delete = mocker.patch.object(
+        body_storage, "delete", side_effect=[OSError("Gone"), None]
+    )
+
+    num_deleted = bodies.delete_stored_bodies(["first.res", "second.res"])
+
+    assert num_deleted == 1
+    assert delete.call_count == 2
+
+
+@pytest.mark.django_db
+def test_missing_stored_body_is_empty(body_storage):
+    log = OutgoingRequestsLog(res_body_file="outgoing_requests/missing.res")
+
+    assert log.get_response_body() == b""
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("batch_size", [None, 2])
+def test_prune_deletes_stored_bodies(settings, body_storage, batch_size):
+    settings.LOG_OUTGOING_REQUESTS_MAX_AGE = 1
+
+    with freeze_time("2023-10-02T12:00:00Z") as frozen_time:
+        logs = [
+            OutgoingRequestsLog(timestamp=timezone.now(), res_body=BODY)
+            for _ in range(3)
+        ]
+        bodies.prepare_bodies(logs)
+        OutgoingRequestsLog.objects.bulk_create(logs)
+        frozen_time.move_to("2023-10-04T12:00:00Z")
+        recent_log = OutgoingRequestsLog(timestamp=timezone.now(), req_body=BODY)
+        bodies.prepare_bodies([recent_log])
+        recent_log.save()
+
+        num_deleted = OutgoingRequestsLog.objects.prune(batch_size=batch_size)
+
+    assert num_deleted == 3
+    for log in logs:
+        assert not body_storage.exists(log.res_body_file)
+    assert body_storage.exists(recent_log.req_body_file)
+
+
+@pytest.mark.django_db
+def test_prune_deletes_stored_bodies_per_batch(settings, body_storage):
+    settings.LOG_OUTGOING_REQUESTS_MAX_AGE = 1
+
+    with freeze_time("2023-10-02T12:00:00Z") as frozen_time:
+        logs = [
+            OutgoingRequestsLog(timestamp=timezone.now(), res_body=BODY)
+            for _ in range(3)
+        ]
+        bodies.prepare_bodies(logs)
+        OutgoingRequestsLog.objects.bulk_create(logs)
+        frozen_time.move_to("2023-10-04T12:00:00Z")
+
+        # stops after the first batch
+        num_deleted = OutgoingRequestsLog.objects.prune(batch_size=2, time_budget=0)
+
+    assert num_deleted == 2
+    assert not body_storage.exists(logs[0].res_body_file)
+    assert not body_storage.exists(logs[1].res_body_file)
+    assert body_storage.exists(logs[2].res_body_file)
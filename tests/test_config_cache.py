@@ -0,0 +1,95 @@
+"""Tests for the process-local configuration cache"""
+
+from django.core.cache import cache
+
+import pytest
+
+from log_outgoing_requests.config_cache import VERSION_CACHE_KEY, get_config
+from log_outgoing_requests.models import OutgoingRequestsLogConfig
+
+
+@pytest.mark.django_db
+def test_config_is_cached(django_assert_num_queries):
+    OutgoingRequestsLogConfig.get_solo()
+
+    with django_assert_num_queries(1):
+        config = get_config()
+
+    with django_assert_num_queries(0):
+        assert get_config() is config
+
+
+@pytest.mark.django_db
+def test_caching_can_be_disabled(settings, django_assert_num_queries):
+    settings.LOG_OUTGOING_REQUESTS_CONFIG_CACHE_TIMEOUT = 0
+    get_config()
+
+    with django_assert_num_queries(1):
+        get_config()
+
+
+@pytest.mark.django_db
+def test_saving_config_invalidates_cache():
+    assert get_config().prettify_bodies
+
+    config = OutgoingRequestsLogConfig.get_solo()
+    config.prettify_bodies = False
+    config.save()
+
+    assert not get_config().prettify_bodies
+
+
+@pytest.fixture
+def shared_cache(mocker):
+    # the local memory cache of the test settings is process-local
+    mocker.patch(
+        "log_outgoing_requests.config_cache._is_cache_shared", return_value=True
+    )
+
+
+@pytest.mark.django_db
+def test_expired_config_is_reloaded_with_process_local_cache(
+    mocker, django_assert_num_queries
+):
+    mock_monotonic = mocker.patch(
+        "log_outgoing_requests.config_cache.time.monotonic", return_value=0
+    )
+    config = get_config()
+    mock_monotonic.return_value = 3600
+
+    with django_assert_num_queries(1):
+        assert get_config() is not config
+
+
+@pytest.mark.django_db
+def test_expired_config_is_reused_if_version_unchanged(
+    mocker, django_assert_num_queries, shared_cache
+):
+    mock_monotonic = mocker.patch(
+        "log_outgoing_requests.config_cache.time.monotonic", return_value=0
+    )
+    config = get_config()
+    mock_monotonic.return_value = 3600
+
+    with django_assert_num_queries(0):
+        assert get_config() is config
+
+
+@pytest.mark.django_db
+def test_expired_config_is_reloaded_if_changed_by_other_process(
+    mocker, django_assert_num_queries, shared_cache
+):
+    mock_monotonic = mocker.patch(
+        "log_outgoing_requests.config_cache.time.monotonic", return_value=0
+    )
+    config = get_config()
+    # simulate another process changing the config
+    cache.set(VERSION_CACHE_KEY, "changed-elsewhere")
+
+    with django_assert_num_queries(0):
+        assert get_config() is config
+
+    mock_monotonic.return_value = 3600
+
+    with django_assert_num_queries(1):
+        assert get_config() is not config
@@ -0,0 +1,123 @@
+"""Tests for exporting log records"""
+
+import csv
+import io
+import json
+from datetime import UTC, datetime
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+import pytest
+
+from log_outgoing_requests.export import FIELDS, export_logs
+from log_outgoing_requests.models import OutgoingRequestsLog
+
+
+@pytest.fixture
+def logs():
+    return [
+        OutgoingRequestsLog.objects.create(
+            url="https://example.com/some-path",
+            hostname="example.com",
+            method="GET",
+            status_code=200,
+            res_content_type="application/json",
+            res_body=b'{"test": "response data"}',
+            res_body_size=25,
+            timestamp=datetime(2023, 10, 2, 12, tzinfo=UTC),
+        ),
+        OutgoingRequestsLog.objects.create(
+            url="https://example.org/other-path",
+            hostname="example.org",
+            method="POST",
+            status_code=500,
+            timestamp=datetime(2023, 10, 3, 12, tzinfo=UTC),
+        ),
+    ]
+
+
+@pytest.mark.django_db
+def test_export_ndjson_without_bodies(logs):
+    with CaptureQueriesContext(connection) as context:
+        lines = list(
+            export_logs(OutgoingRequestsLog.objects.order_by("pk"), format="ndjson")
+        )
+
+    assert len(lines) == 2
+    row = json.loads(lines[0])
+    assert list(row) == list(FIELDS)
+    assert row["url"] == "https://example.com/some-path"
+    assert row["timestamp"] == "2023-10-02T12:00:00+00:00"
+    assert row["res_body_size"] == 25
+    for query in context.captured_queries:
+        assert '"res_body"' not in query["sql"]
+
+
+@pytest.mark.django_db
+def test_export_csv_with_bodies(logs):
+    lines = export_logs(
+        OutgoingRequestsLog.objects.order_by("pk"), format="csv", include_bodies=True
+    )
+
+    rows = list(csv.DictReader(io.StringIO("".join(lines))))
+    assert len(rows) == 2
+    assert rows[0]["status_code"] == "200"
+    assert rows[0]["response_body"] == '{"test": "response data"}'
+    assert rows[1]["response_body"] == ""
+
+
+@pytest.mark.django_db
+def test_export_command_filters(logs):
+    stdout = io.StringIO()
+
+    call_command(
+        "export_outgoing_request_logs",
+        "--since=2023-10-03",
+        "--hostname=example.org",
+        stdout=stdout,
+    )
+
+    (line,) = stdout.getvalue().splitlines()
+    assert json.loads(line)["id"] == logs[1].pk
+
+
+@pytest.mark.django_db
+def test_export_command_writes_to_file(logs, tmp_path):
+    output = tmp_path / "export.csv"
+
+    call_command(
+        "export_outgoing_request_logs",
+        "--format=csv",
+        "--bodies",
+        f"--output={output}",
+        stdout=io.StringIO(),
+    )
+
+    with output.open(newline="") as file:
+        rows = list(csv.DictReader(file))
+    assert [row["hostname"] for row in rows] == ["example.com", "example.org"]
+
+
+@pytest.mark.django_db
+def test_export_admin_action(admin_client, logs):
+    url = reverse("admin:log_outgoing_requests_outgoingrequestslog_changelist")
+
+    response = admin_client.post(
+        url,
+        {
+            "action": "export_as_ndjson",
+            "_selected_action": [log.pk for log in logs],
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.streaming
+    assert response["Content-Type"] == "application/x-ndjson"
+    assert response["Content-Disposition"].startswith(
+        'attachment; filename="outgoing-request-logs-'
+    )
+    lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+    assert {json.loads(line)["id"] for line in lines} == {log.pk for log in logs}
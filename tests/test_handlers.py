@@ -1,6 +1,7 @@
 import logging
 import logging.config
 import queue
+import threading
 import time
 from contextlib import nullcontext
 from unittest.mock import patch
@@ -11,9 +12,12 @@ import requests
 from log_outgoing_requests.handlers import (
     DatabaseOutgoingRequestsHandler,
     QueueHandler,
+    QueueListener,
     _queue,
     _stop_listener,
+    ensure_listener,
     get_listener,
+    get_listeners,
     outgoing_requests_handler_factory,
 )
 from log_outgoing_requests.models import OutgoingRequestsLog
@@ -22,7 +26,7 @@ from log_outgoing_requests.typing import (
     is_request_log_record,
 )
 
-from .conftest import LogRecordEmitter
+from .conftest import FailingMetricsSink, LogRecordEmitter
 
 
 def assert_background_thread_not_running():
@@ -62,6 +66,16 @@ def test_build_expected_instance_based_on_setting(
     assert_background_thread_not_running()
 
 
+def test_handler_factory_rejects_conflicting_queue_sizes(settings):
+    settings.LOG_OUTGOING_REQUESTS_HANDLER_USE_QUEUE = True
+    outgoing_requests_handler_factory(max_queue_size=100)
+
+    # the queue is shared
+    outgoing_requests_handler_factory(max_queue_size=100)
+    with pytest.raises(ValueError):
+        outgoing_requests_handler_factory(max_queue_size=10)
+
+
 @pytest.mark.django_db
 def test_handler_flushes_immediately_in_non_queue_mode(
     log_record_emitter: LogRecordEmitter,
@@ -137,6 +151,74 @@ def test_handler_flushes_in_queue_mode_when_flush_interval_is_exceeded(
         assert len(logs) == 2
 
 
+@pytest.mark.django_db
+def test_listener_flushes_buffer_when_no_records_arrive(
+    log_record_emitter: LogRecordEmitter,
+):
+    handler = DatabaseOutgoingRequestsHandler(
+        buffer_size=999,
+        flush_interval=0.05,
+        use_queue_mode=True,
+    )
+    test_queue = queue.Queue()
+    listener = QueueListener(test_queue, handler)
+    handler.handle(log_record_emitter())
+    assert not OutgoingRequestsLog.objects.exists()
+    timer = threading.Timer(0.2, test_queue.put_nowait, args=["next record"])
+    timer.start()
+
+    # blocks until the next record arrives, flushing the buffer in the meantime
+    result = listener.dequeue(True)
+
+    assert result == "next record"
+    assert OutgoingRequestsLog.objects.count() == 1
+    assert handler.flush_deadline is None
+
+
+def test_listener_waits_indefinitely_if_nothing_is_buffered():
+    handler = DatabaseOutgoingRequestsHandler(use_queue_mode=True)
+    listener = QueueListener(queue.Queue(), handler)
+
+    assert listener._get_timeout() is None
+
+
+@pytest.mark.django_db
+def test_handler_adapts_batch_size_to_load(log_record_emitter: LogRecordEmitter):
+    handler = DatabaseOutgoingRequestsHandler(
+        buffer_size=2,
+        max_buffer_size=8,
+        flush_interval=999,
+        use_queue_mode=True,
+    )
+    log_record = log_record_emitter()
+
+    for expected_batch_size in (4, 8, 8):
+        for _ in range(handler.batch_size):
+            handler.handle(log_record)
+        assert handler.batch_size == expected_batch_size
+    assert OutgoingRequestsLog.objects.count() == 2 + 4 + 8
+
+    handler.handle(log_record)
+    handler.flush_interval = 0
+    handler.flush_if_due()
+
+    assert handler.batch_size == 4
+    assert OutgoingRequestsLog.objects.count() == 2 + 4 + 8 + 1
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"buffer_size": 0},
+        {"buffer_size": 10, "max_buffer_size": 5},
+        {"flush_interval": 0},
+    ],
+)
+def test_handler_rejects_invalid_buffer_options(options: dict):
+    with pytest.raises(ValueError):
+        DatabaseOutgoingRequestsHandler(use_queue_mode=True, **options)
+
+
 @pytest.mark.django_db
 def test_closing_handler_flushes_the_queue(log_record_emitter: LogRecordEmitter):
     handler = DatabaseOutgoingRequestsHandler(
@@ -191,6 +273,28 @@ def test_handler_calls_on_error_callback_if_provided(
     assert len(errors_seen) == 1
 
 
+@pytest.mark.django_db
+def test_handler_discards_batch_that_cannot_be_saved(
+    settings,
+    log_record_emitter: LogRecordEmitter,
+):
+    errors_seen: list[Exception] = []
+    settings.LOG_OUTGOING_REQUESTS_HANDLER_ON_ERROR = errors_seen.append
+    log_record = log_record_emitter()
+    log_record.req.url = None  # type: ignore we're breaking it on purpose
+    handler = DatabaseOutgoingRequestsHandler(
+        buffer_size=999, flush_interval=999, use_queue_mode=True
+    )
+    handler.handle(log_record)
+
+    # closing the handler must not raise, nor try to save the batch again later
+    handler.close()
+    handler.close()
+
+    assert len(errors_seen) == 1
+    assert handler.buffer == []
+
+
 def test_queue_handler_plain_log_records():
     # log record masquerading as request log record, but it's missing the request
     # attributes
@@ -212,6 +316,7 @@ def test_queue_handler_plain_log_records():
         test_queue.get_nowait()
 
 
+@pytest.mark.django_db
 def test_queue_handler_request_exception_record_without_response(
     log_record_emitter: LogRecordEmitter,
 ):
@@ -230,44 +335,132 @@ def test_queue_handler_request_exception_record_without_response(
     handler.handle(log_record)
 
     queued_record = test_queue.get_nowait()
-    assert queued_record is log_record
+    assert queued_record.snapshot.url == "https://example.com/some/path?queryParam=one"
+    assert queued_record.snapshot.status_code is None
+    assert "RequestException" in queued_record.snapshot.trace
 
 
-@pytest.fixture
-def enable_background_thread_logging(settings, monkeypatch: pytest.MonkeyPatch):
-    settings.LOG_OUTGOING_REQUESTS_HANDLER_USE_QUEUE = True
-    monkeypatch.setenv("_LOG_OUTGOING_REQUESTS_LOGGER_DEFER_LISTENER", "false")
-    logging.config.dictConfig(
-        {
-            "version": 1,
-            "disable_existing_loggers": False,
-            "handlers": {
-                "log_outgoing_requests": {
-                    "level": "DEBUG",
-                    "()": (
-                        "log_outgoing_requests.handlers"
-                        ".outgoing_requests_handler_factory"
-                    ),
-                    "buffer_size": 1,  # force immediate flush
-                    "flush_interval": 1,
-                },
-            },
-            "loggers": {
-                "log_outgoing_requests": {
-                    "handlers": ["log_outgoing_requests"],
-                    "level": "DEBUG",
-                    "propagate": False,
-                }
-            },
-        }
+@pytest.mark.django_db
+def test_queue_handler_queues_snapshot(log_record_emitter: LogRecordEmitter):
+    log_record = log_record_emitter(
+        headers={"Authorization": "Bearer secret"}, data=b"request body"
     )
-    assert get_listener() is not None
+    test_queue = queue.Queue()
+    handler = QueueHandler(test_queue)
+
+    handler.handle(log_record)
+
+    queued_record = test_queue.get_nowait()
+    # the original record is left alone for other handlers
+    assert queued_record is not log_record
+    assert log_record.res is not None
+    assert not hasattr(queued_record, "req")
+    assert not hasattr(queued_record, "res")
+    snapshot = queued_record.snapshot
+    assert snapshot.method == "GET"
+    assert snapshot.hostname == "example.com"
+    assert "Authorization: ***hidden***" in snapshot.req_headers
+    assert snapshot.res_body is not None
+    assert snapshot.res_body.content == "Bòbr".encode()
+
+
+@pytest.mark.django_db
+def test_queue_handler_skips_records_if_saving_is_disabled(
+    settings, log_record_emitter: LogRecordEmitter
+):
+    settings.LOG_OUTGOING_REQUESTS_DB_SAVE = False
+    test_queue = queue.Queue()
+    handler = QueueHandler(test_queue)
+
+    handler.handle(log_record_emitter())
+
+    assert test_queue.empty()
 
-    try:
-        yield
-    finally:
-        # restore original config
-        logging.config.dictConfig(settings.LOGGING)
+
+def test_queue_handler_rejects_unknown_overflow_policy():
+    with pytest.raises(ValueError):
+        QueueHandler(queue.Queue(), overflow_policy="yolo")  # type: ignore
+
+
+def _queued_urls(test_queue: queue.Queue) -> list[str]:
+    urls = []
+    while not test_queue.empty():
+        urls.append(test_queue.get_nowait().snapshot.url)
+    return urls
+
+
+@pytest.mark.django_db
+def test_queue_handler_overflow_drop_newest(log_record_emitter: LogRecordEmitter):
+    test_queue = queue.Queue(maxsize=1)
+    handler = QueueHandler(test_queue, overflow_policy="drop_newest")
+
+    handler.handle(log_record_emitter(url="https://example.com/1", params={}))
+    handler.handle(log_record_emitter(url="https://example.com/2", params={}))
+
+    assert _queued_urls(test_queue) == ["https://example.com/1"]
+    assert handler.num_dropped == 1
+
+
+@pytest.mark.django_db
+def test_queue_handler_overflow_drop_oldest(log_record_emitter: LogRecordEmitter):
+    test_queue = queue.Queue(maxsize=1)
+    handler = QueueHandler(test_queue, overflow_policy="drop_oldest")
+
+    handler.handle(log_record_emitter(url="https://example.com/1", params={}))
+    handler.handle(log_record_emitter(url="https://example.com/2", params={}))
+
+    assert _queued_urls(test_queue) == ["https://example.com/2"]
+    assert handler.num_dropped == 1
+
+
+@pytest.mark.django_db
+def test_queue_handler_overflow_drop_oldest_keeps_listener_sentinel(
+    log_record_emitter: LogRecordEmitter,
+):
+    test_queue = queue.Queue(maxsize=1)
+    listener = QueueListener(test_queue)
+    listener.enqueue_sentinel()
+    handler = QueueHandler(test_queue, overflow_policy="drop_oldest")
+
+    handler.handle(log_record_emitter())
+
+    assert test_queue.get_nowait() is listener._sentinel
+    assert test_queue.empty()
+    assert handler.num_dropped == 1
+
+
+@pytest.mark.django_db
+def test_queue_handler_overflow_block(log_record_emitter: LogRecordEmitter):
+    test_queue = queue.Queue(maxsize=1)
+    handler = QueueHandler(test_queue, overflow_policy="block", block_timeout=0.01)
+
+    handler.handle(log_record_emitter(url="https://example.com/1", params={}))
+    handler.handle(log_record_emitter(url="https://example.com/2", params={}))
+
+    assert _queued_urls(test_queue) == ["https://example.com/1"]
+    assert handler.num_dropped == 1
+
+
+@pytest.mark.django_db
+def test_queue_handler_overflow_metadata_only(log_record_emitter: LogRecordEmitter):
+    test_queue = queue.Queue()
+    handler = QueueHandler(test_queue, overflow_policy="metadata_only", max_size=1)
+
+    handler.handle(log_record_emitter())
+    handler.handle(log_record_emitter())
+
+    assert test_queue.get_nowait().snapshot.res_body is not None
+    degraded_record = test_queue.get_nowait()
+    assert handler.num_dropped == 0
+    assert handler.num_degraded == 1
+    assert degraded_record.snapshot.res_body is None
+
+    db_handler = DatabaseOutgoingRequestsHandler(use_queue_mode=False)
+    db_handler.handle(degraded_record)
+
+    log = OutgoingRequestsLog.objects.get()
+    assert log.status_code == 200
+    assert log.res_body == b""
 
 
 @pytest.mark.real_db_close
@@ -293,6 +486,88 @@ def test_integration_via_logging_dictconfig(
     assert log_obj.url == request_mock_kwargs["url"]
 
 
+@pytest.mark.real_db_close
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize(
+    "enable_background_thread_logging",
+    [{"num_writers": 3, "buffer_size": 999, "flush_interval": 999}],
+    indirect=True,
+)
+def test_multiple_writer_threads_drain_on_shutdown(
+    requests_mock,
+    request_mock_kwargs,
+    enable_background_thread_logging,
+):
+    requests_mock.get(**request_mock_kwargs)
+    listeners = get_listeners()
+    assert len(listeners) == 3
+    db_handlers = {listener.handlers[0] for listener in listeners}
+    assert len(db_handlers) == 3, "Every writer thread must have its own handler"
+
+    for _ in range(10):
+        requests.get(
+            request_mock_kwargs["url"],
+            headers=request_mock_kwargs["request_headers"],
+        )
+
+    # nothing is written yet, everything is buffered
+    _queue.join()
+    assert not OutgoingRequestsLog.objects.exists()
+
+    _stop_listener()
+
+    assert get_listeners() == []
+    assert OutgoingRequestsLog.objects.count() == 10
+    assert all(not handler.buffer for handler in db_handlers)
+
+
+@pytest.mark.django_db
+def test_unexpected_exceptions_in_queue_mode_do_not_crash_entire_application(
+    mocker, requests_mock, enable_background_thread_logging
+):
+    mocker.patch(
+        "solo.models.SingletonModel.get_solo",
+        side_effect=Exception("Oh no, solo broke!"),
+    )
+    mock_handle_error = mocker.patch.object(QueueHandler, "handleError")
+    requests_mock.get("https://example.com")
+
+    try:
+        requests.get("https://example.com")
+    except Exception:
+        pytest.fail(
+            "Regular operation should not fatally crash because of logging issues."
+        )
+
+    mock_handle_error.assert_called_once()
+    assert OutgoingRequestsLog.objects.count() == 0
+
+
+@pytest.mark.real_db_close
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize(
+    "enable_background_thread_logging",
+    [{"metrics_sink": FailingMetricsSink()}],
+    indirect=True,
+)
+def test_metrics_sink_errors_do_not_stop_the_background_thread(
+    requests_mock, enable_background_thread_logging
+):
+    requests_mock.get("https://example.com")
+
+    requests.get("https://example.com")
+    _queue.join()
+    requests.get("https://example.com")
+    _queue.join()
+
+    assert OutgoingRequestsLog.objects.count() == 2
+
+
+def test_ensure_listener_requires_a_writer():
+    with pytest.raises(ValueError):
+        ensure_listener(DatabaseOutgoingRequestsHandler(), _defer=False, num_writers=0)
+
+
 @pytest.mark.live_http
 @pytest.mark.real_db_close
 @pytest.mark.django_db(transaction=True)
@@ -0,0 +1,243 @@
+"""Tests for the httpx integration"""
+
+import asyncio
+import gzip
+import json
+
+import httpx
+import pytest
+
+import log_outgoing_requests.httpx
+from log_outgoing_requests.datastructures import RequestLogSnapshot
+from log_outgoing_requests.httpx import AsyncDatabaseWriter, AsyncLoggingTransport
+from log_outgoing_requests.models import OutgoingRequestsLog, OutgoingRequestsLogConfig
+
+URL = "http://example.com:8000/some-path?version=2.0"
+
+
+class NetworkStream(httpx.AsyncByteStream):
+    """
+    Return the content in chunks, like a real network transport.
+    """
+
+    def __init__(self, content: bytes):
+        self.content = content
+
+    async def __aiter__(self):
+        for start in range(0, len(self.content), 8):
+            yield self.content[start : start + 8]
+
+
+def _respond(request: httpx.Request) -> httpx.Response:
+    match request.url.path:
+        case "/gzip":
+            return httpx.Response(
+                200,
+                headers={"Content-Type": "text/plain", "Content-Encoding": "gzip"},
+                stream=NetworkStream(
+                    gzip.compress(b"abcdefghijklmnopqrstuvwxyz0123456789")
+                ),
+            )
+        case "/error":
+            raise httpx.ConnectError("Connection refused", request=request)
+        case "/preloaded":
+            return httpx.Response(200, json={"test": "response data"})
+        case _:
+            return httpx.Response(
+                200,
+                headers={
+                    "Date": "Tue, 21 Mar 2023 15:24:08 GMT",
+                    "Content-Type": "application/json",
+                },
+                stream=NetworkStream(b'{"test": "response data"}'),
+            )
+
+
+async def _make_requests(*urls: str, stream: bool = False) -> None:
+    writer = AsyncDatabaseWriter(buffer_size=10)
+    transport = AsyncLoggingTransport(httpx.MockTransport(_respond), writer=writer)
+    try:
+        async with httpx.AsyncClient(transport=transport) as client:
+            for url in urls:
+                if stream:
+                    async with client.stream("GET", url) as response:
+                        async for _ in response.aiter_bytes():
+                            pass
+                else:
+                    await client.post(
+                        url,
+                        json={"test": "request data"},
+                        headers={"Authorization": "test"},
+                    )
+    finally:
+        await writer.aclose()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_logs_request_and_response():
+    asyncio.run(_make_requests(URL))
+
+    log = OutgoingRequestsLog.objects.get()
+    assert log.url == URL
+    assert log.hostname == "example.com:8000"
+    assert log.method == "POST"
+    assert log.status_code == 200
+    assert "Authorization: ***hidden***" in log.req_headers
+    assert "Date: Tue, 21 Mar 2023 15:24:08 GMT" in log.res_headers
+    assert log.req_content_type == "application/json"
+    assert json.loads(log.req_body) == {"test": "request data"}
+    assert log.res_content_type == "application/json"
+    assert json.loads(log.res_body) == {"test": "response data"}
+    assert log.trace == ""
+
+
+@pytest.mark.django_db(transaction=True)
+def test_logs_response_that_was_read_by_the_transport():
+    asyncio.run(_make_requests("http://example.com/preloaded"))
+
+    log = OutgoingRequestsLog.objects.get()
+    assert json.loads(log.res_body) == {"test": "response data"}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_logs_decompressed_streamed_response_body():
+    asyncio.run(_make_requests("http://example.com/gzip", stream=True))
+
+    log = OutgoingRequestsLog.objects.get()
+    assert log.res_body == b"abcdefghijklmnopqrstuvwxyz0123456789"
+    assert log.res_body_encoding == "utf-8"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_response_body_exceeding_max_content_length_is_not_saved(settings):
+    settings.LOG_OUTGOING_REQUESTS_MAX_CONTENT_LENGTH = 10
+
+    asyncio.run(_make_requests(URL, stream=True))
+
+    log = OutgoingRequestsLog.objects.get()
+    assert log.status_code == 200
+    assert log.res_body == b""
+    assert log.res_body_too_large
+
+
+@pytest.mark.django_db(transaction=True)
+def test_logs_transport_errors():
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(_make_requests("http://example.com/error"))
+
+    log = OutgoingRequestsLog.objects.get()
+    assert log.status_code is None
+    assert "ConnectError: Connection refused" in log.trace
+
+
+@pytest.mark.django_db(transaction=True)
+def test_nothing_is_logged_if_saving_is_disabled():
+    config = OutgoingRequestsLogConfig.get_solo()
+    config.save_to_db = "no"
+    config.save()
+
+    asyncio.run(_make_requests(URL))
+
+    assert not OutgoingRequestsLog.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_writer_drops_records_when_queue_is_full():
+    snapshot = RequestLogSnapshot(
+        created=0,
+        url=URL,
+        hostname="example.com:8000",
+        params="",
+        method="GET",
+        status_code=200,
+        response_ms=0,
+        req_headers="",
+        res_headers="",
+        trace="",
+    )
+
+    async def _main() -> AsyncDatabaseWriter:
+        writer = AsyncDatabaseWriter(max_queue_size=1)
+        writer.enqueue(snapshot)
+        writer.enqueue(snapshot)
+        await writer.aclose()
+        return writer
+
+    writer = asyncio.run(_main())
+
+    assert writer.num_dropped == 1
+    assert OutgoingRequestsLog.objects.count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_pending_records_are_saved_when_the_event_loop_shuts_down():
+    async def _main():
+        writer = AsyncDatabaseWriter(buffer_size=10, flush_interval=999)
+        transport = AsyncLoggingTransport(httpx.MockTransport(_respond), writer=writer)
+        async with httpx.AsyncClient(transport=transport) as client:
+            await client.get(URL)
+            await client.get(URL)
+        # let the writer task pick up the first record, the second one stays queued
+        await asyncio.sleep(0)
+
+    # the writer is not closed, asyncio.run cancels its task
+    asyncio.run(_main())
+
+    assert OutgoingRequestsLog.objects.count() == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cached_configuration_is_used_in_the_event_loop(mocker):
+    get_config = mocker.spy(log_outgoing_requests.httpx, "_get_config")
+
+    asyncio.run(_make_requests(URL))
+    asyncio.run(_make_requests(URL))
+
+    # only loading the configuration requires a worker thread
+    get_config.assert_called_once()
+    assert OutgoingRequestsLog.objects.count() == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_writer_cleans_up_the_database_connection(mocker):
+    close_old_connections = mocker.patch(
+        "log_outgoing_requests.httpx.close_old_connections"
+    )
+
+    asyncio.run(_make_requests(URL))
+
+    # before and after saving the records
+    assert close_old_connections.call_count == 2
+    assert OutgoingRequestsLog.objects.count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_config_errors_do_not_crash_the_application(mocker, settings):
+    settings.LOG_OUTGOING_REQUESTS_HANDLER_ON_ERROR = (errors_seen := []).append
+    mocker.patch(
+        "solo.models.SingletonModel.get_solo",
+        side_effect=Exception("Oh no, solo broke!"),
+    )
+
+    asyncio.run(_make_requests(URL))
+
+    assert len(errors_seen) == 1
+    assert not OutgoingRequestsLog.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("path", ["/some-path", "/preloaded", "/error"])
+def test_snapshot_errors_do_not_crash_the_application(mocker, settings, path):
+    settings.LOG_OUTGOING_REQUESTS_HANDLER_ON_ERROR = (errors_seen := []).append
+    mocker.patch(
+        "log_outgoing_requests.httpx._take_snapshot",
+        side_effect=Exception("Oh no, snapshot broke!"),
+    )
+
+    try:
+        asyncio.run(_make_requests(f"http://example.com{path}", stream=True))
+    except httpx.ConnectError:
+        assert path == "/error"
+
+    assert len(errors_seen) == 1
+    assert not OutgoingRequestsLog.objects.exists()
@@ -0,0 +1,138 @@
+"""Tests for the in-process latency histograms"""
+
+import asyncio
+import random
+
+import httpx
+import pytest
+import requests
+
+from log_outgoing_requests import latency
+from log_outgoing_requests.httpx import AsyncLoggingTransport
+from log_outgoing_requests.models import OutgoingRequestsLog
+
+
+@pytest.fixture(autouse=True)
+def _reset_histograms():
+    latency.get_latency_histograms(reset=True)
+    yield
+    latency.get_latency_histograms(reset=True)
+
+
+def test_percentiles_are_accurate():
+    rng = random.Random(42)
+    values = sorted(rng.lognormvariate(5, 1) for _ in range(10_000))
+    histogram = latency.LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+
+    assert histogram.count == 10_000
+    for q in (50, 90, 99):
+        exact = values[int(len(values) * q / 100) - 1]
+        assert histogram.percentile(q) == pytest.approx(exact, rel=0.021)
+
+
+def test_response_times_are_clamped():
+    histogram = latency.LatencyHistogram()
+
+    histogram.record(0)
+    histogram.record(10 * latency.MAX_LATENCY_MS)
+
+    assert histogram.percentile(0) == pytest.approx(1, rel=0.021)
+    assert histogram.percentile(100) == pytest.approx(latency.MAX_LATENCY_MS, rel=0.021)
+    assert histogram.percentile(50) is not None
+    assert latency.LatencyHistogram().percentile(50) is None
+
+
+def test_number_of_hostnames_is_bounded(monkeypatch):
+    monkeypatch.setattr(latency, "MAX_HOSTNAMES", 2)
+
+    for hostname in (
+        "a.example.com",
+        "b.example.com",
+        "c.example.com",
+        "d.example.com",
+    ):
+        latency.record_latency(hostname, 100)
+
+    histograms = latency.get_latency_histograms()
+    assert {hostname: h.count for hostname, h in histograms.items()} == {
+        "a.example.com": 1,
+        "b.example.com": 1,
+        latency.OTHER_HOSTNAMES: 2,
+    }
+
+
+def test_reset_returns_the_histograms():
+    latency.record_latency("example.com", 100)
+
+    histograms = latency.get_latency_histograms(reset=True)
+
+    assert histograms["example.com"].count == 1
+    assert latency.get_latency_histograms() == {}
+
+
+@pytest.mark.django_db
+def test_requests_are_recorded_without_saving_them(
+    settings, requests_mock, request_mock_kwargs
+):
+    settings.LOG_OUTGOING_REQUESTS_LATENCY_HISTOGRAMS = True
+    settings.LOG_OUTGOING_REQUESTS_DB_SAVE = False
+    requests_mock.get(**request_mock_kwargs)
+
+    for _ in range(3):
+        requests.get(
+            request_mock_kwargs["url"], headers=request_mock_kwargs["request_headers"]
+        )
+
+    assert not OutgoingRequestsLog.objects.exists()
+    histograms = latency.get_latency_histograms()
+    assert list(histograms) == ["example.com:8000"]
+    assert histograms["example.com:8000"].count == 3
+
+
+@pytest.mark.django_db
+def test_requests_are_not_recorded_by_default(requests_mock, request_mock_kwargs):
+    requests_mock.get(**request_mock_kwargs)
+
+    requests.get(
+        request_mock_kwargs["url"], headers=request_mock_kwargs["request_headers"]
+    )
+
+    assert latency.get_latency_histograms() == {}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_httpx_requests_are_recorded(settings):
+    settings.LOG_OUTGOING_REQUESTS_LATENCY_HISTOGRAMS = True
+    settings.LOG_OUTGOING_REQUESTS_DB_SAVE = False
+
+    async def make_request():
+        transport = AsyncLoggingTransport(
+            httpx.MockTransport(lambda request: httpx.Response(204))
+        )
+        async with httpx.AsyncClient(transport=transport) as client:
+            await client.get("https://example.com/")
+
+    asyncio.run(make_request())
+
+    assert latency.get_latency_histograms()["example.com"].count == 1
+
+
+def test_prometheus_collector():
+    prometheus_client = pytest.importorskip("prometheus_client")
+    registry = prometheus_client.CollectorRegistry()
+    registry.register(latency.PrometheusLatencyCollector())
+    for ms in (100, 200, 300):
+        latency.record_latency("example.com", ms)
+
+    count = registry.get_sample_value(
+        "log_outgoing_requests_responses_total", {"hostname": "example.com"}
+    )
+    median = registry.get_sample_value(
+        "log_outgoing_requests_response_time_seconds",
+        {"hostname": "example.com", "quantile": "0.5"},
+    )
+
+    assert count == 3
+    assert median == pytest.approx(0.2, rel=0.021)
@@ -1,6 +1,7 @@
 """Integration tests for the core functionality of the library"""
 
 import datetime
+import gc
 import logging
 from unittest.mock import patch
 
@@ -9,6 +10,7 @@ import requests
 from freezegun import freeze_time
 
 from log_outgoing_requests.datastructures import ContentType
+from log_outgoing_requests.handlers import _queue
 from log_outgoing_requests.models import OutgoingRequestsLog
 
 
@@ -360,6 +362,165 @@ def test_content_length_exceeded(request_mock_kwargs, request_variants, settings
         request_log = OutgoingRequestsLog.objects.last()
 
         assert bytes(request_log.res_body) == b""
+        assert request_log.res_body_too_large
+        assert request_log.res_content_type == "application/json"
+        assert request_log.req_body_too_large
+
+
+@pytest.mark.django_db
+def test_streamed_request_body_is_not_consumed(requests_mock, request_mock_kwargs):
+    requests_mock.post(request_mock_kwargs["url"], json={})
+    consumed = False
+
+    def body():
+        nonlocal consumed
+        consumed = True
+        yield b'{"test": "request data"}'
+
+    requests.post(
+        request_mock_kwargs["url"],
+        headers={"Content-Type": "application/json"},
+        data=body(),
+    )
+
+    request_log = OutgoingRequestsLog.objects.get()
+    assert bytes(request_log.req_body) == b""
+    assert not request_log.req_body_too_large
+    assert not consumed
+
+
+@pytest.mark.django_db
+def test_streamed_response_body_is_not_saved_by_default(
+    requests_mock, request_mock_kwargs
+):
+    requests_mock.get(**request_mock_kwargs)
+
+    with requests.get(
+        request_mock_kwargs["url"],
+        headers=request_mock_kwargs["request_headers"],
+        stream=True,
+    ) as response:
+        assert response.json() == {"test": "response data"}
+
+    request_log = OutgoingRequestsLog.objects.get()
+    assert bytes(request_log.res_body) == b""
+
+
+@pytest.mark.django_db
+def test_streamed_response_body_is_captured_when_read(
+    requests_mock, request_mock_kwargs, settings
+):
+    settings.LOG_OUTGOING_REQUESTS_CAPTURE_STREAMED_BODIES = True
+    requests_mock.get(**request_mock_kwargs)
+
+    response = requests.get(
+        request_mock_kwargs["url"],
+        headers=request_mock_kwargs["request_headers"],
+        stream=True,
+    )
+    # nothing is logged until the body has been read
+    assert not OutgoingRequestsLog.objects.exists()
+    chunks = list(response.iter_content(chunk_size=4))
+
+    assert b"".join(chunks) == b'{"test": "response data"}'
+    request_log = OutgoingRequestsLog.objects.get()
+    assert bytes(request_log.res_body) == b'{"test": "response data"}'
+    assert request_log.res_content_type == "application/json"
+    assert not request_log.res_body_too_large
+
+    # closing the response doesn't log it again
+    response.close()
+    assert OutgoingRequestsLog.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_streamed_response_is_logged_without_body_when_closed_early(
+    requests_mock, request_mock_kwargs, settings
+):
+    settings.LOG_OUTGOING_REQUESTS_CAPTURE_STREAMED_BODIES = True
+    requests_mock.get(**request_mock_kwargs)
+
+    with requests.get(
+        request_mock_kwargs["url"],
+        headers=request_mock_kwargs["request_headers"],
+        stream=True,
+    ) as response:
+        next(response.iter_content(chunk_size=4))
+
+    request_log = OutgoingRequestsLog.objects.get()
+    assert request_log.status_code == 200
+    assert bytes(request_log.res_body) == b""
+    assert not request_log.res_body_too_large
+
+
+@pytest.mark.django_db(transaction=True)
+def test_abandoned_streamed_response_is_logged_without_body(
+    requests_mock, request_mock_kwargs, settings, enable_background_thread_logging
+):
+    settings.LOG_OUTGOING_REQUESTS_CAPTURE_STREAMED_BODIES = True
+    requests_mock.get(**request_mock_kwargs)
+
+    response = requests.get(
+        request_mock_kwargs["url"],
+        headers=request_mock_kwargs["request_headers"],
+        stream=True,
+    )
+    # reading the raw stream bypasses the capture, and the response is never closed
+    assert response.raw.read(4) == b'{"te'
+    assert not OutgoingRequestsLog.objects.exists()
+
+    del response
+    gc.collect()
+    _queue.join()
+
+    request_log = OutgoingRequestsLog.objects.get()
+    assert request_log.status_code == 200
+    assert bytes(request_log.res_body) == b""
+    assert not request_log.res_body_too_large
+
+
+@pytest.mark.django_db
+def test_abandoned_streamed_response_is_not_logged_without_queue(
+    requests_mock, request_mock_kwargs, settings
+):
+    settings.LOG_OUTGOING_REQUESTS_CAPTURE_STREAMED_BODIES = True
+    requests_mock.get(**request_mock_kwargs)
+
+    response = requests.get(
+        request_mock_kwargs["url"],
+        headers=request_mock_kwargs["request_headers"],
+        stream=True,
+    )
+    assert response.raw.read(4) == b'{"te'
+
+    # the garbage collector may run in the middle of a query of this thread
+    with patch("log_outgoing_requests.handlers.save_logs") as mock_save_logs:
+        del response
+        gc.collect()
+
+    mock_save_logs.assert_not_called()
+    assert not OutgoingRequestsLog.objects.exists()
+
+
+@pytest.mark.django_db
+def test_streamed_response_body_exceeding_max_content_length(
+    requests_mock, request_mock_kwargs, settings
+):
+    settings.LOG_OUTGOING_REQUESTS_CAPTURE_STREAMED_BODIES = True
+    settings.LOG_OUTGOING_REQUESTS_MAX_CONTENT_LENGTH = 10
+    requests_mock.get(**request_mock_kwargs)
+
+    with requests.get(
+        request_mock_kwargs["url"],
+        headers=request_mock_kwargs["request_headers"],
+        stream=True,
+    ) as response:
+        for _ in response.iter_lines():
+            pass
+
+    request_log = OutgoingRequestsLog.objects.get()
+    assert bytes(request_log.res_body) == b""
+    assert request_log.res_body_too_large
 
 
 def test_unexpected_exceptions_do_not_crash_entire_application(mocker, requests_mock):
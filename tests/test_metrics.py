@@ -0,0 +1,136 @@
+"""Tests for the logging pipeline metrics"""
+
+import queue
+from collections import Counter, defaultdict
+from unittest.mock import patch
+
+import pytest
+
+from log_outgoing_requests import metrics
+from log_outgoing_requests.handlers import DatabaseOutgoingRequestsHandler, QueueHandler
+from log_outgoing_requests.metrics import MetricsSink
+
+from .conftest import FailingMetricsSink, LogRecordEmitter
+
+
+class RecordingSink(MetricsSink):
+    def __init__(self):
+        self.counters = Counter()
+        self.gauges = {}
+        self.observations = defaultdict(list)
+
+    def increment(self, name, value=1):
+        self.counters[name] += value
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def observe(self, name, value):
+        self.observations[name].append(value)
+
+
+@pytest.mark.django_db
+def test_queue_handler_reports_enqueued_and_dropped_records(
+    log_record_emitter: LogRecordEmitter,
+):
+    sink = RecordingSink()
+    handler = QueueHandler(queue.Queue(maxsize=1), metrics_sink=sink)
+
+    handler.handle(log_record_emitter())
+    handler.handle(log_record_emitter())
+
+    assert sink.counters[metrics.RECORDS_ENQUEUED] == 1
+    assert sink.counters[metrics.RECORDS_DROPPED] == 1
+    assert sink.gauges[metrics.QUEUE_DEPTH] == 1
+
+
+@pytest.mark.django_db
+def test_database_handler_reports_flushes(log_record_emitter: LogRecordEmitter):
+    sink = RecordingSink()
+    handler = DatabaseOutgoingRequestsHandler(
+        use_queue_mode=True, buffer_size=2, flush_interval=999, metrics_sink=sink
+    )
+
+    with patch("log_outgoing_requests.handlers.close_old_connections"):
+        handler.handle(log_record_emitter())
+        handler.handle(log_record_emitter())
+
+    assert sink.counters[metrics.RECORDS_DEQUEUED] == 2
+    assert sink.observations[metrics.FLUSH_SIZE] == [2]
+    assert len(sink.observations[metrics.FLUSH_DURATION]) == 1
+
+
+@pytest.mark.django_db
+def test_database_handler_reports_errors(log_record_emitter: LogRecordEmitter):
+    sink = RecordingSink()
+    handler = DatabaseOutgoingRequestsHandler(use_queue_mode=False, metrics_sink=sink)
+    log_record = log_record_emitter()
+    log_record.req.url = None  # type: ignore we're breaking it on purpose
+
+    handler.handle(log_record)
+
+    assert sink.counters[metrics.HANDLER_ERRORS] == 1
+
+
+def test_prometheus_sink():
+    prometheus_client = pytest.importorskip("prometheus_client")
+    registry = prometheus_client.CollectorRegistry()
+    sink = metrics.PrometheusMetricsSink(registry=registry)
+
+    sink.increment(metrics.RECORDS_ENQUEUED, 3)
+    sink.set_gauge(metrics.QUEUE_DEPTH, 2)
+    sink.observe(metrics.FLUSH_DURATION, 0.1)
+
+    get_value = registry.get_sample_value
+    assert get_value("log_outgoing_requests_records_enqueued_total") == 3
+    assert get_value("log_outgoing_requests_queue_depth") == 2
+    assert get_value("log_outgoing_requests_flush_duration_seconds_count") == 1
+
+
+def test_prometheus_sinks_share_the_metrics_of_a_registry():
+    prometheus_client = pytest.importorskip("prometheus_client")
+    registry = prometheus_client.CollectorRegistry()
+    sink = metrics.PrometheusMetricsSink(registry=registry)
+    other_sink = metrics.PrometheusMetricsSink(registry=registry)
+
+    sink.increment(metrics.RECORDS_ENQUEUED)
+    other_sink.increment(metrics.RECORDS_ENQUEUED, 2)
+
+    get_value = registry.get_sample_value
+    assert get_value("log_outgoing_requests_records_enqueued_total") == 3
+
+
+def test_guarded_sink_logs_errors(caplog):
+    sink = metrics.guard(FailingMetricsSink())
+
+    sink.increment(metrics.RECORDS_ENQUEUED)
+    sink.increment(metrics.RECORDS_ENQUEUED)
+    sink.set_gauge(metrics.QUEUE_DEPTH, 1)
+
+    # only the first error of each metric is logged
+    assert len(caplog.records) == 2
+    assert metrics.guard(sink) is sink
+
+
+def test_opentelemetry_sink():
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+
+    reader = InMemoryMetricReader()
+    sink = metrics.OpenTelemetryMetricsSink(
+        meter_provider=MeterProvider(metric_readers=[reader])
+    )
+
+    sink.increment(metrics.RECORDS_DROPPED)
+    sink.set_gauge(metrics.QUEUE_DEPTH, 5)
+    sink.observe(metrics.FLUSH_SIZE, 10)
+
+    data = reader.get_metrics_data()
+    (scope_metrics,) = data.resource_metrics[0].scope_metrics
+    names = {metric.name for metric in scope_metrics.metrics}
+    assert names == {
+        "log_outgoing_requests.records.dropped",
+        "log_outgoing_requests.queue.depth",
+        "log_outgoing_requests.flush.size",
+    }
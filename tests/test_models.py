@@ -0,0 +1,32 @@
+"""Tests for the model(s) and queryset methods"""
+
+from django.db import connection
+from django.utils import timezone
+
+import pytest
+
+from log_outgoing_requests.models import OutgoingRequestsLog
+
+pytestmark = pytest.mark.skipif(
+    connection.vendor != "sqlite", reason="Query plans are database specific"
+)
+
+
+@pytest.mark.django_db
+def test_prune_query_uses_timestamp_index():
+    queryset = OutgoingRequestsLog.objects.filter(timestamp__lt=timezone.now())
+
+    plan = queryset.explain()
+
+    assert "lor_log_timestamp_id_idx" in plan
+
+
+@pytest.mark.django_db
+def test_admin_hostname_filter_uses_composite_index():
+    queryset = OutgoingRequestsLog.objects.filter(
+        hostname="example.com", timestamp__gte=timezone.now()
+    )
+
+    plan = queryset.explain()
+
+    assert "lor_log_hostname_ts_idx" in plan
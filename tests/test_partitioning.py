@@ -0,0 +1,141 @@
+"""Tests for the (PostgreSQL-only) partitioned log table"""
+
+from datetime import UTC, datetime, timedelta
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.utils import timezone
+
+import pytest
+
+from log_outgoing_requests.models import OutgoingRequestsLog
+from log_outgoing_requests.partitioning import (
+    create_partitions,
+    get_partition_name,
+    get_partitions,
+    is_partitioned,
+    parse_partition_name,
+)
+
+postgres_only = pytest.mark.skipif(
+    connection.vendor != "postgresql", reason="Partitioning requires PostgreSQL"
+)
+
+TABLE = "log_outgoing_requests_outgoingrequestslog"
+
+
+@pytest.mark.parametrize(
+    "interval,expected_name",
+    [
+        ("day", f"{TABLE}_p20261017"),
+        ("hour", f"{TABLE}_p2026101713"),
+    ],
+)
+def test_partition_name_roundtrip(interval, expected_name):
+    start = datetime(2026, 10, 17, 13, 37, tzinfo=UTC)
+
+    name = get_partition_name(start, interval)
+
+    assert name == expected_name
+    bounds = parse_partition_name(name)
+    assert bounds is not None
+    assert bounds[0] <= start < bounds[1]
+
+
+@pytest.mark.parametrize(
+    "name", [f"{TABLE}_default", f"{TABLE}_p2026", f"{TABLE}_p2026101x", "other_table"]
+)
+def test_unmanaged_partition_names_are_ignored(name):
+    assert parse_partition_name(name) is None
+
+
+@pytest.mark.django_db
+def test_command_requires_partitioning_setting(settings):
+    settings.LOG_OUTGOING_REQUESTS_PARTITION_INTERVAL = None
+
+    with pytest.raises(CommandError):
+        call_command("partition_outgoing_request_logs", stdout=StringIO())
+
+
+@pytest.fixture
+def partitioning(settings):
+    settings.LOG_OUTGOING_REQUESTS_PARTITION_INTERVAL = "day"
+    settings.LOG_OUTGOING_REQUESTS_MAX_AGE = 1
+
+
+@postgres_only
+@pytest.mark.django_db
+def test_convert_table_preserves_records(partitioning):
+    existing = OutgoingRequestsLog.objects.create(
+        url="https://example.com", timestamp=timezone.now() - timedelta(days=5)
+    )
+
+    call_command("partition_outgoing_request_logs", "--convert", stdout=StringIO())
+
+    assert is_partitioned()
+    assert OutgoingRequestsLog.objects.get() == existing
+    new_log = OutgoingRequestsLog.objects.create(timestamp=timezone.now())
+    assert new_log.pk > existing.pk
+    partitions = get_partitions()
+    assert f"{TABLE}_default" in partitions
+    assert get_partition_name(existing.timestamp, "day") in partitions
+    assert get_partition_name(timezone.now() + timedelta(days=2), "day") in partitions
+
+
+@postgres_only
+@pytest.mark.django_db
+def test_prune_drops_expired_partitions(partitioning):
+    now = timezone.now()
+    call_command("partition_outgoing_request_logs", "--convert", stdout=StringIO())
+    create_partitions(start=now - timedelta(days=5), until=now)
+    for days_ago in (4, 3, 0):
+        OutgoingRequestsLog.objects.create(timestamp=now - timedelta(days=days_ago))
+    # the number of records in the dropped partitions is taken from the statistics
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {TABLE}")
+
+    num_deleted = OutgoingRequestsLog.objects.prune()
+
+    assert num_deleted == 2
+    assert OutgoingRequestsLog.objects.count() == 1
+    partitions = get_partitions()
+    assert get_partition_name(now - timedelta(days=4), "day") not in partitions
+    assert get_partition_name(now, "day") in partitions
+
+
+@postgres_only
+@pytest.mark.django_db
+def test_filtered_prune_keeps_expired_partitions(partitioning):
+    now = timezone.now()
+    call_command("partition_outgoing_request_logs", "--convert", stdout=StringIO())
+    create_partitions(start=now - timedelta(days=5), until=now)
+    for hostname in ("example.com", "other.example.com"):
+        OutgoingRequestsLog.objects.create(
+            hostname=hostname, timestamp=now - timedelta(days=4)
+        )
+
+    num_deleted = OutgoingRequestsLog.objects.filter(hostname="example.com").prune()
+
+    assert num_deleted == 1
+    assert OutgoingRequestsLog.objects.get().hostname == "other.example.com"
+    assert get_partition_name(now - timedelta(days=4), "day") in get_partitions()
+
+
+@postgres_only
+@pytest.mark.django_db
+def test_convert_table_with_serial_primary_key(partitioning):
+    # tables created before Django 4.1 have a serial primary key
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id DROP IDENTITY")
+        cursor.execute(f"CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id")
+        cursor.execute(
+            f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')"
+        )
+    existing = OutgoingRequestsLog.objects.create(timestamp=timezone.now())
+
+    call_command("partition_outgoing_request_logs", "--convert", stdout=StringIO())
+
+    assert is_partitioned()
+    new_log = OutgoingRequestsLog.objects.create(timestamp=timezone.now())
+    assert new_log.pk > existing.pk
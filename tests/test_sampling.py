@@ -0,0 +1,192 @@
+"""Tests for sampling the request logs saved to the database"""
+
+import asyncio
+import queue
+from datetime import timedelta
+from unittest.mock import PropertyMock
+
+from django.core.exceptions import ValidationError
+
+import httpx
+import pytest
+import requests
+from requests import Response
+
+from log_outgoing_requests import sampling
+from log_outgoing_requests.handlers import QueueHandler
+from log_outgoing_requests.httpx import AsyncDatabaseWriter, AsyncLoggingTransport
+from log_outgoing_requests.models import (
+    OutgoingRequestsLog,
+    OutgoingRequestsLogConfig,
+    validate_sample_rates,
+)
+
+from .conftest import LogRecordEmitter
+
+
+def _configure(**kwargs) -> OutgoingRequestsLogConfig:
+    config = OutgoingRequestsLogConfig.get_solo()
+    for name, value in kwargs.items():
+        setattr(config, name, value)
+    config.save()
+    return config
+
+
+@pytest.mark.parametrize(
+    "status_code,response_ms,expected",
+    [
+        (200, 10, False),
+        (302, 10, True),
+        (500, 10, True),
+        (None, 0, True),
+        (200, 999, False),
+        (200, 1000, True),
+    ],
+)
+def test_errors_and_slow_requests_are_kept(status_code, response_ms, expected):
+    config = OutgoingRequestsLogConfig(sample_rate=0, slow_request_threshold=1000)
+
+    is_sampled = sampling.is_sampled(
+        config,
+        hostname="example.com",
+        status_code=status_code,
+        response_ms=response_ms,
+    )
+
+    assert is_sampled is expected
+
+
+def test_errors_can_be_sampled():
+    config = OutgoingRequestsLogConfig(sample_rate=0, always_save_errors=False)
+
+    assert not sampling.is_sampled(
+        config, hostname="example.com", status_code=500, response_ms=10
+    )
+
+
+def test_sample_rate_per_host(mocker):
+    mocker.patch.object(sampling.random, "random", return_value=0.5)
+    config = OutgoingRequestsLogConfig(
+        sample_rate=0.1, host_sample_rates={"api.example.com": 0.9}
+    )
+
+    def _is_sampled(hostname: str) -> bool:
+        return sampling.is_sampled(
+            config, hostname=hostname, status_code=200, response_ms=10
+        )
+
+    assert _is_sampled("api.example.com")
+    assert not _is_sampled("example.com")
+
+
+@pytest.mark.parametrize(
+    "value", [[], {"example.com": 2}, {"example.com": "0.5"}, {"example.com": True}]
+)
+def test_validate_sample_rates(value):
+    with pytest.raises(ValidationError):
+        validate_sample_rates(value)
+
+
+@pytest.mark.django_db
+def test_queue_handler_discards_records_before_consuming_the_body(
+    mocker, log_record_emitter: LogRecordEmitter
+):
+    _configure(sample_rate=0)
+    content = mocker.patch.object(Response, "content", new_callable=PropertyMock)
+    test_queue = queue.Queue()
+    handler = QueueHandler(test_queue)
+
+    handler.handle(log_record_emitter())
+
+    assert test_queue.empty()
+    content.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_queue_handler_keeps_slow_requests(log_record_emitter: LogRecordEmitter):
+    _configure(sample_rate=0, slow_request_threshold=1000)
+    record = log_record_emitter()
+    record.res.elapsed = timedelta(seconds=2)
+    test_queue = queue.Queue()
+    handler = QueueHandler(test_queue)
+
+    handler.handle(record)
+    handler.handle(log_record_emitter())
+
+    assert test_queue.get_nowait().snapshot.response_ms == 2000
+    assert test_queue.empty()
+
+
+@pytest.mark.django_db
+def test_queue_handler_keeps_request_exceptions(log_record_emitter: LogRecordEmitter):
+    _configure(sample_rate=0)
+    record = log_record_emitter()
+    record.request_exception = requests.ConnectionError(request=record.req)
+    del record.req
+    del record.res
+    test_queue = queue.Queue()
+    handler = QueueHandler(test_queue)
+
+    handler.handle(record)
+
+    assert test_queue.get_nowait().snapshot.status_code is None
+
+
+@pytest.mark.django_db
+def test_database_handler_samples_records(requests_mock, request_mock_kwargs):
+    _configure(sample_rate=0)
+    requests_mock.get(**request_mock_kwargs)
+    requests_mock.get("https://example.com/error", status_code=503)
+
+    requests.get(
+        request_mock_kwargs["url"], headers=request_mock_kwargs["request_headers"]
+    )
+    requests.get("https://example.com/error")
+
+    log = OutgoingRequestsLog.objects.get()
+    assert log.status_code == 503
+
+
+@pytest.mark.django_db
+def test_saved_records_store_their_sample_rate(
+    mocker, requests_mock, request_mock_kwargs
+):
+    mocker.patch.object(sampling.random, "random", return_value=0)
+    _configure(sample_rate=0.5)
+    requests_mock.get(**request_mock_kwargs)
+    requests_mock.get("https://example.com/error", status_code=503)
+
+    requests.get(
+        request_mock_kwargs["url"], headers=request_mock_kwargs["request_headers"]
+    )
+    requests.get("https://example.com/error")
+
+    logs = OutgoingRequestsLog.objects.order_by("pk")
+    # errors are always saved
+    assert [(log.status_code, log.sample_rate) for log in logs] == [
+        (200, 0.5),
+        (503, 1),
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_httpx_transport_samples_requests():
+    _configure(sample_rate=0)
+
+    def _respond(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200 if request.url.path == "/ok" else 503)
+
+    async def make_requests():
+        writer = AsyncDatabaseWriter()
+        transport = AsyncLoggingTransport(httpx.MockTransport(_respond), writer=writer)
+        try:
+            async with httpx.AsyncClient(transport=transport) as client:
+                await client.get("https://example.com/ok")
+                await client.get("https://example.com/error")
+        finally:
+            await writer.aclose()
+
+    asyncio.run(make_requests())
+
+    log = OutgoingRequestsLog.objects.get()
+    assert log.url == "https://example.com/error"
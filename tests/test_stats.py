@@ -0,0 +1,201 @@
+"""Tests for the hourly statistics"""
+
+from datetime import UTC, datetime, timedelta
+
+from django.utils import timezone
+
+import pytest
+import requests
+from freezegun import freeze_time
+
+from log_outgoing_requests import stats
+from log_outgoing_requests.models import (
+    OutgoingRequestsHourlyStats,
+    OutgoingRequestsLog,
+)
+
+
+@pytest.mark.parametrize(
+    "status_code,status_class",
+    [(None, 0), (200, 200), (204, 200), (302, 300), (404, 400), (503, 500)],
+)
+def test_get_status_class(status_code, status_class):
+    assert stats.get_status_class(status_code) == status_class
+
+
+@pytest.mark.parametrize(
+    "response_ms,bucket", [(0, 0), (9, 0), (10, 10), (120, 100), (60_000, 10_000)]
+)
+def test_get_latency_bucket(response_ms, bucket):
+    assert stats.get_latency_bucket(response_ms) == bucket
+
+
+def _log(**kwargs) -> OutgoingRequestsLog:
+    return OutgoingRequestsLog(
+        **{
+            "hostname": "example.com",
+            "method": "GET",
+            "status_code": 200,
+            "response_ms": 30,
+            "timestamp": datetime(2023, 10, 2, 12, 30, tzinfo=UTC),
+            **kwargs,
+        }
+    )
+
+
+@pytest.mark.django_db
+def test_saved_logs_are_added_to_the_hourly_stats(
+    settings, requests_mock, request_mock_kwargs
+):
+    settings.LOG_OUTGOING_REQUESTS_HOURLY_STATS = True
+    requests_mock.get(**request_mock_kwargs)
+
+    with freeze_time("2023-10-02T12:30:00Z"):
+        for _ in range(2):
+            requests.get(
+                request_mock_kwargs["url"],
+                headers=request_mock_kwargs["request_headers"],
+            )
+
+    log = OutgoingRequestsLog.objects.first()
+    assert log is not None
+    row = OutgoingRequestsHourlyStats.objects.get()
+    assert row.hour == datetime(2023, 10, 2, 12, tzinfo=UTC)
+    assert row.hostname == log.hostname
+    assert row.method == "GET"
+    assert row.status_class == 200
+    assert row.count == 2
+
+
+@pytest.mark.django_db
+def test_hourly_stats_are_disabled_by_default(requests_mock, request_mock_kwargs):
+    requests_mock.get(**request_mock_kwargs)
+
+    requests.get(
+        request_mock_kwargs["url"], headers=request_mock_kwargs["request_headers"]
+    )
+
+    assert OutgoingRequestsLog.objects.exists()
+    assert not OutgoingRequestsHourlyStats.objects.exists()
+
+
+@pytest.mark.django_db
+def test_hourly_stats_are_incremented(settings):
+    settings.LOG_OUTGOING_REQUESTS_HOURLY_STATS = True
+
+    stats.update_hourly_stats([_log(response_ms=30), _log(response_ms=40)])
+    stats.update_hourly_stats([_log(response_ms=45), _log(response_ms=400)])
+
+    rows = OutgoingRequestsHourlyStats.objects.order_by("latency_bucket")
+    assert [(row.latency_bucket, row.count, row.total_ms) for row in rows] == [
+        (25, 3, 115),
+        (250, 1, 400),
+    ]
+
+
+@pytest.mark.django_db
+def test_hourly_stats_count_sampled_records_by_their_weight(settings):
+    settings.LOG_OUTGOING_REQUESTS_HOURLY_STATS = True
+
+    stats.update_hourly_stats(
+        [_log(sample_rate=0.25, response_ms=30), _log(status_code=500, response_ms=30)]
+    )
+
+    rows = OutgoingRequestsHourlyStats.objects.order_by("status_class")
+    assert [(row.status_class, row.count, row.total_ms) for row in rows] == [
+        (200, 4, 120),
+        (500, 1, 30),
+    ]
+
+
+@pytest.mark.django_db
+def test_hourly_stats_errors_are_ignored(settings, mocker):
+    settings.LOG_OUTGOING_REQUESTS_HOURLY_STATS = True
+    mocker.patch.object(stats, "_increment", side_effect=RuntimeError("Broken"))
+
+    stats.update_hourly_stats([_log()])
+
+    assert not OutgoingRequestsHourlyStats.objects.exists()
+
+
+@pytest.mark.django_db
+def test_summarize_hourly_stats(settings):
+    settings.LOG_OUTGOING_REQUESTS_HOURLY_STATS = True
+    stats.update_hourly_stats(
+        [_log(response_ms=30) for _ in range(90)]
+        + [_log(response_ms=300) for _ in range(8)]
+        + [_log(status_code=500, response_ms=3000)]
+        + [_log(status_code=None, response_ms=0)]
+        + [_log(hostname="example.org")]
+    )
+
+    summaries = stats.summarize_hourly_stats(since=datetime(2023, 10, 2, tzinfo=UTC))
+
+    assert set(summaries) == {"example.com", "example.org"}
+    summary = summaries["example.com"]
+    assert summary.count == 100
+    assert summary.error_count == 2
+    assert summary.error_rate == 0.02
+    # the request without response has no response time
+    assert summary.mean_ms == (90 * 30 + 8 * 300 + 3000) / 99
+    assert 25 <= summary.percentile(50) < 50
+    assert 250 <= summary.percentile(95) < 500
+    assert summary.percentile(100) == 5000
+
+
+@pytest.mark.django_db
+def test_summarize_hourly_stats_per_hour(settings):
+    settings.LOG_OUTGOING_REQUESTS_HOURLY_STATS = True
+    stats.update_hourly_stats(
+        [
+            _log(),
+            _log(timestamp=datetime(2023, 10, 2, 13, 5, tzinfo=UTC)),
+            _log(hostname="example.org"),
+        ]
+    )
+
+    summaries = stats.summarize_hourly_stats(
+        since=datetime(2023, 10, 2, tzinfo=UTC), group_by="hour", hostname="example.com"
+    )
+
+    assert {hour: summary.count for hour, summary in summaries.items()} == {
+        datetime(2023, 10, 2, 12, tzinfo=UTC): 1,
+        datetime(2023, 10, 2, 13, tzinfo=UTC): 1,
+    }
+
+
+@pytest.mark.django_db
+def test_summarized_errors_match_the_sampled_errors(settings):
+    settings.LOG_OUTGOING_REQUESTS_HOURLY_STATS = True
+    stats.update_hourly_stats(
+        [_log(status_code=status_code) for status_code in (200, 302, 404, None)]
+    )
+
+    summaries = stats.summarize_hourly_stats(since=datetime(2023, 10, 2, tzinfo=UTC))
+
+    # the requests that are always saved when sampling, see sampling.is_error
+    assert summaries["example.com"].error_count == 3
+
+
+def test_percentile_without_responses():
+    assert stats.StatsSummary(count=1, error_count=1).percentile(95) is None
+
+
+@pytest.mark.django_db
+def test_hourly_stats_survive_pruning(settings):
+    settings.LOG_OUTGOING_REQUESTS_HOURLY_STATS = True
+    settings.LOG_OUTGOING_REQUESTS_MAX_AGE = 1
+    settings.LOG_OUTGOING_REQUESTS_HOURLY_STATS_MAX_AGE = 30
+
+    with freeze_time("2023-10-02T12:30:00Z"):
+        logs = [
+            _log(timestamp=timezone.now() - timedelta(days=days)) for days in (2, 31)
+        ]
+        OutgoingRequestsLog.objects.bulk_create(logs)
+        stats.update_hourly_stats(logs)
+
+        OutgoingRequestsLog.objects.prune()
+
+    assert not OutgoingRequestsLog.objects.exists()
+    row = OutgoingRequestsHourlyStats.objects.get()
+    assert row.hour == datetime(2023, 9, 30, 12, tzinfo=UTC)
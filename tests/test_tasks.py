@@ -40,6 +40,55 @@ def test_cleanup_request_logs_command(settings, caplog):
     assert OutgoingRequestsLog.objects.get() == recent_log
 
 
+@pytest.mark.django_db
+def test_cleanup_request_logs_command_in_batches(settings, mocker):
+    settings.LOG_OUTGOING_REQUESTS_MAX_AGE = 1
+    mock_sleep = mocker.patch("log_outgoing_requests.models.time.sleep")
+
+    with freeze_time("2023-10-02T12:00:00Z") as frozen_time:
+        for _ in range(5):
+            OutgoingRequestsLog.objects.create(timestamp=timezone.now())
+        frozen_time.move_to("2023-10-04T12:00:00Z")
+        recent_log = OutgoingRequestsLog.objects.create(timestamp=timezone.now())
+
+        stdout = StringIO()
+        call_command(
+            "prune_outgoing_request_logs",
+            batch_size=2,
+            pause=0.5,
+            stdout=stdout,
+            stderr=StringIO(),
+        )
+
+    assert stdout.getvalue() == "Deleted 5 outgoing request log(s)\n"
+    assert OutgoingRequestsLog.objects.get() == recent_log
+    # 3 batches (2 + 2 + 1), no pause after the last, incomplete batch
+    assert mock_sleep.call_count == 2
+    mock_sleep.assert_called_with(0.5)
+
+
+@pytest.mark.django_db
+def test_batched_pruning_respects_time_budget(settings):
+    settings.LOG_OUTGOING_REQUESTS_MAX_AGE = 1
+
+    with freeze_time("2023-10-02T12:00:00Z") as frozen_time:
+        for _ in range(5):
+            OutgoingRequestsLog.objects.create(timestamp=timezone.now())
+        frozen_time.move_to("2023-10-04T12:00:00Z")
+
+        num_deleted = OutgoingRequestsLog.objects.prune(batch_size=2, time_budget=0)
+
+    assert num_deleted == 2
+    assert OutgoingRequestsLog.objects.count() == 3
+
+
+def test_batched_pruning_requires_positive_batch_size(settings):
+    settings.LOG_OUTGOING_REQUESTS_MAX_AGE = 1
+
+    with pytest.raises(ValueError):
+        OutgoingRequestsLog.objects.prune(batch_size=0)
+
+
 @pytest.mark.skipif(not has_celery, reason="Celery is optional dependency")
 @pytest.mark.django_db
 def test_cleanup_request_logs_celery_task(requests_mock, settings, caplog):
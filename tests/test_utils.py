@@ -5,11 +5,12 @@ import logging
 import pytest
 import requests
 
-from log_outgoing_requests.datastructures import ContentType
+from log_outgoing_requests.datastructures import ContentType, StreamCapture
 from log_outgoing_requests.models import OutgoingRequestsLogConfig
 from log_outgoing_requests.utils import (
     check_content_length,
     check_content_type,
+    get_content_type_matcher,
     get_default_encoding,
     parse_content_type_header,
 )
@@ -146,6 +147,37 @@ def test_get_default_encoding(
     assert result == expected
 
 
+def test_content_type_matcher_prefers_exact_matches(settings):
+    settings.LOG_OUTGOING_REQUESTS_CONTENT_TYPES = [
+        ContentType("text/*", "utf-8"),
+        ContentType("text/xml", "iso-8859-1"),
+    ]
+
+    assert get_default_encoding("text/xml") == "iso-8859-1"
+    assert get_default_encoding("text/html") == "utf-8"
+
+
+def test_content_type_matcher_memoizes_lookups():
+    matcher = get_content_type_matcher()
+    matcher.match.cache_clear()
+
+    check_content_type("application/json")
+    get_default_encoding("application/json")
+
+    assert matcher.match.cache_info().hits == 1
+    assert matcher.match.cache_info().misses == 1
+
+
+def test_content_type_matcher_is_rebuilt_when_setting_changes(settings):
+    matcher = get_content_type_matcher()
+    assert check_content_type("application/json")
+
+    settings.LOG_OUTGOING_REQUESTS_CONTENT_TYPES = [ContentType("text/*", "utf-8")]
+
+    assert get_content_type_matcher() is not matcher
+    assert not check_content_type("application/json")
+
+
 @pytest.mark.django_db
 def test_logger_warning_missing_content_length(
     requests_mock, request_mock_kwargs, caplog
@@ -165,3 +197,30 @@ def test_logger_warning_missing_content_length(
         "Content length of the request/response (request netloc: example.com:8000) "
         "could not be determined."
     )
+
+
+#
+# test StreamCapture
+#
+@pytest.mark.parametrize("size_hint", [None, 4, 10, 100])
+def test_stream_capture(size_hint):
+    capture = StreamCapture(limit=10, size_hint=size_hint)
+
+    capture.write(b"abcd")
+    capture.write(b"efgh")
+    assert capture.getvalue() is None, "Incomplete captures have no value"
+    capture.complete = True
+
+    assert capture.getvalue() == b"abcdefgh"
+
+
+def test_stream_capture_exceeding_limit():
+    capture = StreamCapture(limit=10)
+
+    capture.write(b"abcdefgh")
+    capture.write(b"ijkl")
+    capture.complete = True
+
+    assert capture.exceeded
+    assert capture.size == 12
+    assert capture.getvalue() is None